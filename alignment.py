@@ -0,0 +1,163 @@
+import os
+import atexit
+import shutil
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+#----
+# Parallel chunked alignment
+#----
+# whisperx.align aligns each segment on its own, so the segments can be split
+# into time-contiguous shards and aligned in separate processes. Every worker
+# keeps its own warm alignment model in its model registry and reads the audio
+# from a memory-mapped .npy file instead of receiving a pickled copy. The shard
+# results are concatenated in order, which gives the single-process output.
+
+MAX_AUTO_WORKERS = 4          # ALIGN_WORKERS = 0 uses up to this many processes on CPU
+MIN_SEGMENTS_PER_SHARD = 8    # Fewer segments are not worth a round trip to a worker
+SHARDS_PER_WORKER = 2         # Extra shards even out workers that get slower stretches
+
+_pool = None
+_pool_workers = None
+_pool_lock = threading.Lock()
+
+def resolve_workers(configs, device):
+    """
+    Number of alignment processes for the ALIGN_WORKERS setting: 1 (the
+    default) aligns in this process and 0 picks one per two cores on CPU.
+    GPU alignment always runs in this process.
+    """
+    if device != "cpu":
+        return 1
+    workers = configs.get("ALIGN_WORKERS", 1)
+    if workers <= 0:
+        workers = min(MAX_AUTO_WORKERS, (os.cpu_count() or 1) // 2)
+    return max(1, workers)
+
+def shard_segments(segments, shards):
+    """
+    Split segments into at most `shards` time-contiguous runs of roughly equal
+    audio duration.
+    """
+    if shards <= 1 or len(segments) <= 1:
+        return [list(segments)]
+    durations = np.array([max(0.0, segment["end"] - segment["start"]) for segment in segments])
+    cumulative = np.cumsum(durations)
+    targets = cumulative[-1] * np.arange(1, shards) / shards
+    cuts = np.unique(np.searchsorted(cumulative, targets, side="right"))
+    cuts = cuts[(cuts > 0) & (cuts < len(segments))]
+    bounds = np.concatenate(([0], cuts, [len(segments)])).tolist()
+    return [list(segments[start:end]) for start, end in zip(bounds[:-1], bounds[1:])]
+
+def merge_shards(results):
+    """
+    Concatenate per-shard whisperx.align results in shard order.
+    """
+    merged = {"segments": [], "word_segments": []}
+    for result in results:
+        merged["segments"].extend(result["segments"])
+        merged["word_segments"].extend(result["word_segments"])
+    return merged
+
+def _init_worker(threads):
+    import torch
+    torch.set_num_threads(threads)
+
+def _align_shard(audio_path, segments, language, configs):
+    """
+    Worker process: align one shard against the shared memory-mapped audio.
+    """
+    from diarization import run_alignment
+
+    # Copy-on-write mapping: pages are shared with the other workers and the
+    # array is writable for torch.from_numpy without touching the file
+    audio = np.load(audio_path, mmap_mode="c")
+    try:
+        return run_alignment(segments, language, audio, configs)
+    finally:
+        del audio
+
+def thread_budget(configs):
+    return configs.get("TORCH_THREADS", 0) or os.cpu_count() or 1
+
+def worker_threads(configs, workers):
+    """
+    Torch threads per worker. The TORCH_THREADS budget (all cores when 0) is
+    shared by the workers and, with PARALLEL_STAGES, by pyannote diarizing in
+    this process at the same time.
+    """
+    consumers = workers + (1 if configs.get("PARALLEL_STAGES", True) else 0)
+    return max(1, thread_budget(configs) // consumers)
+
+def diarization_threads(configs, workers):
+    """
+    Torch threads left for pyannote in this process while `workers`
+    alignment processes run.
+    """
+    return max(1, thread_budget(configs) - workers * worker_threads(configs, workers))
+
+def get_pool(workers, threads):
+    """
+    Process pool kept alive between transcriptions so the workers' alignment
+    models stay loaded.
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != (workers, threads):
+            if _pool is not None:
+                _pool.shutdown()
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(threads,),
+            )
+            _pool_workers = (workers, threads)
+        return _pool
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+atexit.register(shutdown_pool)
+
+def align_parallel(segments, language, audio, configs, workers):
+    """
+    Align `segments` in `workers` processes. Produces the same result as a
+    single whisperx.align call over all segments.
+    """
+    shards = shard_segments(segments, min(workers * SHARDS_PER_WORKER, len(segments) // MIN_SEGMENTS_PER_SHARD))
+    if len(shards) <= 1:
+        from diarization import run_alignment
+        return run_alignment(segments, language, audio, configs)
+
+    threads = worker_threads(configs, workers)
+    worker_configs = dict(configs, DEVICE="cpu", TORCH_THREADS=threads)
+    shared_dir = tempfile.mkdtemp(prefix="meetsolution_align_")
+    audio_path = os.path.join(shared_dir, "audio.npy")
+    try:
+        np.save(audio_path, np.asarray(audio, dtype=np.float32))
+        pool = get_pool(workers, threads)
+        futures = [pool.submit(_align_shard, audio_path, shard, language, worker_configs) for shard in shards]
+        return merge_shards([future.result() for future in futures])
+    finally:
+        shutil.rmtree(shared_dir, ignore_errors=True)
+
+def align_segments(segments, language, audio, configs):
+    """
+    Alignment stage: a process pool on CPU when ALIGN_WORKERS allows it,
+    otherwise a single whisperx.align in this process.
+    """
+    from diarization import get_device, run_alignment
+
+    workers = resolve_workers(configs, get_device(configs))
+    if workers > 1 and len(segments) >= 2 * MIN_SEGMENTS_PER_SHARD:
+        print(f"Aligning {len(segments)} segments in {workers} processes...")
+        return align_parallel(segments, language, audio, configs, workers)
+    return run_alignment(segments, language, audio, configs)
@@ -0,0 +1,307 @@
+import os
+import sys
+import json
+import time
+from datetime import datetime
+
+#----
+# Hardware auto-tuning
+#----
+# probe_hardware() looks at the cores, SIMD extensions, RAM and GPU, and
+# recommend() turns that into starting settings. calibrate() then times short
+# transcriptions of a real recording and keeps, one setting at a time, the
+# compute type, batch size and CTranslate2 thread count that transcribe the
+# most audio per second. The torch threads used by alignment and pyannote get
+# the cores ASR leaves free, since those stages overlap with ASR. The result
+# is saved as a named profile in TUNING_PROFILES_FILE and selected with
+# TUNING_PROFILE (or --tuning-profile).
+#
+# Two knobs are not calibrated. CTranslate2's num_workers only helps when
+# several threads call one model at once, and WhisperX transcribes a file
+# from a single thread in batches, so BATCH_SIZE is the parallelism that
+# counts. torch's inter-op pool can only be sized once per process, before
+# its first use, so TORCH_INTEROP_THREADS cannot be timed in-process and is
+# set from the core count.
+
+CALIBRATION_SECONDS = 60      # Audio transcribed per calibration run
+WARMUP_SECONDS = 5            # Untimed run first, so lazy initialisation is not measured
+BATCH_SIZES = (4, 8, 16, 32)  # Batch size candidates, capped by memory
+MB_PER_BATCH_ITEM = 160       # Rough encoder activation memory per batch item
+MEMORY_SHARE = 0.5            # Share of RAM/VRAM the ASR model and its batches may use
+ASR_CORE_SHARE = 2 / 3        # With PARALLEL_STAGES, ASR gets this share of the cores
+MODEL_ORDER = ("tiny", "base", "small", "medium")  # Step-down order; every "large" steps down to medium
+
+TUNED_KEYS = ("DEVICE", "MODEL_NAME", "COMPUTE_TYPE", "BATCH_SIZE", "ASR_THREADS", "TORCH_THREADS", "TORCH_INTEROP_THREADS")
+
+def cpu_flags():
+    """
+    SIMD feature flags of the CPU, from /proc/cpuinfo or, elsewhere, torch's
+    own dispatch level.
+    """
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith(("flags", "Features")):
+                    return set(line.split(":", 1)[1].split())
+    except OSError:
+        pass
+    try:
+        import torch
+        capability = torch.backends.cpu.get_cpu_capability()
+    except (ImportError, AttributeError):
+        return set()
+    return {"AVX512": {"avx2", "avx512f"}, "AVX2": {"avx2"}}.get(capability, set())
+
+def physical_cores():
+    try:
+        import psutil
+        cores = psutil.cpu_count(logical=False)
+        if cores:
+            return cores
+    except ImportError:
+        pass
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8") as f:
+            cores, physical_id = set(), None
+            for line in f:
+                key, _, value = line.partition(":")
+                if key.strip() == "physical id":
+                    physical_id = value.strip()
+                elif key.strip() == "core id":
+                    cores.add((physical_id, value.strip()))
+        if cores:
+            return len(cores)
+    except OSError:
+        pass
+    return os.cpu_count() or 1
+
+def total_ram_mb():
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / (1024 * 1024)
+    except (AttributeError, ValueError, OSError):
+        pass
+    try:
+        import psutil
+        return psutil.virtual_memory().total / (1024 * 1024)
+    except ImportError:
+        return None
+
+def probe_hardware():
+    """
+    Cores, SIMD level, RAM and CUDA device of this machine.
+    """
+    flags = cpu_flags()
+    if "avx512f" in flags:
+        simd = "avx512"
+    elif "avx2" in flags:
+        simd = "avx2"
+    elif "avx" in flags:
+        simd = "avx"
+    else:
+        simd = "none"
+    hardware = {
+        "logical_cores": os.cpu_count() or 1,
+        "physical_cores": physical_cores(),
+        "simd": simd,
+        "vnni": bool(flags & {"avx512_vnni", "avx_vnni"}),
+        "ram_mb": round(total_ram_mb() or 0),
+        "cuda": False,
+        "gpu": None,
+        "vram_mb": None,
+    }
+    import torch
+    if torch.cuda.is_available():
+        properties = torch.cuda.get_device_properties(0)
+        hardware.update(cuda=True, gpu=properties.name, vram_mb=round(properties.total_memory / (1024 * 1024)))
+    return hardware
+
+def asr_size_mb(model_name, compute_type):
+    from model_registry import ASR_MODEL_SIZES_MB, COMPUTE_TYPE_FACTORS, DEFAULT_SIZES_MB
+    return ASR_MODEL_SIZES_MB.get(model_name, DEFAULT_SIZES_MB["asr"]) * COMPUTE_TYPE_FACTORS.get(compute_type, 1.0)
+
+def batch_sizes(hardware, model_name, compute_type):
+    """
+    Batch size candidates that fit next to the model in the memory share.
+    """
+    memory = hardware["vram_mb"] if hardware["cuda"] else hardware["ram_mb"]
+    room = memory * MEMORY_SHARE - asr_size_mb(model_name, compute_type)
+    fitting = [size for size in BATCH_SIZES if size * MB_PER_BATCH_ITEM <= room]
+    return fitting or [BATCH_SIZES[0]]
+
+def compute_types(hardware):
+    """
+    Compute types worth trying, fastest expected first. CTranslate2's int8
+    kernels need AVX2 to beat float32 on CPU.
+    """
+    if hardware["cuda"]:
+        return ["float16", "int8"]
+    if hardware["simd"] in ("avx2", "avx512"):
+        return ["int8", "float32"]
+    return ["float32", "int8"]
+
+def thread_split(cores, parallel):
+    """
+    (CTranslate2 threads, torch threads). Diarization runs next to ASR with
+    PARALLEL_STAGES, so the cores are shared instead of oversubscribed.
+    """
+    if not parallel or cores < 2:
+        return cores, cores
+    asr_threads = max(1, round(cores * ASR_CORE_SHARE))
+    return asr_threads, max(1, cores - asr_threads)
+
+def recommend(hardware, configs):
+    """
+    Settings derived from the hardware alone.
+    """
+    compute_type = compute_types(hardware)[0]
+    model_name = configs["MODEL_NAME"]
+    memory = hardware["vram_mb"] if hardware["cuda"] else hardware["ram_mb"]
+    # Step down to a model that fits, but never pick a larger one than asked for
+    while memory and asr_size_mb(model_name, compute_type) > memory * MEMORY_SHARE and model_name != MODEL_ORDER[0]:
+        model_name = MODEL_ORDER[MODEL_ORDER.index(model_name) - 1] if model_name in MODEL_ORDER else MODEL_ORDER[-1]
+    cores = hardware["physical_cores"]
+    asr_threads, torch_threads = thread_split(cores, configs.get("PARALLEL_STAGES", True))
+    return {
+        "DEVICE": "cuda" if hardware["cuda"] else "cpu",
+        "MODEL_NAME": model_name,
+        "COMPUTE_TYPE": compute_type,
+        "BATCH_SIZE": batch_sizes(hardware, model_name, compute_type)[-1 if hardware["cuda"] else 0],
+        "ASR_THREADS": 0 if hardware["cuda"] else asr_threads,
+        "TORCH_THREADS": cores if hardware["cuda"] else torch_threads,
+        "TORCH_INTEROP_THREADS": 1 if cores <= 4 else 2,
+    }
+
+def measure(audio, configs):
+    """
+    Audio seconds transcribed per wall-clock second with `configs`. The model
+    is loaded fresh, because CTranslate2 threads are fixed when it is created.
+    """
+    from diarization import load_asr_model, run_asr, asr_model_key
+    from model_registry import release_model
+    from mixer import TARGET_SAMPLE_RATE
+
+    key = asr_model_key(configs, configs["LANGUAGE"])
+    release_model(key)
+    try:
+        load_asr_model(configs, configs["LANGUAGE"])
+        run_asr(audio[:WARMUP_SECONDS * TARGET_SAMPLE_RATE], configs)
+        start = time.perf_counter()
+        run_asr(audio, configs)
+        return len(audio) / TARGET_SAMPLE_RATE / (time.perf_counter() - start)
+    finally:
+        release_model(key)
+
+def calibrate(audio_file, configs, hardware, settings, seconds=CALIBRATION_SECONDS):
+    """
+    Refine `settings` one key at a time (compute type, then batch size, then
+    CTranslate2 threads) by timing transcriptions of the first `seconds` of
+    `audio_file`. Returns (settings, runs).
+    """
+    from diarization import load_audio
+    from mixer import TARGET_SAMPLE_RATE
+
+    audio = load_audio(audio_file)[:int(seconds * TARGET_SAMPLE_RATE)]
+    best = dict(settings)
+    runs = []
+    measured = {}
+
+    def candidates(key):
+        if key == "COMPUTE_TYPE":
+            return compute_types(hardware)
+        if key == "BATCH_SIZE":
+            return batch_sizes(hardware, best["MODEL_NAME"], best["COMPUTE_TYPE"])
+        cores = hardware["physical_cores"]
+        return sorted({max(1, cores // 2), settings["ASR_THREADS"], cores})
+
+    keys = ["COMPUTE_TYPE", "BATCH_SIZE"] + ([] if hardware["cuda"] else ["ASR_THREADS"])
+    for key in keys:
+        speeds = {}
+        for value in candidates(key):
+            trial = dict(best, **{key: value})
+            signature = tuple(trial[name] for name in TUNED_KEYS)
+            if signature not in measured:
+                try:
+                    measured[signature] = measure(audio, dict(configs, **trial))
+                except Exception as e:
+                    print(f"  {key}={value}: failed ({e})")
+                    measured[signature] = None
+                if measured[signature] is not None:
+                    runs.append(dict({name: trial[name] for name in ("COMPUTE_TYPE", "BATCH_SIZE", "ASR_THREADS")}, speed=round(measured[signature], 2)))
+                    print(f"  {key}={value}: {measured[signature]:.1f}x real time")
+            if measured[signature] is not None:
+                speeds[value] = measured[signature]
+        if speeds:
+            best[key] = max(speeds, key=speeds.get)
+
+    if not hardware["cuda"]:
+        best["TORCH_THREADS"] = max(1, hardware["physical_cores"] - best["ASR_THREADS"]) if configs.get("PARALLEL_STAGES", True) else hardware["physical_cores"]
+    return best, runs
+
+def load_profiles(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def save_profile(path, name, settings, hardware, runs):
+    """
+    Add or replace profile `name` in the profiles file (written atomically).
+    """
+    profiles = load_profiles(path)
+    profiles[name] = {
+        "settings": settings,
+        "hardware": hardware,
+        "calibration": runs,
+        "created": datetime.now().isoformat(timespec="seconds"),
+    }
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(profiles, f, indent=2)
+    os.replace(tmp_path, path)
+
+def format_hardware(hardware):
+    line = (
+        f"{hardware['physical_cores']} cores ({hardware['logical_cores']} threads), "
+        f"SIMD {hardware['simd']}{' + VNNI' if hardware['vnni'] else ''}, {hardware['ram_mb'] / 1024:.1f} GB RAM"
+    )
+    if hardware["cuda"]:
+        line += f", {hardware['gpu']} ({hardware['vram_mb'] / 1024:.1f} GB)"
+    return line
+
+def tune(configs, name="default", audio_file=None, seconds=CALIBRATION_SECONDS):
+    """
+    Probe, optionally calibrate on `audio_file`, and save profile `name`.
+    Returns the tuned settings.
+    """
+    hardware = probe_hardware()
+    print(f"Hardware: {format_hardware(hardware)}")
+    settings = recommend(hardware, configs)
+    runs = []
+    if audio_file:
+        print(f"Calibrating on the first {seconds:.0f}s of {audio_file}...")
+        settings, runs = calibrate(audio_file, configs, hardware, settings, seconds)
+    else:
+        print("No calibration audio given, using the hardware defaults.")
+    path = configs["TUNING_PROFILES_FILE"]
+    save_profile(path, name, settings, hardware, runs)
+    print("Settings: " + ", ".join(f"{key}={value}" for key, value in settings.items()))
+    print(f"Saved profile '{name}' to {path}. Use it with --tuning-profile {name} or MEETSOLUTION_TUNING_PROFILE={name}.")
+    return settings
+
+def add_arguments(parser):
+    """
+    Options of the `autotune` command (cli.py).
+    """
+    parser.add_argument("--name", default="default", help="Profile name")
+    parser.add_argument("--audio", default=None, help="Recording with speech to calibrate on (default: hardware defaults only)")
+    parser.add_argument("--seconds", type=float, default=CALIBRATION_SECONDS, help="Audio seconds per calibration run")
+
+def main(argv=None):
+    # Same as "python main.py autotune ...", with its settings file, environment and --set handling
+    from cli import main as cli_main
+
+    return cli_main(["autotune"] + list(sys.argv[1:] if argv is None else argv))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+#----
+# Configuration
+#----
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a", ".flac", ".ogg", ".webm", ".mp4")
+MANIFEST_NAME = "batch_manifest.json"
+
+def find_audio_files(source):
+    """
+    Expand a directory or glob pattern into a sorted list of audio files.
+    """
+    if os.path.isdir(source):
+        candidates = glob.glob(os.path.join(source, "**", "*"), recursive=True)
+    else:
+        candidates = glob.glob(source, recursive=True)
+    return sorted(
+        os.path.abspath(path) for path in candidates
+        if os.path.isfile(path) and path.lower().endswith(AUDIO_EXTENSIONS)
+    )
+
+def file_signature(path):
+    stat = os.stat(path)
+    return f"{stat.st_size}:{int(stat.st_mtime)}"
+
+def load_manifest(manifest_path):
+    if not os.path.exists(manifest_path):
+        return {"files": {}}
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(manifest, manifest_path):
+    """
+    Write the manifest atomically so a crash never leaves it half written.
+    """
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+def is_done(manifest, audio_file):
+    entry = manifest["files"].get(audio_file)
+    return (
+        entry is not None
+        and entry.get("status") == "done"
+        and entry.get("signature") == file_signature(audio_file)
+        and os.path.exists(entry.get("output", ""))
+    )
+
+def source_root(source):
+    """
+    Directory the matched files are relative to: `source` itself, or the
+    part of a glob pattern before its first wildcard.
+    """
+    if os.path.isdir(source):
+        return os.path.abspath(source)
+    parts = []
+    for part in os.path.normpath(source).split(os.sep):
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    root = os.sep.join(parts) or os.curdir
+    if not os.path.isdir(root):
+        root = os.path.dirname(root) or os.curdir
+    return os.path.abspath(root)
+
+def meeting_names(audio_files, root):
+    """
+    Name of each file's transcript: its path below `root` without the
+    extension, so recordings with the same name in different subdirectories
+    stay apart. Files differing only by extension keep it in their name.
+    """
+    stems = {path: os.path.splitext(os.path.relpath(path, root))[0] for path in audio_files}
+    counts = {}
+    for stem in stems.values():
+        counts[stem] = counts.get(stem, 0) + 1
+    return {
+        path: (stem if counts[stem] == 1 else f"{stem}_{os.path.splitext(path)[1][1:].lower()}").replace(os.sep, "/")
+        for path, stem in stems.items()
+    }
+
+def output_path(meeting, output_dir):
+    return os.path.join(output_dir, *meeting.split("/")) + ".txt"
+
+def _init_worker(threads):
+    import torch
+    torch.set_num_threads(threads)
+
+def _align_and_diarize(audio_file, audio, result_transcriptions, configs, transcription_file, speech_map=None, meeting=None):
+    """
+    Worker process: alignment, diarization and speaker assignment for one file.
+    Models stay warm in the worker's own model registry between files.
+    `audio` is the waveform ASR ran on (already compacted by `speech_map`, the
+    voice-activity map, if any), so the file is not decoded again. `meeting`
+    is the name the transcript is indexed under.
+    """
+    from diarization import run_alignment, diarize_for_configs, assign_named_speakers
+    from channels import use_channels, diarize_channels
+    from transcript import WordTable
+    from search_index import index_meeting
+
+    result_aligned = run_alignment(result_transcriptions["segments"], result_transcriptions["language"], audio, configs)
+    if use_channels(audio_file, configs):
+        # Channel segments are on the original timeline
+        if speech_map is not None:
+            speech_map.remap_aligned(result_aligned)
+        final_result = assign_named_speakers(diarize_channels(audio_file, configs), result_aligned, configs)
+    else:
+        diarize_result = diarize_for_configs(audio, configs)
+        final_result = assign_named_speakers(diarize_result, result_aligned, configs)
+        if speech_map is not None:
+            speech_map.remap_word_segments(final_result)
+
+    os.makedirs(os.path.dirname(transcription_file), exist_ok=True)
+    with open(transcription_file, "w", encoding="utf-8") as f:
+        f.write(WordTable.from_word_segments(final_result).to_text())
+    meeting = meeting or os.path.splitext(os.path.basename(transcription_file))[0]
+    index_meeting(meeting, final_result, configs, audio_file)
+    return transcription_file
+
+def transcribe_batch(source, output_dir=None, configs=None, workers=2, manifest_path=None):
+    """
+    Transcribe every audio file matched by `source` (directory or glob).
+
+    ASR runs in this process behind a single warm WhisperX model, while
+    alignment and diarization run in a pool of `workers` processes. Progress is
+    recorded in a manifest so an interrupted run resumes where it stopped.
+    """
+    import whisperx
+    from config import DEFAULT_CONFIGS
+    from diarization import run_asr, print_registry_stats
+    from vad import detect_speech
+
+    configs = configs if configs else DEFAULT_CONFIGS.copy()
+    output_dir = output_dir if output_dir else os.getcwd()
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = manifest_path if manifest_path else os.path.join(output_dir, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+
+    audio_files = find_audio_files(source)
+    meetings = meeting_names(audio_files, source_root(source))
+    pending = [path for path in audio_files if not is_done(manifest, path)]
+    print(f"Found {len(audio_files)} audio files, {len(audio_files) - len(pending)} already done, {len(pending)} to process.")
+    if not pending:
+        return manifest
+
+    start_time = time.time()
+    processed_audio_seconds = 0.0
+    skipped_audio_seconds = 0.0
+    completed = 0
+    failed = 0
+
+    def record_result(audio_file, status, **fields):
+        manifest["files"][audio_file] = {"status": status, "signature": file_signature(audio_file), **fields}
+        save_manifest(manifest, manifest_path)
+
+    pool = None
+    if workers > 0:
+        threads = max(1, (configs.get("TORCH_THREADS", 0) or os.cpu_count() or 1) // workers)
+        configs = dict(configs, TORCH_THREADS=threads)
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(threads,),
+        )
+
+    in_flight = {}
+
+    def collect(futures):
+        nonlocal completed, failed, processed_audio_seconds, skipped_audio_seconds
+        for future in futures:
+            audio_file, audio_seconds, skipped_seconds, file_start = in_flight.pop(future)
+            try:
+                transcription_file = future.result()
+            except Exception as e:
+                failed += 1
+                record_result(audio_file, "failed", error=str(e))
+                print(f"[{completed + failed}/{len(pending)}] FAILED {os.path.basename(audio_file)}: {e}")
+                continue
+            completed += 1
+            processed_audio_seconds += audio_seconds
+            skipped_audio_seconds += skipped_seconds
+            elapsed = time.time() - file_start
+            record_result(
+                audio_file, "done", output=transcription_file, audio_seconds=audio_seconds,
+                skipped_seconds=round(skipped_seconds, 2), seconds=round(elapsed, 2),
+            )
+            print(f"[{completed + failed}/{len(pending)}] {os.path.basename(audio_file)}: {audio_seconds / 60:.1f} min of audio ({skipped_seconds / 60:.1f} min of silence skipped) in {elapsed:.1f}s")
+
+    try:
+        for audio_file in pending:
+            file_start = time.time()
+            try:
+                audio = whisperx.load_audio(audio_file)
+                audio_seconds = len(audio) / whisperx.audio.SAMPLE_RATE
+                speech_map = detect_speech(audio) if configs.get("VAD_PREPASS") else None
+                if speech_map is not None:
+                    audio = speech_map.compact(audio)
+                result_transcriptions = run_asr(audio, configs)
+            except Exception as e:
+                failed += 1
+                record_result(audio_file, "failed", error=str(e))
+                print(f"[{completed + failed}/{len(pending)}] FAILED {os.path.basename(audio_file)}: {e}")
+                continue
+
+            transcription_file = output_path(meetings[audio_file], output_dir)
+            args = (audio_file, audio, result_transcriptions, configs, transcription_file, speech_map, meetings[audio_file])
+            skipped_seconds = speech_map.skipped_seconds if speech_map is not None else 0.0
+            if pool is None:
+                future = Future()
+                try:
+                    future.set_result(_align_and_diarize(*args))
+                except Exception as e:
+                    future.set_exception(e)
+                in_flight[future] = (audio_file, audio_seconds, skipped_seconds, file_start)
+                collect([future])
+                continue
+
+            in_flight[pool.submit(_align_and_diarize, *args)] = (audio_file, audio_seconds, skipped_seconds, file_start)
+            del audio, args
+            # Keep ASR ahead of the pool by at most one file per worker
+            while len(in_flight) >= workers * 2:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            collect(done)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    wall_seconds = time.time() - start_time
+    audio_hours = processed_audio_seconds / 3600
+    wall_hours = wall_seconds / 3600
+    throughput = audio_hours / wall_hours if wall_hours > 0 else 0.0
+    print_registry_stats()
+    print(f"Batch finished: {completed} done, {failed} failed in {wall_seconds:.1f}s.")
+    print(f"Throughput: {audio_hours:.2f} audio-hours in {wall_hours:.2f} wall-hours ({throughput:.2f} audio-hours per wall-hour).")
+    if skipped_audio_seconds:
+        print(f"Voice activity pre-pass skipped {skipped_audio_seconds / 3600:.2f} audio-hours of silence.")
+    return manifest
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Transcribe a directory or glob of meeting recordings.")
+    parser.add_argument("source", help="Directory or glob pattern of audio files")
+    parser.add_argument("--output-dir", default=None, help="Where transcriptions are written (default: current directory)")
+    parser.add_argument("--workers", type=int, default=2, help="Alignment/diarization worker processes (0 runs them inline)")
+    parser.add_argument("--manifest", default=None, help="Manifest path used to resume interrupted runs")
+    parser.add_argument("--model", default=None, help="WhisperX model name")
+    parser.add_argument("--language", default=None, help="Language code (default: auto-detect)")
+    parser.add_argument("--batch-size", type=int, default=None, help="ASR batch size")
+    parser.add_argument("--config", default=None, help="JSON settings file")
+    args = parser.parse_args(argv)
+
+    # Same settings as 'python main.py batch', with the flags on top
+    from config import load_configs
+    command_line = {}
+    if args.model:
+        command_line["MODEL_NAME"] = args.model
+    if args.language:
+        command_line["LANGUAGE"] = args.language
+    if args.batch_size:
+        command_line["BATCH_SIZE"] = args.batch_size
+    configs = load_configs(args.config, command_line=command_line)
+
+    manifest = transcribe_batch(args.source, args.output_dir, configs, args.workers, args.manifest)
+    failures = [entry for entry in manifest["files"].values() if entry.get("status") == "failed"]
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,603 @@
+import os
+import sys
+import json
+import argparse
+import inspect
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+#----
+# Configuration
+#----
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+REGRESSION_TOLERANCE = 1.5   # Fail when a result is this many times slower than the baseline
+REGRESSION_SLACK = 0.05      # Seconds ignored before comparing, to absorb noise on fast results
+MEMORY_SLACK_MB = 5.0        # Same for memory results
+STARTUP_REPEATS = 3
+
+# Modules timed in a fresh interpreter, from cheapest to heaviest
+STARTUP_MODULES = ("config", "transcript", "cli", "main", "mixer", "record", "summarizer", "diarization")
+# Results that must always be measured: these modules import without the
+# optional dependencies, so a failure means they are broken
+REQUIRED_RESULTS = ("import_config", "import_transcript", "import_cli", "import_main", "time_to_menu")
+
+# Imports main and draws the menu title, which is what the user waits for
+TIME_TO_MENU_SCRIPT = """
+import time
+start = time.perf_counter()
+import main
+main.print_title()
+print("RESULT", time.perf_counter() - start)
+"""
+
+IMPORT_SCRIPT = """
+import time
+start = time.perf_counter()
+import {module}
+print("RESULT", time.perf_counter() - start)
+"""
+
+def _run_timed(script):
+    """
+    Run `script` in a fresh interpreter and return the seconds it reports, or
+    None when it fails (for example because an optional dependency is missing).
+    """
+    completed = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+    )
+    for line in completed.stdout.splitlines():
+        if line.startswith("RESULT "):
+            return float(line.split()[1])
+    return None
+
+def _best_of(script, repeats):
+    results = [_run_timed(script) for _ in range(repeats)]
+    results = [result for result in results if result is not None]
+    return min(results) if results else None
+
+def benchmark_startup(repeats=STARTUP_REPEATS):
+    """
+    Import time per module and time-to-menu, each measured in a fresh
+    interpreter and reported as the best of `repeats` runs.
+    """
+    results = {}
+    for module in STARTUP_MODULES:
+        results[f"import_{module}"] = _best_of(IMPORT_SCRIPT.format(module=module), repeats)
+    results["time_to_menu"] = _best_of(TIME_TO_MENU_SCRIPT, repeats)
+    return results
+
+def synthetic_word_segments(hours=3.0, speakers=6, words_per_second=2.5, seed=0):
+    """
+    Word segments shaped like WhisperX output for a meeting of `hours`, with
+    speaker turns of random length.
+    """
+    rng = random.Random(seed)
+    vocabulary = ["budget", "agenda", "approve", "motion", "the", "we", "report", "deadline", "team", "next", "quarter", "item"]
+    labels = [f"SPEAKER_{i:02d}" for i in range(speakers)]
+    segments = []
+    current = 0.0
+    speaker = labels[0]
+    turn_left = 0
+    for _ in range(int(hours * 3600 * words_per_second)):
+        if turn_left == 0:
+            speaker = rng.choice(labels)
+            turn_left = rng.randint(1, 60)
+        duration = rng.uniform(0.15, 0.6)
+        segments.append({"word": rng.choice(vocabulary), "start": round(current, 3), "end": round(current + duration, 3), "score": 0.9, "speaker": speaker})
+        current += duration + rng.uniform(0.0, 0.2)
+        turn_left -= 1
+    return segments
+
+def legacy_format_transcription(final_result):
+    """
+    The dict-walking format_transcription that WordTable replaced, kept as the
+    reference for the benchmark.
+    """
+    formatted_output = []
+    current_speaker = None
+    current_text = ""
+    current_start = None
+    current_end = None
+
+    for segment in final_result:
+        speaker = segment.get("speaker", "Unknown")
+        if speaker != current_speaker:
+            if current_speaker is not None:
+                formatted_output.append({"start": current_start, "end": current_end, "text": current_text.strip(), "speaker": current_speaker})
+            current_speaker = speaker
+            current_text = segment["word"] + " "
+            current_start = segment["start"]
+            current_end = segment["end"]
+        else:
+            current_text += segment["word"] + " "
+            current_end = segment["end"]
+
+    if current_speaker is not None:
+        formatted_output.append({"start": current_start, "end": current_end, "text": current_text.strip(), "speaker": current_speaker})
+
+    return formatted_output
+
+def _best_time(function, repeats):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def benchmark_format_transcription(hours=3.0, repeats=5):
+    """
+    WordTable against the legacy dict walk on a synthetic transcript.
+    """
+    from transcript import WordTable
+
+    word_segments = synthetic_word_segments(hours)
+    legacy_seconds, legacy_turns = _best_time(lambda: legacy_format_transcription(word_segments), repeats)
+    table_seconds, table_turns = _best_time(lambda: WordTable.from_word_segments(word_segments).to_turns(), repeats)
+    if table_turns != legacy_turns:
+        raise AssertionError("WordTable turns differ from the legacy format_transcription output")
+
+    legacy_text_seconds, _ = _best_time(
+        lambda: "\n".join(f"Speaker {seg['speaker']}: {seg['text']}" for seg in legacy_format_transcription(word_segments)),
+        repeats,
+    )
+    text_seconds, _ = _best_time(lambda: WordTable.from_word_segments(word_segments).to_text(), repeats)
+    print(f"  {len(word_segments)} words, {len(table_turns)} turns ({hours:g} h synthetic transcript)")
+    return {
+        "legacy_format": legacy_seconds,
+        "wordtable_format": table_seconds,
+        "legacy_text": legacy_text_seconds,
+        "wordtable_text": text_seconds,
+    }
+
+def synthetic_alignment_input(minutes=10.0, segment_seconds=5.0, seed=0, sample_rate=16000):
+    """
+    Speech-like audio (random tones with syllable-rate envelopes) and WhisperX
+    style segments with made-up English text, enough to load the alignment
+    model with realistic work and no recording at hand.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    vocabulary = ["budget", "agenda", "approve", "motion", "the", "we", "report", "deadline", "team", "next", "quarter", "item"]
+    total = int(minutes * 60 * sample_rate)
+    t = np.arange(total) / sample_rate
+    pitch = 120 + 80 * np.repeat(rng.random(int(minutes * 60 * 4) + 1), sample_rate // 4)[:total]
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t)
+    audio = (0.3 * envelope * np.sin(2 * np.pi * pitch * t) + 0.01 * rng.standard_normal(total)).astype(np.float32)
+    segments = []
+    for start in np.arange(0, minutes * 60 - segment_seconds + 1e-9, segment_seconds):
+        words = rng.choice(vocabulary, size=int(segment_seconds * 2.5))
+        segments.append({"start": float(start), "end": float(start + segment_seconds), "text": " ".join(words)})
+    return audio, segments
+
+def benchmark_alignment(minutes=10.0, max_workers=None):
+    """
+    Alignment wall time with 1, 2, 4... worker processes up to the core count,
+    checking that every worker count produces the single-process output.
+    """
+    from config import DEFAULT_CONFIGS
+    try:
+        from alignment import align_parallel
+        from diarization import run_alignment, load_backends
+        load_backends()
+    except ImportError as e:
+        print(f"  alignment benchmark unavailable: {e}")
+        return {"align_1_workers": None}
+
+    configs = dict(DEFAULT_CONFIGS, DEVICE="cpu")
+    audio, segments = synthetic_alignment_input(minutes)
+    max_workers = max_workers or os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= max_workers:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != max_workers:
+        counts.append(max_workers)
+
+    results = {}
+    reference = None
+    for workers in counts:
+        if workers == 1:
+            run_alignment(segments[:1], "en", audio, configs)  # load the model outside the timing
+            function = lambda: run_alignment(segments, "en", audio, configs)
+        else:
+            align_parallel(segments, "en", audio, configs, workers)  # start the pool and warm its models
+            function = lambda: align_parallel(segments, "en", audio, configs, workers)
+        seconds, output = _best_time(function, 1)
+        if reference is None:
+            reference = output
+        elif output != reference:
+            raise AssertionError(f"Alignment with {workers} workers differs from the single-process output")
+        results[f"align_{workers}_workers"] = seconds
+        print(f"  {workers} workers: {seconds:.1f}s ({results['align_1_workers'] / seconds:.2f}x)")
+    print(f"  {len(segments)} segments, {minutes:g} min synthetic audio")
+    return results
+
+# -------
+# Synthetic meetings
+# -------
+# Speaker 0 is the local user on the microphone channel, everybody else comes
+# through the loopback channel. Voices are harmonic tones at a per-speaker
+# pitch with a syllable-rate envelope, which is enough for energy-based code
+# (mixing, VAD) and for timing the models, though not for recognition.
+
+def synthetic_turns(minutes=10.0, speakers=4, seed=0):
+    """
+    Speaker turns (start, end, speaker index) with pauses, and an occasional
+    long silence like a break or people joining late.
+    """
+    rng = random.Random(seed)
+    turns = []
+    current = rng.uniform(0.5, 3.0)
+    speaker = 0
+    while True:
+        duration = rng.uniform(2.0, 20.0)
+        if current + duration > minutes * 60:
+            break
+        turns.append((current, current + duration, speaker))
+        current += duration + (rng.uniform(20.0, 60.0) if rng.random() < 0.05 else rng.uniform(0.2, 1.5))
+        if speakers > 1:
+            speaker = rng.choice([index for index in range(speakers) if index != speaker])
+    return turns
+
+def render_channel(turns, channel_speakers, duration, sample_rate, speakers, seed=0):
+    """
+    float32 waveform of the turns spoken by `channel_speakers`, plus a low noise floor.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    audio = (0.002 * rng.standard_normal(int(duration * sample_rate))).astype(np.float32)
+    pitches = [100.0 + 150.0 * index / max(1, speakers - 1) for index in range(speakers)]
+    for start, end, speaker in turns:
+        if speaker not in channel_speakers:
+            continue
+        first, last = int(start * sample_rate), int(end * sample_rate)
+        t = np.arange(last - first) / sample_rate
+        envelope = np.clip(np.sin(2 * np.pi * 4.5 * t + rng.uniform(0, np.pi)), 0, None)
+        voice = sum(np.sin(2 * np.pi * pitches[speaker] * harmonic * t) / harmonic for harmonic in (1, 2, 3))
+        audio[first:last] += (0.2 * envelope * voice).astype(np.float32)
+    return audio
+
+def synthetic_meeting(minutes=10.0, speakers=4, seed=0, mic_rate=16000, loopback_rate=16000):
+    """
+    Two-channel synthetic meeting: {"mic", "loopback", "turns", "mic_rate",
+    "loopback_rate", "seconds"}.
+    """
+    turns = synthetic_turns(minutes, speakers, seed)
+    seconds = minutes * 60
+    return {
+        "mic": render_channel(turns, {0}, seconds, mic_rate, speakers, seed),
+        "loopback": render_channel(turns, set(range(1, speakers)), seconds, loopback_rate, speakers, seed + 1),
+        "turns": turns,
+        "mic_rate": mic_rate,
+        "loopback_rate": loopback_rate,
+        "seconds": seconds,
+    }
+
+def turns_to_word_segments(turns, words_per_second=2.5, seed=0):
+    """
+    Reference word segments for synthetic turns, shaped like WhisperX output.
+    """
+    rng = random.Random(seed)
+    vocabulary = ["budget", "agenda", "approve", "motion", "the", "we", "report", "deadline", "team", "next", "quarter", "item"]
+    word_segments = []
+    for start, end, speaker in turns:
+        step = 1.0 / words_per_second
+        current = start
+        while current + step <= end:
+            word_segments.append({"word": rng.choice(vocabulary), "start": round(current, 3), "end": round(current + step * 0.8, 3), "score": 0.9, "speaker": f"SPEAKER_{speaker:02d}"})
+            current += step
+    return word_segments
+
+def _peak_memory_mb(function):
+    """
+    Peak Python/NumPy heap allocated while `function` runs (tracemalloc).
+    Kept out of the timed runs because tracing slows allocation down.
+    """
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    finally:
+        tracemalloc.stop()
+
+def benchmark_mix(minutes=10.0, speakers=4, repeats=3):
+    """
+    The record-mix path: 48 kHz mic and 44.1 kHz loopback channel files mixed
+    into the 16 kHz mono WAV, as record_audio_dual does when recording stops.
+    """
+    import soundfile as sf
+    try:
+        from record import mix_channel_files
+    except ImportError as e:
+        print(f"  mix benchmark unavailable: {e}")
+        return {"mix_seconds": None}
+
+    meeting = synthetic_meeting(minutes, speakers, mic_rate=48000, loopback_rate=44100)
+    workdir = tempfile.mkdtemp(prefix="meetsolution_bench_")
+    try:
+        mic_path = os.path.join(workdir, "meeting.mic.wav")
+        loopback_path = os.path.join(workdir, "meeting.loopback.wav")
+        output = os.path.join(workdir, "meeting.wav")
+        sf.write(mic_path, meeting["mic"], meeting["mic_rate"], subtype="PCM_16")
+        sf.write(loopback_path, meeting["loopback"], meeting["loopback_rate"], subtype="PCM_16")
+        del meeting["mic"], meeting["loopback"]
+
+        function = lambda: mix_channel_files(mic_path, loopback_path, output)
+        seconds, _ = _best_time(function, repeats)
+        peak_mb = _peak_memory_mb(function)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print(f"  {minutes:g} min, {speakers} speakers, 48 kHz + 44.1 kHz to 16 kHz")
+    return {
+        "mix_seconds": seconds,
+        "mix_rtf": seconds / meeting["seconds"],
+        "mix_audio_seconds_per_second": meeting["seconds"] / seconds,
+        "mix_peak_mb": peak_mb,
+    }
+
+@contextmanager
+def stub_models(speakers):
+    """
+    Replace the model stages of diarization.transcription_with_diarization
+    with cheap stand-ins, so the pipeline around them (audio handling, VAD,
+    stage graph, speaker assignment, timestamp remapping) can be timed
+    without loading any model. The stand-ins only look at signal energy and
+    work on whatever timeline they are given.
+    """
+    import numpy as np
+    import diarization
+    from vad import detect_speech
+
+    sample_rate = 16000
+    vocabulary = ["budget", "agenda", "approve", "motion", "report", "deadline"]
+
+    def run_asr(audio, configs):
+        segments = []
+        for start, end in detect_speech(audio).regions / sample_rate:
+            for chunk_start in np.arange(start, end, 10.0):
+                chunk_end = min(end, chunk_start + 10.0)
+                count = max(1, int((chunk_end - chunk_start) * 2.5))
+                segments.append({"start": float(chunk_start), "end": float(chunk_end), "text": " ".join(vocabulary[i % len(vocabulary)] for i in range(count))})
+        return {"segments": segments, "language": "en"}
+
+    def align_segments(segments, language, audio, configs):
+        aligned, word_segments = [], []
+        for segment in segments:
+            words = segment["text"].split()
+            step = (segment["end"] - segment["start"]) / len(words)
+            segment_words = [
+                {"word": word, "start": round(segment["start"] + i * step, 3), "end": round(segment["start"] + (i + 0.8) * step, 3), "score": 0.9}
+                for i, word in enumerate(words)
+            ]
+            aligned.append(dict(segment, words=segment_words))
+            word_segments.extend(segment_words)
+        return {"segments": aligned, "word_segments": word_segments}
+
+    def run_diarization(audio, configs, return_embeddings=False):
+        # Label each 5 s block by its loudness rank, a deterministic stand-in for clustering
+        block = 5 * sample_rate
+        energy = [float(np.mean(np.square(audio[i:i + block]))) for i in range(0, len(audio), block)]
+        edges = np.quantile(energy, np.linspace(0, 1, speakers + 1)[1:-1]) if energy else []
+        segments = [(i * 5.0, (i + 1) * 5.0, f"SPEAKER_{int(np.searchsorted(edges, value)):02d}") for i, value in enumerate(energy)]
+        return (segments, None) if return_embeddings else segments
+
+    def assign_speakers(diarize_segments, result_aligned):
+        for word in result_aligned["word_segments"]:
+            word["speaker"] = diarize_segments[min(int(word["start"] // 5.0), len(diarize_segments) - 1)][2]
+        return result_aligned["word_segments"]
+
+    stubs = {"run_asr": run_asr, "align_segments": align_segments, "run_diarization": run_diarization, "assign_speakers": assign_speakers}
+    originals = {name: getattr(diarization, name) for name in stubs}
+    for name, function in stubs.items():
+        setattr(diarization, name, function)
+    try:
+        yield
+    finally:
+        for name, function in originals.items():
+            setattr(diarization, name, function)
+
+def benchmark_pipeline(minutes=10.0, speakers=4, backend="stub"):
+    """
+    transcription_with_diarization on a synthetic meeting, with stub models
+    (pipeline overhead only) or the real ones (backend="real").
+    """
+    from config import DEFAULT_CONFIGS
+    from profiling import peak_rss_mb
+    import diarization
+
+    # Stub models never touch WhisperX or torch, so only real runs need them
+    if backend != "stub":
+        try:
+            diarization.load_backends()
+        except ImportError as e:
+            print(f"  pipeline benchmark unavailable: {e}")
+            return {"pipeline_seconds": None}
+
+    meeting = synthetic_meeting(minutes, speakers)
+    audio = meeting["mic"] + meeting["loopback"]
+    del meeting["mic"], meeting["loopback"]
+    configs = dict(DEFAULT_CONFIGS, RESULT_CACHE=False)
+    if backend == "stub":
+        context = stub_models(speakers)
+    else:
+        context = contextmanager(lambda: (yield))()
+        # Load the models once so the timing covers transcription, not downloads
+        diarization.transcription_with_diarization(audio[:30 * 16000], configs, sample_rate=16000)
+
+    with context:
+        function = lambda: diarization.transcription_with_diarization(audio, configs, sample_rate=16000)
+        start = time.perf_counter()
+        word_segments = function()
+        seconds = time.perf_counter() - start
+        peak_mb = _peak_memory_mb(function) if backend == "stub" else None
+    print(f"  {minutes:g} min, {speakers} speakers, {backend} models, {len(word_segments)} words")
+    return {
+        "pipeline_seconds": seconds,
+        "pipeline_rtf": seconds / meeting["seconds"],
+        "pipeline_audio_seconds_per_second": meeting["seconds"] / seconds,
+        "pipeline_peak_mb": peak_mb,
+        "process_rss_peak_mb": peak_rss_mb(),
+    }
+
+def benchmark_summary(minutes=10.0, speakers=4, repeats=3):
+    """
+    generate_summary against a stub LLM that answers instantly, which times the
+    splitting, map-reduce and prompt handling around the model.
+    """
+    try:
+        from langchain_core.language_models.fake import FakeListLLM
+        from summarizer import generate_summary, split_transcript, prompt_budget, map_template
+    except ImportError as e:
+        print(f"  summary benchmark unavailable: {e}")
+        return {"summary_seconds": None}
+    from transcript import WordTable
+
+    transcricao = WordTable.from_word_segments(turns_to_word_segments(synthetic_turns(minutes, speakers))).to_text()
+    note = "1. Main Subject: budget\n2. My Activities: report\n3. Goals: approve the motion\n4. The Most Important of the Meeting: budget approved\n5. Deadlines / Deliverables: next quarter"
+    llm = FakeListLLM(responses=[note])
+    seconds, _ = _best_time(lambda: generate_summary(transcricao, model=llm), repeats)
+    peak_mb = _peak_memory_mb(lambda: generate_summary(transcricao, model=llm))
+    chunks = len(split_transcript(transcricao, prompt_budget(map_template)))
+    print(f"  {minutes:g} min transcript, {len(transcricao)} characters, {chunks} map chunks")
+    return {
+        "summary_seconds": seconds,
+        "summary_characters_per_second": len(transcricao) / seconds,
+        "summary_peak_mb": peak_mb,
+    }
+
+BENCHMARKS = {
+    "startup": benchmark_startup,
+    "format": benchmark_format_transcription,
+    "align": benchmark_alignment,
+    "mix": benchmark_mix,
+    "pipeline": benchmark_pipeline,
+    "summary": benchmark_summary,
+}
+
+def load_baseline(path=BASELINE_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_baseline(baseline, path=BASELINE_FILE):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+
+# Result names say what they measure: "*_per_second" is a throughput (higher is
+# better), "*_mb" memory and "*_rtf" a real-time factor. Anything else is seconds.
+
+def higher_is_better(name):
+    return name.endswith("_per_second")
+
+def format_value(name, value):
+    if name.endswith("_per_second"):
+        return f"{value:.1f}/s"
+    if name.endswith("_mb"):
+        return f"{value:.1f} MB"
+    if name.endswith("_rtf"):
+        return f"{value:.4f}x"
+    return f"{value:.3f}s"
+
+def find_regressions(results, baseline, tolerance=REGRESSION_TOLERANCE, slack=REGRESSION_SLACK):
+    """
+    Names of the results that are more than `tolerance` times worse than their
+    baseline: slower, lower throughput or more memory. A required result that
+    could not be measured is always a regression.
+    """
+    regressions = []
+    for name, value in results.items():
+        reference = baseline.get(name)
+        if value is None and name in REQUIRED_RESULTS:
+            regressions.append(name)
+            continue
+        if value is None or reference is None:
+            continue
+        if higher_is_better(name):
+            regressed = value * tolerance < reference
+        elif name.endswith("_mb"):
+            regressed = value > reference * tolerance + MEMORY_SLACK_MB
+        elif name.endswith("_rtf"):
+            regressed = value > reference * tolerance
+        else:
+            regressed = value > reference * tolerance + slack
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+def unchecked_results(results, baseline):
+    """
+    Names of the measured results that have no baseline to compare with.
+    """
+    return [name for name, value in results.items() if value is not None and baseline.get(name) is None]
+
+def print_results(suite, results, baseline):
+    print(f"\n{suite}:")
+    for name, value in results.items():
+        reference = baseline.get(name)
+        value_text = format_value(name, value) if value is not None else "FAILED" if name in REQUIRED_RESULTS else "unavailable"
+        reference_text = f" (baseline {format_value(name, reference)})" if reference is not None else ""
+        print(f"  {name:<36} {value_text}{reference_text}")
+
+def suite_options(suite, args):
+    """
+    The fixture options a suite accepts, and the baseline key they give it, so
+    runs at different sizes are only compared with each other.
+    """
+    accepted = inspect.signature(BENCHMARKS[suite]).parameters
+    options = {name: getattr(args, name) for name in ("minutes", "speakers", "backend") if name in accepted}
+    key = " ".join([suite] + [f"{name}={value:g}" if isinstance(value, float) else f"{name}={value}" for name, value in options.items()])
+    return options, key
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run MeetSolution benchmarks and compare them with the stored baseline.")
+    parser.add_argument("suites", nargs="*", default=list(BENCHMARKS), help=f"Benchmarks to run: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--update-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE, help="Allowed slowdown factor before failing")
+    parser.add_argument("--minutes", type=float, default=10.0, help="Length of the synthetic meeting")
+    parser.add_argument("--speakers", type=int, default=4, help="Speakers in the synthetic meeting")
+    parser.add_argument("--backend", choices=("stub", "real"), default="stub", help="Models used by the pipeline benchmark")
+    args = parser.parse_args(argv)
+
+    baseline = load_baseline()
+    regressions = []
+    unchecked = []
+    for suite in args.suites:
+        options, key = suite_options(suite, args)
+        results = BENCHMARKS[suite](**options)
+        suite_baseline = baseline.get(key, {})
+        print_results(key, results, suite_baseline)
+        regressions += [f"{key}: {name}" for name in find_regressions(results, suite_baseline, args.tolerance)]
+        unchecked += [f"{key}: {name}" for name in unchecked_results(results, suite_baseline)]
+        if args.update_baseline:
+            baseline[key] = {name: value for name, value in results.items() if value is not None}
+
+    if args.update_baseline:
+        save_baseline(baseline)
+        print(f"\nBaseline saved to {BASELINE_FILE}")
+        return 0
+    if regressions:
+        print(f"\nRegressions beyond {args.tolerance}x baseline: {', '.join(regressions)}")
+        return 1
+    # A result without a baseline was not checked, so it must not read as a pass
+    if unchecked:
+        print(f"\nWARNING: no baseline in {BASELINE_FILE} for {', '.join(unchecked)}.")
+        print("These results were not checked. Run with --update-baseline on a reference machine to record them.")
+        return 2
+    print("\nNo regressions.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
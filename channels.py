@@ -0,0 +1,162 @@
+import numpy as np
+from scipy.signal import resample_poly
+from mixer import TARGET_SAMPLE_RATE
+from vad import SpeechMap, FRAME_SECONDS, PADDING_SECONDS, frame_energy_db, mask_runs, speech_threshold
+
+#----
+# Separate-channel diarization
+#----
+# With KEEP_CHANNELS the recorder writes a stereo file: the microphone on the
+# left channel and the loopback (everyone else) on the right. Whoever is loud
+# on the microphone and not on the loopback is the person recording, so "Me"
+# segments come from channel energy alone. DIARIZATION_MODE picks what
+# happens to the rest:
+#   "pyannote"  ignore the channels and diarize the mix (the default)
+#   "channels"  label everything else "Remote" (1:1 calls need nothing more)
+#   "hybrid"    run pyannote only on the loopback channel's speech to tell the
+#               remote people apart
+
+DIARIZATION_MODES = ("pyannote", "channels", "hybrid")
+ME_LABEL = "Me"
+REMOTE_LABEL = "Remote"
+DOMINANCE_DB = 6              # A channel this far below the other (relative to its own level) is echo
+MIN_TURN_SECONDS = 0.3        # Shorter turns and pauses are smoothed away
+
+def has_channels(audio):
+    """
+    True when `audio` (a file path or an array) holds separate mic/loopback
+    channels.
+    """
+    if isinstance(audio, str):
+        import soundfile as sf
+        try:
+            return sf.info(audio).channels >= 2
+        except RuntimeError:
+            return False
+    audio = np.asarray(audio)
+    return audio.ndim == 2 and audio.shape[1] >= 2
+
+def use_channels(audio, configs):
+    """
+    Whether the configured DIARIZATION_MODE applies to `audio`.
+    """
+    mode = configs.get("DIARIZATION_MODE", "pyannote")
+    if mode not in DIARIZATION_MODES:
+        raise ValueError(f"Unknown DIARIZATION_MODE: {mode} (expected {', '.join(DIARIZATION_MODES)})")
+    if mode == "pyannote":
+        return False
+    if not has_channels(audio):
+        print(f"DIARIZATION_MODE '{mode}' needs a stereo mic/loopback recording, using pyannote on the mix.")
+        return False
+    return True
+
+def load_channels(audio, sample_rate=None):
+    """
+    (mic, loopback) 16 kHz float32 waveforms of a stereo file path or an
+    (samples, 2) array at `sample_rate`.
+    """
+    if isinstance(audio, str):
+        import soundfile as sf
+        audio, sample_rate = sf.read(audio, dtype="float32", always_2d=True)
+    audio = np.asarray(audio, dtype=np.float32)
+    channels = [audio[:, 0], audio[:, 1]]
+    if sample_rate is not None and int(sample_rate) != TARGET_SAMPLE_RATE:
+        divisor = np.gcd(int(sample_rate), TARGET_SAMPLE_RATE)
+        channels = [resample_poly(channel, TARGET_SAMPLE_RATE // divisor, int(sample_rate) // divisor).astype(np.float32) for channel in channels]
+    return channels[0], channels[1]
+
+def _smooth(mask, frames):
+    """
+    Fill pauses and then drop turns shorter than `frames`.
+    """
+    mask = mask.copy()
+    for value in (False, True):
+        for start, end in mask_runs(mask == value):
+            if end - start < frames and (value or (start > 0 and end < len(mask))):
+                mask[start:end] = not value
+    return mask
+
+def channel_activity(mic, loopback, sample_rate=TARGET_SAMPLE_RATE):
+    """
+    Frame masks (me, remote) of who is talking. Each channel is compared with
+    its own speech level, so a quiet microphone still wins over the remote
+    voice leaking into it from the speakers. Frames where both sides talk at
+    similar levels are in both masks.
+    """
+    frame_samples = max(1, int(FRAME_SECONDS * sample_rate))
+    length = min(len(mic), len(loopback))
+    energies = [frame_energy_db(channel[:length], frame_samples) for channel in (mic, loopback)]
+    if len(energies[0]) == 0:
+        empty = np.zeros(0, dtype=bool)
+        return empty, empty, frame_samples
+
+    active = [energy > speech_threshold(energy) for energy in energies]
+    relative = [energy - np.percentile(energy, 95) for energy in energies]
+    me = active[0] & (~active[1] | (relative[0] >= relative[1] - DOMINANCE_DB))
+    remote = active[1] & (~active[0] | (relative[1] >= relative[0] - DOMINANCE_DB))
+    frames = max(1, int(MIN_TURN_SECONDS / FRAME_SECONDS))
+    return _smooth(me, frames), _smooth(remote, frames), frame_samples
+
+def segments_frame(segments):
+    """
+    Diarization segments [(start, end, speaker)] as the DataFrame that
+    whisperx.assign_word_speakers expects.
+    """
+    import pandas as pd
+    return pd.DataFrame(segments, columns=["start", "end", "speaker"]).sort_values("start", ignore_index=True)
+
+def _remote_speakers(loopback, remote_runs, configs):
+    """
+    pyannote over the loopback speech only. Returns segment tuples on the
+    original timeline and the speaker embeddings, if any.
+    """
+    from diarization import diarize_for_configs
+
+    padding = int(PADDING_SECONDS * TARGET_SAMPLE_RATE)
+    regions = np.stack([np.maximum(remote_runs[:, 0] - padding, 0), np.minimum(remote_runs[:, 1] + padding, len(loopback))], axis=1)
+    # Padding can make neighbouring regions overlap; merge them
+    merged = [list(regions[0])]
+    for start, end in regions[1:]:
+        if start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    speech_map = SpeechMap(merged, len(loopback))
+
+    # The person at the microphone is not on the loopback
+    remote_configs = dict(configs)
+    for key in ("SPEAKER_COUNT", "MAX_SPEAKERS"):
+        if configs.get(key):
+            remote_configs[key] = max(1, configs[key] - 1)
+    result = diarize_for_configs(speech_map.compact(loopback), remote_configs)
+    embeddings = None
+    if isinstance(result, tuple):
+        result, embeddings = result
+    starts = speech_map.to_original(result["start"].to_numpy(), "right")
+    ends = speech_map.to_original(result["end"].to_numpy(), "left")
+    return list(zip(starts.tolist(), ends.tolist(), result["speaker"].tolist())), embeddings
+
+def diarize_channels(audio, configs, sample_rate=None):
+    """
+    Diarize a stereo mic/loopback recording with the configured
+    DIARIZATION_MODE. Segments are on the original timeline. Returns the
+    segments, or (segments, embeddings) when hybrid mode has embeddings for
+    the remote speakers.
+    """
+    mic, loopback = load_channels(audio, sample_rate)
+    me, remote, frame_samples = channel_activity(mic, loopback)
+    me_runs = mask_runs(me) * frame_samples
+    remote_runs = mask_runs(remote) * frame_samples
+    segments = [(start / TARGET_SAMPLE_RATE, end / TARGET_SAMPLE_RATE, ME_LABEL) for start, end in me_runs.tolist()]
+
+    embeddings = None
+    if configs.get("DIARIZATION_MODE") == "hybrid" and len(remote_runs):
+        remote_segments, embeddings = _remote_speakers(loopback, remote_runs, configs)
+        segments += remote_segments
+    else:
+        segments += [(start / TARGET_SAMPLE_RATE, end / TARGET_SAMPLE_RATE, REMOTE_LABEL) for start, end in remote_runs.tolist()]
+
+    me_seconds = sum(end - start for start, end, _ in segments[:len(me_runs)])
+    print(f"Channel diarization: {me_seconds:.0f}s from the microphone, {len(remote_runs)} remote turns.")
+    frame = segments_frame(segments)
+    return (frame, embeddings) if embeddings else frame
@@ -0,0 +1,475 @@
+import io
+import os
+import sys
+import json
+import asyncio
+import sqlite3
+import argparse
+import contextlib
+from profiling import stage, add_sink, remove_sink, JsonLinesSink, TraceRecorder, format_records
+
+#----
+# Exit codes
+#----
+
+EXIT_OK = 0
+EXIT_FAILURE = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+
+# Progress messages from the pipeline go to stderr so stdout stays clean for piping
+log = contextlib.redirect_stdout(sys.stderr)
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+def write_output(text, path):
+    """
+    Write `text` to `path`, or to stdout when `path` is None or "-".
+    """
+    if path in (None, "-"):
+        sys.stdout.write(text)
+        if not text.endswith("\n"):
+            sys.stdout.write("\n")
+        sys.stdout.flush()
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    eprint(f"Saved to {path}")
+
+def read_text(path):
+    if path == "-":
+        return sys.stdin.read()
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+def print_profile(records):
+    eprint("\nProfile:")
+    eprint(format_records(records))
+
+# -------
+# Commands
+# -------
+
+def command_record(args, configs, profile):
+    from record import record_audio_dual
+
+    with log, stage("record", profile):
+        audio_file = record_audio_dual(
+            args.output, args.mic, args.loopback,
+            normalize=args.normalize, duration=args.duration, prompt_devices=False,
+            keep_channels=args.keep_channels or configs["KEEP_CHANNELS"],
+        )
+    if not audio_file:
+        eprint("No data recorded.")
+        return EXIT_FAILURE
+    write_output(audio_file, None)
+    return EXIT_OK
+
+def transcribe_audio(source, configs, profile):
+    """
+    Transcribe a file path, or WAV/FLAC bytes read from stdin when `source` is "-".
+    """
+    from diarization import transcription_with_diarization
+
+    timings = {}
+    with log:
+        if source == "-":
+            import soundfile as sf
+            audio, sample_rate = sf.read(io.BytesIO(sys.stdin.buffer.read()), dtype="float32", always_2d=True)
+            final_result = transcription_with_diarization(audio.mean(axis=1), configs, timings, sample_rate=sample_rate)
+        else:
+            final_result = transcription_with_diarization(source, configs, timings)
+    profile.update({f"transcribe.{name}": seconds for name, seconds in timings.items()})
+    return final_result
+
+def render_transcript(final_result, output_format):
+    from transcript import WordTable
+
+    table = WordTable.from_word_segments(final_result)
+    if output_format == "json":
+        return json.dumps(table.to_turns(), ensure_ascii=False, indent=2)
+    if output_format == "timestamped":
+        return table.to_timestamped_text()
+    return table.to_text()
+
+def command_transcribe(args, configs, profile):
+    if args.audio != "-" and not os.path.exists(args.audio):
+        eprint(f"File not found: {args.audio}")
+        return EXIT_FAILURE
+    final_result = transcribe_audio(args.audio, configs, profile)
+    with stage("format", profile):
+        text = render_transcript(final_result, args.format)
+    write_output(text, args.output)
+    if args.audio != "-":
+        from search_index import index_meeting
+
+        with log, stage("index", profile):
+            index_meeting(os.path.splitext(os.path.basename(args.audio))[0], final_result, configs, args.audio)
+    return EXIT_OK
+
+def summarize_text(transcricao, summary_file, profile):
+    from summarizer import stream_summary, format_metrics
+
+    with log, stage("summarize", profile):
+        summary, metrics = asyncio.run(stream_summary(transcricao, summary_file))
+    eprint(f"Summary: {format_metrics(metrics)}")
+    return summary
+
+def command_summarize(args, configs, profile):
+    transcricao = read_text(args.transcript)
+    if not transcricao.strip():
+        eprint("Empty transcription.")
+        return EXIT_FAILURE
+    to_file = args.output not in (None, "-")
+    summary = summarize_text(transcricao, args.output if to_file else None, profile)
+    if to_file:
+        eprint(f"Saved to {args.output}")
+    else:
+        write_output(summary, None)
+    return EXIT_OK
+
+def command_run(args, configs, profile):
+    """
+    Record (or take an existing file), transcribe and summarize, saving
+    <name>.txt and summary_<name>.txt like the interactive "Do everything".
+    """
+    from mixer import TARGET_SAMPLE_RATE
+    from transcript import WordTable
+
+    if args.audio:
+        if not os.path.exists(args.audio):
+            eprint(f"File not found: {args.audio}")
+            return EXIT_FAILURE
+        audio_file = args.audio
+        final_result = transcribe_audio(audio_file, configs, profile)
+    else:
+        from record import record_audio_dual
+        from diarization import transcription_with_diarization
+
+        with log, stage("record", profile):
+            recording = record_audio_dual(
+                args.output, args.mic, args.loopback, normalize=args.normalize,
+                return_audio=True, duration=args.duration, prompt_devices=False,
+                keep_channels=args.keep_channels or configs["KEEP_CHANNELS"],
+            )
+        if not recording:
+            eprint("No data recorded.")
+            return EXIT_FAILURE
+        audio_file, audio = recording
+        timings = {}
+        with log:
+            final_result = transcription_with_diarization(audio, configs, timings, sample_rate=TARGET_SAMPLE_RATE)
+        profile.update({f"transcribe.{name}": seconds for name, seconds in timings.items()})
+
+    base_name = os.path.splitext(os.path.basename(audio_file))[0]
+    output_dir = args.output_dir or os.getcwd()
+    transcription_file = os.path.join(output_dir, f"{base_name}.txt")
+    with stage("format", profile):
+        transcricao = WordTable.from_word_segments(final_result).to_text()
+    write_output(transcricao, transcription_file)
+    from search_index import index_meeting
+
+    with log, stage("index", profile):
+        index_meeting(base_name, final_result, configs, audio_file)
+
+    if args.no_summary:
+        return EXIT_OK
+    summary_file = os.path.join(output_dir, f"summary_{base_name}.txt")
+    summarize_text(transcricao, summary_file, profile)
+    eprint(f"Saved to {summary_file}")
+    return EXIT_OK
+
+def command_batch(args, configs, profile):
+    from batch import transcribe_batch
+
+    with log, stage("batch", profile):
+        manifest = transcribe_batch(args.source, args.output_dir, configs, args.workers, args.manifest)
+    failures = [entry for entry in manifest["files"].values() if entry.get("status") == "failed"]
+    return EXIT_FAILURE if failures else EXIT_OK
+
+def command_serve(args, configs, profile):
+    from server import serve
+
+    serve(
+        configs, args.host, args.port, warm=not args.no_warm, queue_size=args.queue_size,
+        transcribe_workers=args.transcribe_workers, summarize_workers=args.summarize_workers, job_ttl=args.job_ttl,
+    )
+    return EXIT_OK
+
+def command_autotune(args, configs, profile):
+    from autotune import tune
+
+    with log, stage("autotune", profile):
+        tune(configs, args.name, args.audio, args.seconds)
+    return EXIT_OK
+
+def command_search(args, configs, profile):
+    from search_index import connect, search, format_hit
+
+    path = configs.get("SEARCH_INDEX")
+    if not path or not os.path.exists(path):
+        eprint("No search index yet; transcribe a meeting or run 'index add'.")
+        return EXIT_FAILURE
+    connection = connect(path)
+    try:
+        with stage("search", profile):
+            hits = search(connection, " ".join(args.query), args.limit, args.speaker, args.meeting, args.raw)
+    except sqlite3.OperationalError as e:
+        eprint(f"Invalid query: {e}")
+        return EXIT_USAGE
+    finally:
+        connection.close()
+    if args.json:
+        write_output(json.dumps(hits, ensure_ascii=False, indent=2), None)
+    else:
+        for hit in hits:
+            write_output(format_hit(hit), None)
+    return EXIT_OK if hits else EXIT_FAILURE
+
+def command_index(args, configs, profile):
+    from search_index import connect, upsert_meeting, remove_meeting, list_meetings, parse_transcript
+
+    path = configs.get("SEARCH_INDEX")
+    if not path:
+        eprint("SEARCH_INDEX is not set.")
+        return EXIT_USAGE
+    connection = connect(path)
+    try:
+        if args.action == "list":
+            for name, turns, source, _ in list_meetings(connection):
+                write_output(f"{name}\t{turns} turn(s)\t{source or '-'}", None)
+            return EXIT_OK
+
+        if args.action == "remove":
+            if not remove_meeting(connection, args.name):
+                eprint(f"Unknown meeting: {args.name}")
+                return EXIT_FAILURE
+            eprint(f"Removed {args.name}.")
+            return EXIT_OK
+
+        with stage("index", profile):
+            for transcript_file in args.transcripts:
+                if not os.path.exists(transcript_file):
+                    eprint(f"File not found: {transcript_file}")
+                    return EXIT_FAILURE
+                text = read_text(transcript_file)
+                turns = json.loads(text) if transcript_file.endswith(".json") else parse_transcript(text)
+                name = os.path.splitext(os.path.basename(transcript_file))[0]
+                count = upsert_meeting(connection, name, turns, os.path.abspath(transcript_file))
+                eprint(f"Indexed {count} turns of '{name}'.")
+        return EXIT_OK
+    finally:
+        connection.close()
+
+def command_speakers(args, configs, profile):
+    from speaker_index import SpeakerIndex, MATCH_THRESHOLD
+
+    path = configs.get("SPEAKER_INDEX")
+    if not path:
+        eprint("SPEAKER_INDEX is not set.")
+        return EXIT_USAGE
+    index = SpeakerIndex.load(path)
+
+    if args.action == "list":
+        for name, count in zip(index.names, index.counts.tolist()):
+            write_output(f"{name}\t{count} recording(s)", None)
+        return EXIT_OK
+
+    if args.action == "remove":
+        try:
+            index.remove(args.name)
+        except KeyError:
+            eprint(f"Unknown speaker: {args.name}")
+            return EXIT_FAILURE
+        index.save(path)
+        eprint(f"Removed {args.name}.")
+        return EXIT_OK
+
+    from diarization import speaker_embeddings
+
+    if not os.path.exists(args.audio):
+        eprint(f"File not found: {args.audio}")
+        return EXIT_FAILURE
+    with log, stage("speaker_embeddings", profile):
+        embeddings = speaker_embeddings(args.audio, configs)
+    if not embeddings:
+        eprint("No speaker embeddings available for this recording.")
+        return EXIT_FAILURE
+
+    if args.action == "identify":
+        labels = sorted(embeddings)
+        if len(index):
+            best, scores = index.search([embeddings[label] for label in labels], configs.get("SPEAKER_SEARCH", "auto"))
+            mapping = index.match(embeddings, method=configs.get("SPEAKER_SEARCH", "auto"))
+            for label, row, score in zip(labels, best.tolist(), scores.tolist()):
+                status = "match" if mapping.get(label) else f"below {MATCH_THRESHOLD}" if score < MATCH_THRESHOLD else "taken"
+                write_output(f"{label}\t{index.names[row]}\t{score:.3f}\t{status}", None)
+        else:
+            for label in labels:
+                write_output(f"{label}\t-\t-\tempty index", None)
+        return EXIT_OK
+
+    if args.label not in embeddings:
+        eprint(f"Unknown label {args.label}; this recording has {', '.join(sorted(embeddings))}.")
+        return EXIT_FAILURE
+    index.enroll(args.name, embeddings[args.label])
+    index.save(path)
+    eprint(f"Enrolled {args.name} from {args.label} ({len(index)} speakers in {path}).")
+    return EXIT_OK
+
+# -------
+# Argument parsing
+# -------
+
+def add_recording_arguments(parser):
+    parser.add_argument("--duration", type=float, default=None, help="Seconds to record (default: until ENTER)")
+    parser.add_argument("--mic", type=int, default=None, help="Microphone device ID (default: system default)")
+    parser.add_argument("--loopback", type=int, default=None, help="Loopback device ID (default: system default)")
+    parser.add_argument("--normalize", action="store_true", help="Normalize the mix to a fixed peak level")
+    parser.add_argument("--keep-channels", action="store_true", help="Save a stereo WAV (mic left, loopback right) for DIARIZATION_MODE channels/hybrid")
+
+def add_config_arguments(parser, default=None):
+    """
+    --config, --tuning-profile and --set. Subcommands that repeat them pass
+    default=argparse.SUPPRESS so they do not reset the top-level values.
+    """
+    parser.add_argument("--config", default=default, help="JSON settings file with DEFAULT_CONFIGS keys (MEETSOLUTION_<KEY> env vars override it)")
+    parser.add_argument("--tuning-profile", default=default, metavar="NAME", help="Apply a profile saved by 'autotune' (file settings and --set still override it)")
+    parser.add_argument("--set", action="append", default=[] if default is None else default, metavar="KEY=VALUE", help="Override a single setting, e.g. --set MODEL_NAME=small")
+
+def build_parser():
+    from autotune import add_arguments as add_autotune_arguments
+
+    parser = argparse.ArgumentParser(prog="meetsolution", description="Record, transcribe and summarize meetings without the interactive menu.")
+    add_config_arguments(parser)
+    parser.add_argument("--profile", action="store_true", help="Print per-stage wall/CPU time, memory and real-time factor to stderr")
+    parser.add_argument("--profile-log", default=None, metavar="PATH", help="Append per-stage profiling records to a JSON lines file")
+    parser.add_argument("--trace", default=None, metavar="PATH", help="Write a Chrome trace of the stages (chrome://tracing, Perfetto)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = subparsers.add_parser("record", help="Record microphone and loopback, print the WAV path")
+    record_parser.add_argument("-o", "--output", default=None, help="WAV file name (default: timestamped)")
+    add_recording_arguments(record_parser)
+    record_parser.set_defaults(handler=command_record)
+
+    transcribe_parser = subparsers.add_parser("transcribe", help="Transcribe an audio file ('-' reads WAV/FLAC from stdin)")
+    transcribe_parser.add_argument("audio", help="Audio file path or '-'")
+    transcribe_parser.add_argument("-o", "--output", default=None, help="Output file (default: stdout)")
+    transcribe_parser.add_argument("--format", choices=("text", "timestamped", "json"), default="text")
+    transcribe_parser.set_defaults(handler=command_transcribe)
+
+    summarize_parser = subparsers.add_parser("summarize", help="Summarize a transcription file ('-' reads stdin)")
+    summarize_parser.add_argument("transcript", help="Transcription file or '-'")
+    summarize_parser.add_argument("-o", "--output", default=None, help="Output file (default: stdout)")
+    summarize_parser.set_defaults(handler=command_summarize)
+
+    run_parser = subparsers.add_parser("run", help="Record (or use --audio), transcribe and summarize")
+    run_parser.add_argument("--audio", default=None, help="Use an existing audio file instead of recording")
+    run_parser.add_argument("-o", "--output", default=None, help="WAV file name when recording")
+    run_parser.add_argument("--output-dir", default=None, help="Where transcription and summary are written")
+    run_parser.add_argument("--no-summary", action="store_true", help="Stop after the transcription")
+    add_recording_arguments(run_parser)
+    run_parser.set_defaults(handler=command_run)
+
+    batch_parser = subparsers.add_parser("batch", help="Transcribe a directory or glob of recordings")
+    batch_parser.add_argument("source", help="Directory or glob pattern of audio files")
+    batch_parser.add_argument("--output-dir", default=None)
+    batch_parser.add_argument("--workers", type=int, default=2)
+    batch_parser.add_argument("--manifest", default=None)
+    batch_parser.set_defaults(handler=command_batch)
+
+    speakers_parser = subparsers.add_parser("speakers", help="Manage the index of known speakers")
+    speakers_actions = speakers_parser.add_subparsers(dest="action", required=True)
+    speakers_actions.add_parser("list", help="List enrolled speakers")
+    enroll_parser = speakers_actions.add_parser("enroll", help="Enroll (or refine) a person from a diarized recording")
+    enroll_parser.add_argument("name", help="Name shown in transcripts")
+    enroll_parser.add_argument("audio", help="Recording the person speaks in")
+    enroll_parser.add_argument("--label", required=True, help="Their SPEAKER_xx label in that recording's transcript")
+    identify_parser = speakers_actions.add_parser("identify", help="Show the best enrolled match for each speaker of a recording")
+    identify_parser.add_argument("audio")
+    remove_parser = speakers_actions.add_parser("remove", help="Remove a person from the index")
+    remove_parser.add_argument("name")
+    speakers_parser.set_defaults(handler=command_speakers)
+
+    search_parser = subparsers.add_parser("search", help="Search the transcripts of every indexed meeting")
+    search_parser.add_argument("query", nargs="+", help='Words that must all appear; "quoted phrases" and prefix* work')
+    search_parser.add_argument("-n", "--limit", type=int, default=20)
+    search_parser.add_argument("--speaker", default=None, help="Only turns of this speaker")
+    search_parser.add_argument("--meeting", default=None, help="Only this meeting")
+    search_parser.add_argument("--raw", action="store_true", help="Pass the query to SQLite FTS5 unchanged (OR, NEAR, column:...)")
+    search_parser.add_argument("--json", action="store_true", help="Print the hits as JSON")
+    search_parser.set_defaults(handler=command_search)
+
+    index_parser = subparsers.add_parser("index", help="Manage the transcript search index")
+    index_actions = index_parser.add_subparsers(dest="action", required=True)
+    index_actions.add_parser("list", help="List indexed meetings")
+    add_parser = index_actions.add_parser("add", help="Index (or re-index) saved transcripts (.txt, or .json from --format json)")
+    add_parser.add_argument("transcripts", nargs="+")
+    remove_index_parser = index_actions.add_parser("remove", help="Drop a meeting from the index")
+    remove_index_parser.add_argument("name")
+    index_parser.set_defaults(handler=command_index)
+
+    serve_parser = subparsers.add_parser("serve", help="Serve transcription and summary jobs over HTTP")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    serve_parser.add_argument("--queue-size", type=int, default=32, help="Queued uploads before new ones are rejected with 503")
+    serve_parser.add_argument("--transcribe-workers", type=int, default=1)
+    serve_parser.add_argument("--summarize-workers", type=int, default=2)
+    serve_parser.add_argument("--job-ttl", type=float, default=3600, help="Seconds a finished job's results stay available")
+    serve_parser.add_argument("--no-warm", action="store_true", help="Load models on the first job instead of at startup")
+    serve_parser.set_defaults(handler=command_serve)
+
+    autotune_parser = subparsers.add_parser("autotune", help="Probe this machine, calibrate and save a tuning profile")
+    # Also accepted after the subcommand, so "python autotune.py --config x.json" works
+    add_config_arguments(autotune_parser, default=argparse.SUPPRESS)
+    add_autotune_arguments(autotune_parser)
+    autotune_parser.set_defaults(handler=command_autotune)
+
+    return parser
+
+def main(argv=None):
+    from config import load_configs
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    try:
+        command_line = {}
+        for assignment in args.set:
+            key, _, value = assignment.partition("=")
+            command_line[key.strip().upper()] = value
+        # --set TUNING_PROFILE=NAME selects a profile like --tuning-profile does
+        configs = load_configs(args.config, profile=args.tuning_profile, command_line=command_line)
+    except (OSError, ValueError) as e:
+        eprint(f"Configuration error: {e}")
+        return EXIT_USAGE
+
+    profile = {}
+    recorder = add_sink(TraceRecorder())
+    sinks = [recorder]
+    if args.profile_log:
+        sinks.append(add_sink(JsonLinesSink(args.profile_log)))
+    try:
+        with stage("total", profile):
+            status = args.handler(args, configs, profile)
+    except KeyboardInterrupt:
+        eprint("Interrupted.")
+        return EXIT_INTERRUPTED
+    except Exception as e:
+        eprint(f"Error: {e}")
+        return EXIT_FAILURE
+    finally:
+        # Sinks are global; a second main() in the same process must not write to these
+        for sink in sinks:
+            remove_sink(sink)
+
+    if args.profile:
+        print_profile(recorder.records)
+    if args.trace:
+        recorder.save_chrome_trace(args.trace)
+        eprint(f"Trace saved to {args.trace}")
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+import os
+import sys
+import json
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def user_cache_dir(app="meetsolution"):
+    """
+    Per-user cache directory: %LOCALAPPDATA% on Windows, ~/Library/Caches on
+    macOS, $XDG_CACHE_HOME or ~/.cache elsewhere.
+    """
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), "AppData", "Local")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, app)
+
+# -------
+# Configuration (defaults)
+# -------
+# Kept free of heavy imports so the CLI can show its menus without loading
+# torch. DEVICE "auto" is resolved to cuda/cpu when a model is loaded.
+DEFAULT_CONFIGS = {
+    "HUGGINGFACE_TOKEN": os.getenv("Huggingface_TOKEN"),
+    "DEVICE": "auto",
+    "MODEL_NAME": "medium",
+    "SPEAKER_COUNT": None,
+    "MAX_SPEAKERS": 10,
+    "BATCH_SIZE": 6,
+    "LANGUAGE": None,
+    "COMPUTE_TYPE": "int8",
+    "MODEL_CACHE_MB": 4096,
+    "PARALLEL_STAGES": True,
+    "STREAMING_WINDOW_SECONDS": 30,
+    "RESULT_CACHE": True,
+    "RESULT_CACHE_DIR": os.path.join(user_cache_dir(), "results"),  # Pickles are loaded from here, so never a shared or working directory
+    "RESULT_CACHE_MB": 2048,
+    "WARM_IMPORTS": True,
+    "VAD_PREPASS": False,
+    "ALIGN_WORKERS": 1,
+    "SPEAKER_INDEX": ".meetsolution_speakers.npz",
+    "SPEAKER_SEARCH": "auto",
+    "KEEP_CHANNELS": False,
+    "DIARIZATION_MODE": "pyannote",
+    "ASR_THREADS": 0,
+    "TORCH_THREADS": 0,
+    "TORCH_INTEROP_THREADS": 0,
+    "TUNING_PROFILE": None,
+    "TUNING_PROFILES_FILE": ".meetsolution_profiles.json",
+    "WINDOWED_MINUTES": 120,
+    "WINDOW_SECONDS": 900,
+    "SEARCH_INDEX": ".meetsolution_search.db"
+}
+# -------
+
+ENV_PREFIX = "MEETSOLUTION_"
+
+NULLABLE_SETTINGS = ("HUGGINGFACE_TOKEN", "SPEAKER_COUNT", "LANGUAGE", "TUNING_PROFILE")
+INTEGER_SETTINGS = ("SPEAKER_COUNT",)    # Numbers whose default is None
+
+def setting_type(key):
+    default = DEFAULT_CONFIGS[key]
+    if key in INTEGER_SETTINGS:
+        return int
+    return str if default is None else type(default)
+
+def parse_value(key, value):
+    """
+    Convert a setting (a string from the environment or --set, or a value
+    read from JSON) to the type of its default value. "none", "null" and ""
+    map to None only for settings whose default is None.
+    """
+    expected = setting_type(key)
+    nullable = key in NULLABLE_SETTINGS or DEFAULT_CONFIGS[key] is None
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if nullable and text in ("none", "null", ""):
+            return None
+        if expected is bool:
+            if text in ("1", "true", "yes", "on"):
+                return True
+            if text in ("0", "false", "no", "off"):
+                return False
+            raise ValueError(f"Invalid value for {key}: {value!r} (expected true/false)")
+        if expected is int:
+            try:
+                return int(value)
+            except ValueError:
+                raise ValueError(f"Invalid value for {key}: {value!r} (expected a number)")
+        return value
+
+    if value is None:
+        if nullable:
+            return None
+        raise ValueError(f"Invalid value for {key}: None (expected {expected.__name__})")
+    # bool is a subclass of int, so it is checked on its own
+    if isinstance(value, bool) != (expected is bool) or not isinstance(value, expected):
+        raise ValueError(f"Invalid value for {key}: {value!r} (expected {expected.__name__})")
+    return value
+
+def load_tuning_profile(name, path):
+    """
+    Settings of a profile saved by autotune.py.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            profiles = json.load(f)
+    except FileNotFoundError:
+        profiles = {}
+    if name not in profiles:
+        raise ValueError(f"Unknown tuning profile {name!r} in {path} (run 'meetsolution autotune --name {name}')")
+    return profiles[name]["settings"]
+
+def load_configs(path=None, environ=None, profile=None, command_line=None):
+    """
+    Build a settings dict: DEFAULT_CONFIGS, overridden by the TUNING_PROFILE
+    (or `profile`) settings, overridden by a JSON file (same keys as
+    DEFAULT_CONFIGS), overridden by MEETSOLUTION_<KEY> environment variables,
+    overridden by `command_line` ({key: string}, from --set). TUNING_PROFILE
+    from any of these layers selects the profile.
+    """
+    configs = DEFAULT_CONFIGS.copy()
+    environ = os.environ if environ is None else environ
+
+    overrides = {}
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            overrides = json.load(f)
+        unknown = sorted(set(overrides) - set(DEFAULT_CONFIGS))
+        if unknown:
+            raise ValueError(f"Unknown settings in {path}: {', '.join(unknown)}")
+    overrides = {key: parse_value(key, value) for key, value in overrides.items()}
+    for key in DEFAULT_CONFIGS:
+        if ENV_PREFIX + key in environ:
+            overrides[key] = parse_value(key, environ[ENV_PREFIX + key])
+    for key, value in (command_line or {}).items():
+        if key not in DEFAULT_CONFIGS:
+            raise ValueError(f"Unknown setting: {key}")
+        overrides[key] = parse_value(key, value)
+
+    profile = profile or overrides.get("TUNING_PROFILE")
+    if profile:
+        profiles_file = overrides.get("TUNING_PROFILES_FILE", configs["TUNING_PROFILES_FILE"])
+        configs.update({key: parse_value(key, value) for key, value in load_tuning_profile(profile, profiles_file).items()})
+    configs.update(overrides)
+    configs["TUNING_PROFILE"] = profile
+
+    return configs
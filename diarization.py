@@ -1,146 +1,471 @@
-import whisperx
-import torch
 import os
+import sys
 import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from dotenv import load_dotenv
-from pyannote.audio import Pipeline
-from omegaconf.listconfig import ListConfig
-from omegaconf.base import ContainerMetadata
 from typing import Any
 import gc
+import numpy as np
+from scipy.signal import resample_poly
+from config import DEFAULT_CONFIGS
+from mixer import TARGET_SAMPLE_RATE, mix_blocks
+from transcript import WordTable
+from model_registry import get_model, model_key, registry_stats, DIARIZATION_MODEL, DIARIZATION_DEVICE
+from result_cache import audio_fingerprint, cached_stage
+from vad import detect_speech, format_report
+from alignment import align_segments, resolve_workers, diarization_threads
+from profiling import stage, add_sink, remove_sink, JsonLinesSink, TraceRecorder, format_records
+from speaker_index import name_speakers
+from channels import use_channels, diarize_channels
+from windowed import use_windowed, transcribe_windowed
 
 # Disable symlinks for Hugging Face cache to avoid Windows privilege issues
 os.environ['HF_HUB_DISABLE_SYMLINKS'] = '1'
 os.environ['SB_CACHE_STRATEGY'] = 'local'
 
-# Patch torch.load to use weights_only=False due to compatibility issues with pyannote models
-original_load = torch.load
-def patched_load(*args, **kwargs):
-    kwargs['weights_only'] = False
-    return original_load(*args, **kwargs)
-torch.load = patched_load
-
-torch.serialization.add_safe_globals([ListConfig, ContainerMetadata, Any])
 load_dotenv()
 
-# -------
-# Configuration (defaults)
-# -------
-DEFAULT_CONFIGS = {
-    "HUGGINGFACE_TOKEN": os.getenv("Huggingface_TOKEN"),
-    "DEVICE": "cuda" if torch.cuda.is_available() else "cpu",
-    "MODEL_NAME": "medium",
-    "SPEAKER_COUNT": None,
-    "MAX_SPEAKERS": 10,
-    "BATCH_SIZE": 6,
-    "LANGUAGE": None,
-    "COMPUTE_TYPE": "int8"
-}
-# -------
-
-def clean_memory(model):
+# WhisperX, torch and pyannote are imported by load_backends() on first use,
+# so the stage graph can run with stub models (benchmark.py) without them
+whisperx = None
+torch = None
+DEFAULT_TORCH_THREADS = None  # What TORCH_THREADS = 0 restores after a run with an explicit thread count
+_backends_lock = threading.Lock()
+
+def load_backends():
+    """
+    Import WhisperX, torch and pyannote, and patch torch.load for the
+    pyannote checkpoints. Safe to call from several stage threads.
+    """
+    global whisperx, torch, DEFAULT_TORCH_THREADS
+    with _backends_lock:
+        if whisperx is not None:
+            return
+        import whisperx as whisperx_module
+        import torch as torch_module
+        from pyannote.audio import Pipeline
+        from omegaconf.listconfig import ListConfig
+        from omegaconf.base import ContainerMetadata
+
+        # Patch torch.load to use weights_only=False due to compatibility issues with pyannote models
+        original_load = torch_module.load
+        def patched_load(*args, **kwargs):
+            kwargs['weights_only'] = False
+            return original_load(*args, **kwargs)
+        torch_module.load = patched_load
+
+        torch_module.serialization.add_safe_globals([ListConfig, ContainerMetadata, Any])
+        DEFAULT_TORCH_THREADS = torch_module.get_num_threads()
+        torch = torch_module
+        whisperx = whisperx_module
+
+def get_device(configs):
+    """
+    Resolve the DEVICE setting, where "auto" picks CUDA when it is available.
+    """
+    device = configs["DEVICE"]
+    if device == "auto":
+        load_backends()
+        return "cuda" if torch.cuda.is_available() else "cpu"
+    return device
+
+def apply_thread_settings(configs):
+    """
+    Apply TORCH_THREADS and TORCH_INTEROP_THREADS (0 keeps the torch default)
+    to this process before the alignment and pyannote models run. The
+    inter-op pool can only be sized before torch first uses it.
+    """
+    load_backends()
+    threads = configs.get("TORCH_THREADS", 0) or DEFAULT_TORCH_THREADS
+    if torch.get_num_threads() != threads:
+        torch.set_num_threads(threads)
+    interop = configs.get("TORCH_INTEROP_THREADS", 0)
+    if interop and torch.get_num_interop_threads() != interop:
+        try:
+            torch.set_num_interop_threads(interop)
+        except RuntimeError:
+            print(f"TORCH_INTEROP_THREADS={interop} ignored: torch already started its inter-op pool.")
+
+def clean_memory(model=None):
     """
     Clean up GPU memory after model usage.
     """
     del model
     gc.collect()
-    torch.cuda.empty_cache()
+    if torch is not None and torch.cuda.is_available():
+        torch.cuda.empty_cache()
 
-def transcription_with_diarization(audio_file, configs=DEFAULT_CONFIGS):
-    device = configs["DEVICE"]
-    model_name = configs["MODEL_NAME"]
-    batch_size = configs["BATCH_SIZE"]
+def release_uncached_models(configs):
+    """
+    With MODEL_CACHE_MB at 0 the registry keeps no model, so release the
+    memory of the one a stage has just dropped.
+    """
+    if configs["MODEL_CACHE_MB"] <= 0:
+        clean_memory()
+
+def asr_model_key(configs, language=None):
+    """
+    Registry key of the WhisperX model for `configs`. ASR_THREADS only
+    applies on CPU, so it is only part of the key there.
+    """
+    device = get_device(configs)
+    threads = configs.get("ASR_THREADS", 0) if device == "cpu" else 0
+    return model_key("asr", configs["MODEL_NAME"], device, configs["COMPUTE_TYPE"], language, threads)
+
+def load_asr_model(configs, language=None):
+    """
+    Return a warm WhisperX model from the model registry.
+    """
+    key = asr_model_key(configs, language)
+    _, model_name, device, compute_type, _, threads = key
+
+    def loader():
+        load_backends()
+        print(f"Loading WhisperX model '{model_name}' on device '{device}'...")
+        if threads:
+            # CTranslate2 fixes its thread pool when the model is created
+            return whisperx.load_model(model_name, device, compute_type=compute_type, language=language, threads=threads)
+        return whisperx.load_model(model_name, device, compute_type=compute_type, language=language)
+
+    return get_model(key, loader, configs["MODEL_CACHE_MB"], cleanup=clean_memory)
+
+def load_align_model(language, configs):
+    """
+    Return a warm (alignment model, metadata) pair from the model registry.
+    """
+    device = get_device(configs)
+    key = model_key("align", "wav2vec2", device, None, language)
+
+    def loader():
+        load_backends()
+        print(f"Loading alignment model and metadata...")
+        return whisperx.load_align_model(language_code=language, device=device)
+
+    return get_model(key, loader, configs["MODEL_CACHE_MB"], cleanup=clean_memory)
+
+def load_diarization_pipeline(configs):
+    """
+    Return a warm pyannote diarization pipeline from the model registry.
+    """
+    diarization_model = DIARIZATION_MODEL
+    key = model_key("diarize", diarization_model, DIARIZATION_DEVICE)
+
+    def loader():
+        load_backends()
+        print(f"Loading speaker diarization pipeline...")
+        try:
+            return whisperx.diarize.DiarizationPipeline(model_name=diarization_model, use_auth_token=configs["HUGGINGFACE_TOKEN"])
+        except OSError as e:
+            if "1314" in str(e):
+                print("Symlink creation failed due to Windows privileges. Please enable Developer Mode or run as administrator.")
+                print("See: https://docs.microsoft.com/en-us/windows/apps/get-started/enable-your-device-for-development")
+                raise
+            else:
+                raise
+
+    return get_model(key, loader, configs["MODEL_CACHE_MB"], cleanup=clean_memory)
+
+def load_audio(audio, sample_rate=None):
+    """
+    Return a 16 kHz float32 waveform. `audio` is either a file path, decoded
+    once with FFmpeg, or an array already in memory, resampled only when
+    `sample_rate` differs from 16 kHz. (samples, 2) mic/loopback arrays are
+    mixed down the way the recorder mixes them.
+    """
+    if isinstance(audio, str):
+        load_backends()
+        return whisperx.load_audio(audio)
+    audio = np.asarray(audio, dtype=np.float32)
+    audio = mix_blocks(list(audio.T)) if audio.ndim == 2 else audio.reshape(-1)
+    if sample_rate is not None and int(sample_rate) != TARGET_SAMPLE_RATE:
+        divisor = np.gcd(int(sample_rate), TARGET_SAMPLE_RATE)
+        audio = resample_poly(audio, TARGET_SAMPLE_RATE // divisor, int(sample_rate) // divisor).astype(np.float32)
+    return audio
+
+def run_asr(audio, configs):
+    """
+    Transcribe a 16 kHz waveform. Returns the WhisperX result with the
+    detected language filled in.
+    """
     language = configs["LANGUAGE"]
-    compute_type = configs["COMPUTE_TYPE"]
-    huggingface_token = configs["HUGGINGFACE_TOKEN"]
-    speaker_count = configs["SPEAKER_COUNT"]
-    max_speakers = configs["MAX_SPEAKERS"]
-    
-    print(f"Loading WhisperX model '{model_name}' on device '{device}'...")
-    model = whisperx.load_model(model_name, device, compute_type=compute_type)
-    audio = whisperx.load_audio(audio_file)
-    result_transcriptions = model.transcribe(audio, batch_size=batch_size, language=language)
+    model = load_asr_model(configs, language)
+    result_transcriptions = model.transcribe(audio, batch_size=configs["BATCH_SIZE"], language=language)
+    del model
+    release_uncached_models(configs)
 
     # If language was None, use detected language for alignment
     if language is None:
-        language = result_transcriptions["language"]
-        print(f"Detected language: {language}")
+        print(f"Detected language: {result_transcriptions['language']}")
 
-    clean_memory(model)
+    return result_transcriptions
 
-    print(f"Loading alignment model and metadata...")
-    model_a, metadata = whisperx.load_align_model(language_code=language, device=device)
-    result_aligned = whisperx.align(result_transcriptions["segments"], model_a, metadata, audio, device, interpolate_method='linear')
+def run_alignment(segments, language, audio, configs):
+    model_a, metadata = load_align_model(language, configs)
+    apply_thread_settings(configs)
+    result_aligned = whisperx.align(segments, model_a, metadata, audio, get_device(configs), interpolate_method='linear')
+    del model_a, metadata
+    release_uncached_models(configs)
+    return result_aligned
 
-    clean_memory(model_a)
+def run_diarization(audio, configs, return_embeddings=False):
+    """
+    Diarize a 16 kHz waveform or an audio file. Arrays are handed to pyannote
+    as an in-memory waveform, so the audio is not decoded again. With
+    `return_embeddings`, returns (segments, {label: embedding}).
+    """
+    diarize_model = load_diarization_pipeline(configs)
+    apply_thread_settings(configs)
+    if not return_embeddings:
+        result = diarize_model(audio, num_speakers=configs["SPEAKER_COUNT"], max_speakers=configs["MAX_SPEAKERS"])
+    else:
+        try:
+            result = diarize_model(audio, num_speakers=configs["SPEAKER_COUNT"], max_speakers=configs["MAX_SPEAKERS"], return_embeddings=True)
+        except TypeError:
+            print("This WhisperX version cannot return speaker embeddings, speakers keep their SPEAKER_xx labels.")
+            result = diarize_model(audio, num_speakers=configs["SPEAKER_COUNT"], max_speakers=configs["MAX_SPEAKERS"]), None
+    del diarize_model
+    release_uncached_models(configs)
+    return result
 
-    print(f"Loading speaker diarization pipeline...")
-    try:
-        diarize_model = whisperx.diarize.DiarizationPipeline(model_name="pyannote/speaker-diarization", use_auth_token=huggingface_token)
-    except OSError as e:
-        if "1314" in str(e):
-            print("Symlink creation failed due to Windows privileges. Please enable Developer Mode or run as administrator.")
-            print("See: https://docs.microsoft.com/en-us/windows/apps/get-started/enable-your-device-for-development")
-            raise
-        else:
-            raise
-    diarize_segments = diarize_model(audio_file, num_speakers=speaker_count, max_speakers=max_speakers)
-
-    clean_memory(diarize_model)
+def diarize_for_configs(audio, configs):
+    """
+    run_diarization with speaker embeddings when a SPEAKER_INDEX is configured.
+    """
+    return run_diarization(audio, configs, return_embeddings=bool(configs.get("SPEAKER_INDEX")))
 
+def assign_speakers(diarize_segments, result_aligned):
+    load_backends()
     final_result = whisperx.assign_word_speakers(diarize_segments, result_aligned)
-    final_result = final_result["word_segments"]
-
-    return final_result
-
-def format_transcription(final_result):
-    formatted_output = []
-    current_speaker = None
-    current_text = ""
-    current_start = None
-    current_end = None
-    
-    for segment in final_result:
-        speaker = segment.get("speaker", "Unknown")
-        if speaker != current_speaker:
-            if current_speaker is not None:
-                formatted_output.append({
-                    "start": current_start,
-                    "end": current_end,
-                    "text": current_text.strip(),
-                    "speaker": current_speaker
-                })
-            current_speaker = speaker
-            current_text = segment["word"] + " "
-            current_start = segment["start"]
-            current_end = segment["end"]
-        else:
-            current_text += segment["word"] + " "
-            current_end = segment["end"]
-    
-    # Add the last segment
-    if current_speaker is not None:
-        formatted_output.append({
-            "start": current_start,
-            "end": current_end,
-            "text": current_text.strip(),
-            "speaker": current_speaker
-        })
-    
-    return formatted_output
-
-def main():
+    return final_result["word_segments"]
+
+def assign_named_speakers(diarize_result, result_aligned, configs):
+    """
+    assign_speakers, then rename SPEAKER_xx labels to enrolled names when the
+    diarization result carries speaker embeddings.
+    """
+    embeddings = None
+    if isinstance(diarize_result, tuple):
+        diarize_result, embeddings = diarize_result
+    word_segments = assign_speakers(diarize_result, result_aligned)
+    if embeddings:
+        name_speakers(word_segments, embeddings, configs)
+    return word_segments
+
+def speaker_embeddings(audio_file, configs):
+    """
+    {SPEAKER_xx: embedding} for an audio file, served from the result cache
+    when the meeting was already transcribed with the same settings.
+    """
+    fingerprint = audio_fingerprint(audio_file) if configs.get("RESULT_CACHE") else None
+    audio = load_audio(audio_file)
+    if configs.get("VAD_PREPASS"):
+        audio = cached_stage(configs, "vad", fingerprint, lambda: detect_speech(audio)).compact(audio)
+    _, embeddings = cached_stage(
+        configs, "diarize", fingerprint,
+        lambda: run_diarization(audio, configs, return_embeddings=True),
+        extra={"embeddings": True},
+    )
+    return embeddings or {}
+
+def print_registry_stats():
+    stats = registry_stats()
+    print(f"Model cache: {stats['hits']} hits, {stats['misses']} misses, {stats['evictions']} evictions ({stats['used_mb']} MB resident).")
+
+def run_stage_graph(stages, timings=None, max_workers=2, audio_seconds=None):
+    """
+    Run a graph of stages {name: (function, dependencies)} on a thread pool.
+    A stage starts as soon as its dependencies are finished and receives their
+    results as keyword arguments. Every stage is profiled with
+    `profiling.stage`, and its wall-clock time goes into `timings`.
+    `audio_seconds()` returns the audio length for real-time factors, or None.
+    """
+    results = {}
+    running = {}
+    timings = timings if timings is not None else {}
+
+    def timed(name, function, kwargs):
+        with stage(name, timings) as record:
+            result = function(**kwargs)
+            if audio_seconds is not None:
+                record["audio_seconds"] = audio_seconds()
+        return result
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while len(results) < len(stages):
+            for name, (function, dependencies) in stages.items():
+                if name in results or name in running.values():
+                    continue
+                if all(dep in results for dep in dependencies):
+                    kwargs = {dep: results[dep] for dep in dependencies}
+                    running[executor.submit(timed, name, function, kwargs)] = name
+            if not running:
+                raise ValueError(f"Stage graph has unresolved dependencies: {sorted(set(stages) - set(results))}")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+
+    return results
+
+def transcription_with_diarization(audio_file, configs=DEFAULT_CONFIGS, timings=None, sample_rate=None, vad_report=None):
+    """
+    Transcribe and diarize an audio file path or a preloaded waveform (with its
+    `sample_rate`). The audio is decoded once and shared by every stage.
+    Diarization only needs the audio, so with PARALLEL_STAGES it runs on a
+    second thread alongside ASR and alignment and both branches join at
+    speaker assignment. Per-stage wall-clock seconds are written into
+    `timings` when a dict is passed.
+
+    With VAD_PREPASS the stages only see the speech regions of the recording,
+    and the word timestamps are mapped back to the original timeline. The
+    amount of audio skipped is written into `vad_report` when a dict is passed.
+
+    A stereo mic/loopback recording is diarized from its channels when
+    DIARIZATION_MODE asks for it (see channels.py). Those segments are on the
+    original timeline, so the alignment is mapped back before assignment.
+
+    Files longer than WINDOWED_MINUTES are processed in overlapping windows
+    read from disk instead (see windowed.py), which caps memory use.
+    """
+    timings = timings if timings is not None else {}
+    if use_windowed(audio_file, configs):
+        if configs.get("DIARIZATION_MODE", "pyannote") != "pyannote":
+            print("Windowed mode diarizes the mix with pyannote; DIARIZATION_MODE is ignored for this recording.")
+        return transcribe_windowed(audio_file, configs, timings, vad_report)
+    start = time.perf_counter()
+
+    # Decode lazily so a run served entirely from the result cache skips it
+    audio_holder = {}
+    audio_lock = threading.Lock()
+
+    def get_audio(speech_map=None):
+        with audio_lock:
+            if "audio" not in audio_holder:
+                with stage("load_audio", timings) as record:
+                    audio_holder["audio"] = load_audio(audio_file, sample_rate)
+                    record["audio_seconds"] = len(audio_holder["audio"]) / TARGET_SAMPLE_RATE
+            if speech_map is None:
+                return audio_holder["audio"]
+            if "speech" not in audio_holder:
+                audio_holder["speech"] = speech_map.compact(audio_holder["audio"])
+            return audio_holder["speech"]
+
+    def fingerprint():
+        if not configs.get("RESULT_CACHE"):
+            return None
+        if isinstance(audio_file, str):
+            return audio_fingerprint(audio_file)
+        return audio_fingerprint(get_audio())
+
+    def vad(fingerprint):
+        if not configs.get("VAD_PREPASS"):
+            return None
+        return cached_stage(configs, "vad", fingerprint, lambda: detect_speech(get_audio()))
+
+    def asr(fingerprint, vad):
+        return cached_stage(configs, "asr", fingerprint, lambda: run_asr(get_audio(vad), configs))
+
+    def align(fingerprint, vad, asr):
+        return cached_stage(
+            configs, "align", fingerprint,
+            lambda: align_segments(asr["segments"], asr["language"], get_audio(vad), configs),
+            extra={"language": asr["language"]},
+        )
+
+    def channels(fingerprint):
+        return use_channels(audio_file, configs)
+
+    # With an alignment pool, pyannote gets the threads the workers leave free
+    diarize_configs = configs
+    if configs.get("ALIGN_WORKERS", 1) != 1 and configs.get("PARALLEL_STAGES", True):
+        align_workers = resolve_workers(configs, get_device(configs))
+        if align_workers > 1:
+            diarize_configs = dict(configs, TORCH_THREADS=diarization_threads(configs, align_workers))
+
+    def diarize(fingerprint, vad, channels):
+        if channels:
+            return cached_stage(
+                configs, "diarize", fingerprint,
+                lambda: diarize_channels(audio_file, diarize_configs, sample_rate),
+                extra={"channels": True},
+            )
+        return cached_stage(
+            configs, "diarize", fingerprint,
+            lambda: diarize_for_configs(get_audio(vad), diarize_configs),
+            extra={"embeddings": True} if configs.get("SPEAKER_INDEX") else None,
+        )
+
+    def assign(vad, channels, diarize, align):
+        if channels:
+            if vad is not None:
+                vad.remap_aligned(align)
+            return assign_named_speakers(diarize, align, configs)
+        word_segments = assign_named_speakers(diarize, align, configs)
+        return vad.remap_word_segments(word_segments) if vad is not None else word_segments
+
+    stages = {
+        "fingerprint": (fingerprint, []),
+        "vad": (vad, ["fingerprint"]),
+        "channels": (channels, ["fingerprint"]),
+        "diarize": (diarize, ["fingerprint", "vad", "channels"]),
+        "asr": (asr, ["fingerprint", "vad"]),
+        "align": (align, ["fingerprint", "vad", "asr"]),
+        "assign_speakers": (assign, ["vad", "channels", "diarize", "align"]),
+    }
+
+    def audio_seconds():
+        audio = audio_holder.get("audio")
+        return len(audio) / TARGET_SAMPLE_RATE if audio is not None else None
+
+    max_workers = 2 if configs.get("PARALLEL_STAGES", True) else 1
+    results = run_stage_graph(stages, timings, max_workers=max_workers, audio_seconds=audio_seconds)
+    timings["total"] = time.perf_counter() - start
+
+    print_registry_stats()
+    if results["vad"] is not None:
+        report = results["vad"].report()
+        print(format_report(report))
+        if vad_report is not None:
+            vad_report.update(report)
+    print("Stage timings: " + ", ".join(f"{name} {seconds:.1f}s" for name, seconds in timings.items()))
+
+    return results["assign_speakers"]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Transcribe and diarize one audio file into a timestamped transcript.")
+    parser.add_argument("audio_file", help="Audio file to transcribe")
+    parser.add_argument("-o", "--output", default=None, help="Transcript file (default: <audio name>_transcription.txt)")
+    parser.add_argument("--profile-log", default=None, help="Append per-stage profiling records to this JSON lines file")
+    parser.add_argument("--trace", default=None, help="Write a Chrome trace of the stages to this file")
+    args = parser.parse_args(argv)
+
+    output_file = args.output or os.path.splitext(args.audio_file)[0] + "_transcription.txt"
+    recorder = add_sink(TraceRecorder())
+    sinks = [recorder]
+    if args.profile_log:
+        sinks.append(add_sink(JsonLinesSink(args.profile_log)))
+
     start_time = time.time()
-    final_result = transcription_with_diarization(AUDIO_FILE)
-    formatted_output = format_transcription(final_result)
+    try:
+        final_result = transcription_with_diarization(args.audio_file)
+        with stage("format"):
+            transcricao = WordTable.from_word_segments(final_result).to_timestamped_text()
+    finally:
+        for sink in sinks:
+            remove_sink(sink)
 
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        for segment in formatted_output:
-            f.write(f"[{segment['start']:.2f}-{segment['end']:.2f}] Speaker {segment['speaker']}: {segment['text']}\n")
+    with open(output_file, "w", encoding="utf-8") as f:
+        f.write(transcricao)
     end_time = time.time()
 
     print(f"Transcription and diarization completed in {end_time - start_time:.2f} seconds.")
-    print(f"Results saved to '{OUTPUT_FILE}'.")
+    print(format_records(recorder.records))
+    print(f"Results saved to '{output_file}'.")
+    if args.trace:
+        recorder.save_chrome_trace(args.trace)
+        print(f"Trace saved to '{args.trace}'.")
+    return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -1,10 +1,10 @@
 import os
+import sys
+import asyncio
+import threading
 from dotenv import load_dotenv
-from record import record_audio_dual
-from diarization import transcription_with_diarization, format_transcription, DEFAULT_CONFIGS
-from summarizer import generate_summary
+from config import DEFAULT_CONFIGS
 from colorama import init, Fore, Back, Style
-import torch
 
 # Initialize colorama
 init(autoreset=True)
@@ -15,6 +15,35 @@ load_dotenv()
 # Default configurations
 configs = DEFAULT_CONFIGS.copy()
 
+# Heavy subsystems (torch, whisperx, pyannote, langchain) are imported by the
+# actions that need them, so the menu shows up immediately.
+WARM_MODULES = ("diarization", "summarizer", "record", "whisperx", "pyannote.audio", "sounddevice")
+_warmup_thread = None
+
+def start_background_warmup():
+    """
+    Import the heavy modules on a background thread once the menu is showing,
+    so the first action does not pay the import cost.
+    """
+    global _warmup_thread
+    if _warmup_thread is not None or not configs.get("WARM_IMPORTS"):
+        return
+
+    def warm():
+        import importlib
+        for module in WARM_MODULES:
+            try:
+                importlib.import_module(module)
+            except Exception:
+                # The action reports the real error when it imports the module
+                pass
+
+    _warmup_thread = threading.Thread(target=warm, daemon=True)
+    _warmup_thread.start()
+
+def clear_screen():
+    os.system('cls' if os.name == 'nt' else 'clear')
+
 def print_title():
     title = """\n\n\n\n
     ███╗   ███╗███████╗███████╗████████╗███████╗ ██████╗ ██╗     ██╗   ██╗████████╗██╗ ██████╗ ███╗   ██╗
@@ -29,7 +58,7 @@ def print_title():
 
 def settings_menu():
     while True:
-        os.system('cls')
+        clear_screen()
         print_title()
         print(Fore.CYAN + "\nSettings:")
         print("1. HUGGINGFACE_TOKEN")
@@ -40,8 +69,9 @@ def settings_menu():
         print("6. BATCH_SIZE")
         print("7. LANGUAGE")
         print("8. COMPUTE_TYPE")
-        print("9. Back")
-        choice = input(Fore.WHITE + "Choose a setting to change (1-9): ").strip()
+        print("9. MODEL_CACHE_MB")
+        print("10. Back")
+        choice = input(Fore.WHITE + "Choose a setting to change (1-10): ").strip()
 
         if choice == "1":
             new_value = input(Fore.WHITE + f"Current: {configs['HUGGINGFACE_TOKEN']}. New value: ").strip()
@@ -51,9 +81,7 @@ def settings_menu():
             print(Fore.WHITE + f"Current: {configs['DEVICE']}")
             print("Options: auto, cuda, cpu")
             new_value = input(Fore.WHITE + "New value: ").strip().lower()
-            if new_value == "auto":
-                configs['DEVICE'] = "cuda" if torch.cuda.is_available() else "cpu"
-            elif new_value in ["cuda", "cpu"]:
+            if new_value in ["auto", "cuda", "cpu"]:
                 configs['DEVICE'] = new_value
             else:
                 print(Fore.RED + "Invalid option.")
@@ -107,6 +135,14 @@ def settings_menu():
                 continue
             print(Fore.GREEN + "Updated.")
         elif choice == "9":
+            new_value = input(Fore.WHITE + f"Current: {configs['MODEL_CACHE_MB']} (0 to keep no model loaded between stages). New value: ").strip()
+            try:
+                configs['MODEL_CACHE_MB'] = int(new_value)
+            except ValueError:
+                print(Fore.RED + "Invalid value. Must be a number.")
+                continue
+            print(Fore.GREEN + "Updated.")
+        elif choice == "10":
             break
         else:
             print(Fore.RED + "Invalid option.")
@@ -117,28 +153,33 @@ def action_menu():
     last_audio_file = None
 
     while True:
-        os.system('cls')
+        clear_screen()
         print_title()
         print(Fore.WHITE + "Action Menu:")
         print("1. Record audio")
         print("2. Transcribe")
         print("3. Summarize transcription")
         print("4. Do everything")
+        print("5. Record with live transcription")
         print("9. Settings")
         print("10. Back to Main Menu")
-        choice = input(Fore.WHITE + "Choose an option (1-4,9-10): ").strip()
+        choice = input(Fore.WHITE + "Choose an option (1-5,9-10): ").strip()
 
         if choice == "1":
-            os.system('cls')
+            clear_screen()
+            from record import record_audio_dual
             print(Fore.BLUE + "Starting recording...")
-            audio_file = record_audio_dual()
+            audio_file = record_audio_dual(keep_channels=configs['KEEP_CHANNELS'])
             if not audio_file:
                 print(Fore.RED + "Recording failed.")
             else:
                 print(Fore.GREEN + f"Audio recorded: {audio_file}")
 
         elif choice == "2":
-            os.system('cls')
+            clear_screen()
+            from diarization import transcription_with_diarization
+            from transcript import WordTable
+            from search_index import index_meeting
             if audio_file:
                 use_recorded = input(Fore.WHITE + "Use recorded audio (y) or choose file (n)? ").strip().lower()
                 if use_recorded == "y":
@@ -154,19 +195,20 @@ def action_menu():
             
             print(Fore.GREEN + "Starting transcription with diarization...")
             final_result = transcription_with_diarization(selected_audio, configs)
-            formatted_output = format_transcription(final_result)
-            transcricao = "\n".join(f"Speaker {seg['speaker']}: {seg['text']}" for seg in formatted_output)
+            transcricao = WordTable.from_word_segments(final_result).to_text()
             
             # Save transcription to file
             base_name = os.path.splitext(os.path.basename(selected_audio))[0]
             transcription_file = f"{base_name}.txt"
             with open(transcription_file, "w", encoding="utf-8") as f:
                 f.write(transcricao)
+            index_meeting(base_name, final_result, configs, selected_audio)
             last_audio_file = selected_audio
             print(Fore.GREEN + f"Transcription completed and saved to {transcription_file}.")
 
         elif choice == "3":
-            os.system('cls')
+            clear_screen()
+            from summarizer import stream_summary, format_metrics
             if not transcricao:
                 print(Fore.RED + "No transcription available. Run option 2 first.")
                 continue
@@ -174,56 +216,84 @@ def action_menu():
                 print(Fore.RED + "No audio file associated with the transcription.")
                 continue
             print(Fore.GREEN + "Generating summary...")
-            resumo = generate_summary(transcricao)
             base_name = os.path.splitext(os.path.basename(last_audio_file))[0]
             summary_file = f"summary_{base_name}.txt"
-            with open(summary_file, "w", encoding="utf-8") as f:
-                f.write(resumo)
-            print(Fore.GREEN + f"Summary saved to {summary_file}")
+            resumo, metrics = asyncio.run(stream_summary(transcricao, summary_file, echo=True))
+            print(Fore.GREEN + f"Summary saved to {summary_file} ({format_metrics(metrics)})")
 
         elif choice == "4":
-            os.system('cls')
+            clear_screen()
+            from record import record_audio_dual
+            from mixer import TARGET_SAMPLE_RATE
+            from diarization import transcription_with_diarization
+            from transcript import WordTable
+            from search_index import index_meeting
+            from summarizer import stream_summary, format_metrics
             print(Fore.BLUE + "Starting recording...")
-            audio_file = record_audio_dual()
-            if not audio_file:
+            recording = record_audio_dual(return_audio=True, keep_channels=configs['KEEP_CHANNELS'])
+            if not recording:
                 print(Fore.RED + "Recording failed.")
                 continue
+            audio_file, audio = recording
             print(Fore.GREEN + f"Audio recorded: {audio_file}")
             
             print(Fore.GREEN + "Starting transcription with diarization...")
-            final_result = transcription_with_diarization(audio_file, configs)
-            formatted_output = format_transcription(final_result)
-            transcricao = "\n".join(f"Speaker {seg['speaker']}: {seg['text']}" for seg in formatted_output)
+            final_result = transcription_with_diarization(audio, configs, sample_rate=TARGET_SAMPLE_RATE)
+            transcricao = WordTable.from_word_segments(final_result).to_text()
             
             # Save transcription to file
             base_name = os.path.splitext(os.path.basename(audio_file))[0]
             transcription_file = f"{base_name}.txt"
             with open(transcription_file, "w", encoding="utf-8") as f:
                 f.write(transcricao)
+            index_meeting(base_name, final_result, configs, audio_file)
             last_audio_file = audio_file
             print(Fore.GREEN + f"Transcription completed and saved to {transcription_file}.")
             
             print(Fore.GREEN + "Generating summary...")
-            resumo = generate_summary(transcricao)
-            base_name = os.path.splitext(os.path.basename(audio_file))[0]
             summary_file = f"summary_{base_name}.txt"
-            with open(summary_file, "w", encoding="utf-8") as f:
-                f.write(resumo)
-            print(Fore.GREEN + f"Summary saved to {summary_file}")
+            resumo, metrics = asyncio.run(stream_summary(transcricao, summary_file, echo=True))
+            print(Fore.GREEN + f"Summary saved to {summary_file} ({format_metrics(metrics)})")
+
+        elif choice == "5":
+            clear_screen()
+            from record import record_audio_dual, dynamic_name
+            from streaming import StreamingTranscriber
+            from transcript import WordTable
+            from search_index import index_meeting
+            audio_file = dynamic_name()
+            base_name = os.path.splitext(os.path.basename(audio_file))[0]
+            transcription_file = f"{base_name}.txt"
+            streamer = StreamingTranscriber(configs, transcription_file, window_seconds=configs['STREAMING_WINDOW_SECONDS']).start()
+            print(Fore.BLUE + f"Starting recording. Live transcript: {transcription_file}")
+            recording = record_audio_dual(audio_file, streamer=streamer, return_audio=True, keep_channels=configs['KEEP_CHANNELS'])
+            if not recording:
+                streamer.finish()
+                print(Fore.RED + "Recording failed.")
+                continue
+            audio_file, audio = recording
+            print(Fore.GREEN + "Finishing the last window and assigning speakers...")
+            final_result = streamer.finish(audio)
+            transcricao = WordTable.from_word_segments(final_result).to_text()
+            with open(transcription_file, "w", encoding="utf-8") as f:
+                f.write(transcricao)
+            index_meeting(base_name, final_result, configs, audio_file)
+            last_audio_file = audio_file
+            print(Fore.GREEN + f"Transcription completed and saved to {transcription_file}.")
 
         elif choice == "9":
-            os.system('cls')
+            clear_screen()
             settings_menu()
 
         elif choice == "10":
-            os.system('cls')
+            clear_screen()
             break
 
         else:
             print(Fore.RED + "Invalid option. Try again.")
 
 def documentation():
-    os.system('cls')
+    clear_screen()
     print_title()
     print(Fore.CYAN + "\nDocumentation:")
     print("MeetSolution is a tool for transcribing and summarizing meeting audio.")
@@ -238,8 +308,9 @@ def documentation():
 
 def main():
     while True:
-        os.system('cls')
+        clear_screen()
         print_title()
+        start_background_warmup()
         print(Fore.WHITE + "Main Menu:")
         print("1. Start")
         print("2. Documentation")
@@ -257,4 +328,8 @@ def main():
             print(Fore.RED + "Invalid option. Try again.")
 
 if __name__ == "__main__":
+    # Any argument switches to the headless CLI (see cli.py)
+    if len(sys.argv) > 1:
+        from cli import main as cli_main
+        sys.exit(cli_main())
     main()
\ No newline at end of file
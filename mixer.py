@@ -0,0 +1,109 @@
+import math
+import numpy as np
+from scipy.signal import resample_poly
+
+#----
+# Configuration
+#----
+
+TARGET_SAMPLE_RATE = 16000  # WhisperX and pyannote both work on 16 kHz mono
+PEAK_TARGET = 0.89          # Peak level after normalization, just below the soft clipper
+SOFT_CLIP_THRESHOLD = 0.9   # Samples above this level are compressed instead of clipped
+
+class StreamResampler:
+    """
+    Block-by-block polyphase resampler.
+
+    Each call resamples the new samples together with enough context on both
+    sides to cover the anti-aliasing filter, then keeps only the part that
+    belongs to the new samples. The concatenated output matches a single
+    `resample_poly` call over the whole signal.
+    """
+
+    def __init__(self, in_rate, out_rate=TARGET_SAMPLE_RATE):
+        divisor = math.gcd(int(in_rate), int(out_rate))
+        self.up = int(out_rate) // divisor
+        self.down = int(in_rate) // divisor
+        # resample_poly's default filter spans 10 * max(up, down) taps per side in
+        # the upsampled domain; round the input context up to a multiple of `down`
+        half_len = 10 * max(self.up, self.down) / self.up + 1
+        self.context = self.down * math.ceil(half_len / self.down)
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._left = 0      # samples at the start of the buffer already emitted
+        self._consumed = 0  # input samples emitted so far
+        self._emitted = 0   # output samples emitted so far
+
+    def process(self, block):
+        """
+        Add input samples and return every output sample that is final.
+        """
+        if self.up == self.down:
+            return np.asarray(block, dtype=np.float32)
+        self._buffer = np.concatenate([self._buffer, np.asarray(block, dtype=np.float32)])
+        available = len(self._buffer) - self._left - self.context
+        count = (available // self.down) * self.down
+        if count <= 0:
+            return np.zeros(0, dtype=np.float32)
+
+        segment = self._buffer[:self._left + count + self.context]
+        resampled = resample_poly(segment, self.up, self.down)
+        start = self._left * self.up // self.down
+        output = resampled[start:start + count * self.up // self.down].astype(np.float32)
+
+        keep_from = max(0, self._left + count - self.context)
+        self._buffer = self._buffer[keep_from:]
+        self._left = self._left + count - keep_from
+        self._consumed += count
+        self._emitted += len(output)
+        return output
+
+    def flush(self):
+        """
+        Return the remaining output once the input has ended.
+        """
+        if self.up == self.down:
+            return np.zeros(0, dtype=np.float32)
+        remaining = len(self._buffer) - self._left
+        total = math.ceil((self._consumed + remaining) * self.up / self.down)
+        if remaining <= 0 or total <= self._emitted:
+            return np.zeros(0, dtype=np.float32)
+        resampled = resample_poly(self._buffer, self.up, self.down)
+        start = self._left * self.up // self.down
+        output = resampled[start:start + total - self._emitted].astype(np.float32)
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._left = 0
+        self._consumed += remaining
+        self._emitted += len(output)
+        return output
+
+def soft_clip(samples, threshold=SOFT_CLIP_THRESHOLD):
+    """
+    Compress samples above `threshold` smoothly towards full scale, in place.
+    """
+    magnitude = np.abs(samples)
+    over = magnitude > threshold
+    if np.any(over):
+        headroom = 1.0 - threshold
+        compressed = threshold + headroom * np.tanh((magnitude[over] - threshold) / headroom)
+        samples[over] = np.copysign(compressed, samples[over])
+    return samples
+
+def mix_blocks(blocks, clip_protection=True):
+    """
+    Sum equally long float32 blocks into one mono block. Summing keeps each
+    speaker at its recorded level; clipping protection compresses the peaks
+    where both sides talk at once.
+    """
+    mixed = np.zeros(len(blocks[0]), dtype=np.float32)
+    for block in blocks:
+        mixed += block
+    if clip_protection:
+        soft_clip(mixed)
+    else:
+        np.clip(mixed, -1.0, 1.0, out=mixed)
+    return mixed
+
+def normalization_gain(peak, target=PEAK_TARGET):
+    if peak <= 0:
+        return 1.0
+    return target / peak
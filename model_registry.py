@@ -0,0 +1,165 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from profiling import stage
+
+#----
+# Process-wide model registry
+#----
+# Models are kept warm between calls and evicted in least-recently-used order
+# only when the configured RAM/VRAM budget is exceeded. Loads run outside the
+# registry lock, so different models (ASR and pyannote on the two stage
+# threads) load at the same time; callers asking for a model that is already
+# loading wait for that load instead of starting another.
+
+# Approximate resident size (MB) of the WhisperX ASR models in float16.
+ASR_MODEL_SIZES_MB = {
+    "tiny": 75,
+    "base": 145,
+    "small": 485,
+    "medium": 1530,
+    "large": 3090,
+    "large-v2": 3090,
+    "large-v3": 3090,
+}
+COMPUTE_TYPE_FACTORS = {
+    "int8": 0.5,
+    "float16": 1.0,
+    "float32": 2.0,
+}
+DIARIZATION_MODEL = "pyannote/speaker-diarization"  # pyannote pipeline, not a setting
+DIARIZATION_DEVICE = "cpu"                          # pyannote always runs on the CPU
+
+DEFAULT_SIZES_MB = {
+    "asr": 1530,
+    "align": 400,
+    "diarize": 200,
+}
+
+_models = OrderedDict()  # key -> [model, size_mb, cleanup]
+_loading = {}            # key -> (Future of the model, estimated size_mb)
+_lock = threading.RLock()
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+def model_key(kind, model_name, device, compute_type=None, language=None, threads=None):
+    # `threads` is part of the key because CTranslate2 fixes its pool at load time
+    return (kind, model_name, device, compute_type, language, threads)
+
+def estimate_size_mb(key, model=None):
+    """
+    Estimate the memory used by a model. Torch modules are measured from their
+    parameters, everything else falls back to a per-kind table.
+    """
+    kind, model_name, _, compute_type = key[:4]
+    candidate = model[0] if isinstance(model, tuple) else model
+    if candidate is not None and hasattr(candidate, "parameters"):
+        try:
+            total = sum(p.numel() * p.element_size() for p in candidate.parameters())
+            if total > 0:
+                return total / (1024 * 1024)
+        except (AttributeError, TypeError):
+            pass
+    if kind == "asr":
+        size = ASR_MODEL_SIZES_MB.get(model_name, DEFAULT_SIZES_MB["asr"])
+        return size * COMPUTE_TYPE_FACTORS.get(compute_type, 1.0)
+    return DEFAULT_SIZES_MB.get(kind, 0)
+
+def _used_mb():
+    return sum(entry[1] for entry in _models.values())
+
+def _loading_mb():
+    return sum(size_mb for _, size_mb in _loading.values())
+
+def _evict_until(budget_mb, keep=None):
+    """
+    Drop least-recently-used models until the budget is respected.
+    """
+    for key in list(_models.keys()):
+        if _used_mb() <= budget_mb:
+            break
+        if key == keep:
+            continue
+        model, size_mb, cleanup = _models.pop(key)
+        del model
+        _stats["evictions"] += 1
+        print(f"Evicting cached model {key[0]} '{key[1]}' ({size_mb:.0f} MB) to respect the {budget_mb} MB budget.")
+        if cleanup is not None:
+            cleanup()
+
+def get_model(key, loader, budget_mb, cleanup=None):
+    """
+    Return the cached model for `key`, loading it with `loader()` on a miss.
+    `cleanup` is called after a model is evicted to release its memory. With
+    a budget of 0 nothing is cached: the model is freed once the caller
+    drops it, and the next call loads it again.
+    """
+    with _lock:
+        if key in _models:
+            _models.move_to_end(key)
+            _stats["hits"] += 1
+            print(f"Using cached {key[0]} model '{key[1]}'.")
+            return _models[key][0]
+
+        pending = _loading.get(key)
+        if pending is None:
+            _stats["misses"] += 1
+            size_mb = estimate_size_mb(key)
+            # Make room before loading so a large model never overlaps with
+            # the ones it replaces; loads in progress keep their share
+            _evict_until(budget_mb - size_mb - _loading_mb())
+            future = Future()
+            _loading[key] = (future, size_mb)
+        else:
+            _stats["hits"] += 1
+            future = pending[0]
+
+    if pending is not None:
+        print(f"Waiting for the {key[0]} model '{key[1]}' being loaded by another stage.")
+        return future.result()
+
+    try:
+        with stage(f"load_model.{key[0]}", model=key[1]):
+            model = loader()
+    except BaseException as e:
+        with _lock:
+            del _loading[key]
+        future.set_exception(e)
+        raise
+
+    with _lock:
+        del _loading[key]
+        if budget_mb > 0:
+            _models[key] = [model, estimate_size_mb(key, model), cleanup]
+            _evict_until(budget_mb - _loading_mb(), keep=key)
+    future.set_result(model)
+    return model
+
+def release_model(key):
+    """
+    Remove a single model from the registry.
+    """
+    with _lock:
+        entry = _models.pop(key, None)
+        if entry is None:
+            return
+        cleanup = entry[2]
+        del entry
+        if cleanup is not None:
+            cleanup()
+
+def clear_registry():
+    with _lock:
+        cleanups = [entry[2] for entry in _models.values() if entry[2] is not None]
+        _models.clear()
+        for cleanup in set(cleanups):
+            cleanup()
+
+def registry_stats():
+    with _lock:
+        return {
+            "hits": _stats["hits"],
+            "misses": _stats["misses"],
+            "evictions": _stats["evictions"],
+            "models": len(_models),
+            "used_mb": round(_used_mb(), 1),
+        }
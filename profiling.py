@@ -0,0 +1,216 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from contextlib import contextmanager
+
+#----
+# Stage instrumentation
+#----
+# Every pipeline stage runs inside `stage(name)`, which measures wall time,
+# process CPU time, RSS growth, peak CUDA memory and the real-time factor, and
+# hands the record to the registered sinks: a JSON lines file, an in-process
+# callback, or a TraceRecorder that exports the Chrome trace format
+# (chrome://tracing, https://ui.perfetto.dev).
+#
+# CPU time and memory are process-wide, so when stages overlap (diarization
+# runs next to ASR) their numbers include the work of the other stage. The OS
+# only reports the peak RSS of the whole process lifetime, so a stage records
+# how far it pushed that peak (rss_growth_mb) next to the process peak itself
+# (process_rss_peak_mb). A stage that stays below an earlier peak shows 0.
+
+MB = 1024 * 1024
+
+_sinks = []
+_lock = threading.Lock()
+_active = 0
+
+def add_sink(sink):
+    """
+    Register a callable that receives every stage record (a dict).
+    """
+    with _lock:
+        _sinks.append(sink)
+    return sink
+
+def remove_sink(sink):
+    with _lock:
+        if sink in _sinks:
+            _sinks.remove(sink)
+
+def peak_rss_mb():
+    """
+    Peak resident memory of this process since it started (not per stage),
+    or None when unavailable.
+    """
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / MB
+        except Exception:
+            return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / MB if sys.platform == "darwin" else peak / 1024
+
+def _cuda():
+    # Only look at torch when something else imported it; profiling must not pull it in
+    torch = sys.modules.get("torch")
+    if torch is None or not torch.cuda.is_available():
+        return None
+    return torch.cuda
+
+def cuda_peak_mb():
+    cuda = _cuda()
+    return cuda.max_memory_allocated() / MB if cuda is not None else None
+
+def _emit(record):
+    with _lock:
+        sinks = list(_sinks)
+    for sink in sinks:
+        try:
+            sink(record)
+        except Exception as e:
+            print(f"Profiling sink failed: {e}")
+
+@contextmanager
+def stage(name, timings=None, audio_seconds=None, **fields):
+    """
+    Measure the enclosed block as stage `name`. The yielded record can be
+    updated inside the block, e.g. with `audio_seconds` once the audio is
+    decoded. Wall seconds also go into `timings[name]` when a dict is passed.
+    """
+    global _active
+    with _lock:
+        if _active == 0 and _cuda() is not None:
+            _cuda().reset_peak_memory_stats()
+        _active += 1
+    record = {"name": name, "audio_seconds": audio_seconds, **fields}
+    rss_before = peak_rss_mb()
+    start_time = time.time()
+    start = time.perf_counter()
+    start_cpu = time.process_time()
+    try:
+        yield record
+    finally:
+        wall = time.perf_counter() - start
+        with _lock:
+            _active -= 1
+        rss_peak = peak_rss_mb()
+        record.update({
+            "start": start_time,
+            "wall_seconds": wall,
+            "cpu_seconds": time.process_time() - start_cpu,
+            "process_rss_peak_mb": rss_peak,
+            "rss_growth_mb": rss_peak - rss_before if rss_peak is not None and rss_before is not None else None,
+            "cuda_peak_mb": cuda_peak_mb(),
+            "pid": os.getpid(),
+            "thread": threading.current_thread().name,
+        })
+        seconds = record.get("audio_seconds")
+        record["rtf"] = wall / seconds if seconds else None
+        if timings is not None:
+            timings[name] = wall
+        _emit(record)
+
+# -------
+# Sinks
+# -------
+
+class JsonLinesSink:
+    """
+    Append every record as one JSON line to `path`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def __call__(self, record):
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self.lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+class TraceRecorder:
+    """
+    Keep records in memory for a summary table or a Chrome trace.
+    """
+
+    def __init__(self):
+        self.records = []
+        self.lock = threading.Lock()
+
+    def __call__(self, record):
+        with self.lock:
+            self.records.append(dict(record))
+
+    def save_chrome_trace(self, path):
+        export_chrome_trace(self.records, path)
+
+def read_json_lines(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def to_chrome_trace(records):
+    """
+    Chrome trace event JSON ("X" complete events, one lane per thread).
+    """
+    origin = min((record["start"] for record in records), default=0.0)
+    lanes = {}
+    events = []
+    for record in records:
+        tid = lanes.setdefault((record["pid"], record["thread"]), len(lanes) + 1)
+        args = {key: value for key, value in record.items() if key not in ("name", "start", "pid", "thread") and value is not None}
+        events.append({
+            "name": record["name"],
+            "ph": "X",
+            "ts": round((record["start"] - origin) * 1e6),
+            "dur": round(record["wall_seconds"] * 1e6),
+            "pid": record["pid"],
+            "tid": tid,
+            "args": args,
+        })
+    for (pid, thread), tid in lanes.items():
+        events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread}})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+def export_chrome_trace(records, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(to_chrome_trace(records), f)
+
+def format_records(records):
+    """
+    Table of stage records, one line per stage.
+    """
+    def number(value, pattern):
+        return pattern.format(value) if value is not None else "-"
+
+    lines = [f"  {'stage':<24} {'wall':>9} {'cpu':>9} {'rss growth':>10} {'proc peak':>10} {'cuda peak':>10} {'rtf':>7}"]
+    for record in records:
+        lines.append(
+            f"  {record['name']:<24} {record['wall_seconds']:8.2f}s {record['cpu_seconds']:8.2f}s "
+            f"{number(record.get('rss_growth_mb'), '{:7.0f} MB'):>10} {number(record.get('process_rss_peak_mb'), '{:7.0f} MB'):>10} "
+            f"{number(record.get('cuda_peak_mb'), '{:7.0f} MB'):>10} "
+            f"{number(record.get('rtf'), '{:7.3f}'):>7}"
+        )
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert stage records (JSON lines) to a Chrome trace or a summary table.")
+    parser.add_argument("records", help="JSON lines file written with --profile-log")
+    parser.add_argument("--trace", default=None, help="Write a Chrome trace JSON file")
+    args = parser.parse_args(argv)
+
+    records = read_json_lines(args.records)
+    print(format_records(records))
+    if args.trace:
+        export_chrome_trace(records, args.trace)
+        print(f"Trace saved to {args.trace} (open it in chrome://tracing or https://ui.perfetto.dev)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,11 @@
-import sounddevice as sd
+import soundfile as sf
 import numpy as np
-import scipy.io.wavfile as wav
 import os
+import queue
 from datetime import datetime
 import threading
 import time
+from mixer import StreamResampler, TARGET_SAMPLE_RATE, mix_blocks, normalization_gain
 
 #----
 # Configuration
@@ -12,11 +13,16 @@ import time
 
 SAMPLE_RATE = 44100  # Sample rate for recording (common for most devices)
 CHANNELS = 1        # Mono audio
+QUEUE_MAX_BLOCKS = 512  # Callback blocks buffered between the audio thread and the writer
+FLUSH_SECONDS = 5       # How often the channel files are synced to disk
+MIX_BLOCK_SECONDS = 10  # Output block size of the mixing pass
 
 def dynamic_name():
     return datetime.now().strftime("recorded_audio_%Y%m%d_%H%M%S.wav")
 
 def list_input_devices():
+    import sounddevice as sd
+
     print("Available audio input devices:")
     devices = sd.query_devices()
     for idx, device in enumerate(devices):
@@ -25,20 +31,33 @@ def list_input_devices():
     
     return devices
 
-def record_audio_dual(filename=None, mic_device=None, loopback_device=None):
+def record_audio_dual(filename=None, mic_device=None, loopback_device=None, streamer=None, normalize=False, return_audio=False, save_wav=True, duration=None, prompt_devices=True, keep_channels=False):
+    """
+    Record the microphone and loopback devices until ENTER is pressed (or for
+    `duration` seconds) and mix them into a 16 kHz mono WAV. Returns the file
+    name, or None if nothing was recorded. With `return_audio`, returns (file
+    name, float32 waveform) instead and the WAV is written on a background
+    thread (or skipped when `save_wav` is False) so transcription can start
+    right away. With `prompt_devices` False, missing device IDs fall back to
+    the system defaults instead of being asked for. With `keep_channels`, the
+    WAV and the waveform are stereo instead: mic left, loopback right.
+    """
+    # Imported here so the mixing helpers work without PortAudio installed
+    import sounddevice as sd
+
     FILENAME = filename if filename else dynamic_name()
 
-    devices = list_input_devices()
+    devices = list_input_devices() if prompt_devices else sd.query_devices()
     
     # If devices not specified, prompt user
-    if mic_device is None:
+    if mic_device is None and prompt_devices:
         try:
             mic_device = int(input("Enter microphone device ID: "))
         except ValueError:
             print("Invalid input. Using default.")
             mic_device = None
     
-    if loopback_device is None:
+    if loopback_device is None and prompt_devices:
         try:
             loopback_device = int(input("Enter loopback device ID (e.g., Stereo Mix): "))
         except ValueError:
@@ -48,24 +67,64 @@ def record_audio_dual(filename=None, mic_device=None, loopback_device=None):
     # Get default sample rates for devices
     mic_rate = devices[mic_device]['default_samplerate'] if mic_device is not None else SAMPLE_RATE
     loopback_rate = devices[loopback_device]['default_samplerate'] if loopback_device is not None else SAMPLE_RATE
-    
-    # Use the higher rate or a common one
-    actual_rate = max(mic_rate, loopback_rate, 44100)
-    print(f"Using sample rate: {actual_rate} Hz")
+    layout = "stereo (mic left, loopback right)" if keep_channels else "mono"
+    print(f"Recording at {mic_rate} Hz (mic) and {loopback_rate} Hz (loopback), saving 16 kHz {layout}.")
 
-    mic_data = []
-    loopback_data = []
-    stop_recording = threading.Event()
+    base_name = os.path.splitext(FILENAME)[0]
+    channel_paths = {
+        "mic": f"{base_name}.mic.wav",
+        "loopback": f"{base_name}.loopback.wav",
+    }
+    channel_rates = {"mic": mic_rate, "loopback": loopback_rate}
+    audio_queue = queue.Queue(maxsize=QUEUE_MAX_BLOCKS)
+    dropped = {"mic": 0, "loopback": 0}
 
     def mic_callback(indata, frames, time, status):
         if status:
             print(f"Mic status: {status}")
-        mic_data.append(indata.copy())
+        try:
+            audio_queue.put_nowait(("mic", indata.copy()))
+        except queue.Full:
+            dropped["mic"] += frames
+        if streamer is not None:
+            streamer.feed("mic", indata, mic_rate)
 
     def loopback_callback(indata, frames, time, status):
         if status:
             print(f"Loopback status: {status}")
-        loopback_data.append(indata.copy())
+        try:
+            audio_queue.put_nowait(("loopback", indata.copy()))
+        except queue.Full:
+            dropped["loopback"] += frames
+        if streamer is not None:
+            streamer.feed("loopback", indata, loopback_rate)
+
+    channel_files = {
+        source: sf.SoundFile(path, mode="w", samplerate=int(channel_rates[source]), channels=CHANNELS, subtype="PCM_16")
+        for source, path in channel_paths.items()
+    }
+    written = {"mic": 0, "loopback": 0}
+
+    def writer():
+        """
+        Drain the callback queue into the channel files, syncing them regularly
+        so a crash keeps everything recorded up to the last flush.
+        """
+        last_flush = time.monotonic()
+        while True:
+            item = audio_queue.get()
+            if item is None:
+                break
+            source, block = item
+            channel_files[source].write(block)
+            written[source] += len(block)
+            if time.monotonic() - last_flush > FLUSH_SECONDS:
+                for channel_file in channel_files.values():
+                    channel_file.flush()
+                last_flush = time.monotonic()
+
+    writer_thread = threading.Thread(target=writer, daemon=True)
+    writer_thread.start()
 
     # Create streams with device-specific rates
     mic_stream = sd.InputStream(
@@ -84,40 +143,132 @@ def record_audio_dual(filename=None, mic_device=None, loopback_device=None):
         device=loopback_device
     )
 
-    with mic_stream, loopback_stream:
-        print("Recording started from microphone and loopback.\n")
-        print("Press ENTER to stop recording.")
-        input()  # Wait for user to press Enter
-        print("Recording stopped.")
-
-    # Mix the recordings (resample if needed)
-    if mic_data and loopback_data:
-        mic_recording = np.concatenate(mic_data, axis=0)
-        loopback_recording = np.concatenate(loopback_data, axis=0)
-        
-        # Resample to common rate if different
-        if mic_rate != actual_rate:
-            from scipy.signal import resample
-            mic_recording = resample(mic_recording.astype(float), int(len(mic_recording) * actual_rate / mic_rate)).astype(np.int16)
-        if loopback_rate != actual_rate:
-            from scipy.signal import resample
-            loopback_recording = resample(loopback_recording.astype(float), int(len(loopback_recording) * actual_rate / loopback_rate)).astype(np.int16)
-        
-        # Ensure same length
-        min_len = min(len(mic_recording), len(loopback_recording))
-        mic_recording = mic_recording[:min_len]
-        loopback_recording = loopback_recording[:min_len]
-        
-        # Mix (average)
-        mixed_recording = (mic_recording.astype(np.float32) + loopback_recording.astype(np.float32)) / 2
-        mixed_recording = mixed_recording.astype(np.int16)
-        
-        wav.write(FILENAME, int(actual_rate), mixed_recording)
+    try:
+        with mic_stream, loopback_stream:
+            print("Recording started from microphone and loopback.\n")
+            if duration is not None:
+                print(f"Recording for {duration} seconds.")
+                time.sleep(duration)
+            else:
+                print("Press ENTER to stop recording.")
+                input()  # Wait for user to press Enter
+            print("Recording stopped.")
+    finally:
+        audio_queue.put(None)
+        writer_thread.join()
+        for channel_file in channel_files.values():
+            channel_file.close()
+
+    for source, frames in dropped.items():
+        if frames:
+            print(f"Warning: {frames} {source} frames dropped because the disk writer fell behind.")
+
+    if written["mic"] and written["loopback"]:
+        if return_audio:
+            audio = mix_channel_audio(channel_paths["mic"], channel_paths["loopback"], normalize=normalize, stereo=keep_channels)
+            for path in channel_paths.values():
+                os.remove(path)
+            if save_wav:
+                save_audio_async(FILENAME, audio)
+            return FILENAME, audio
+        mix_channel_files(channel_paths["mic"], channel_paths["loopback"], FILENAME, normalize=normalize, stereo=keep_channels)
+        for path in channel_paths.values():
+            os.remove(path)
         print(f"Mixed audio saved to {FILENAME}")
         return FILENAME
     else:
+        for path in channel_paths.values():
+            os.remove(path)
         print("No data recorded.")
         return None
 
+def iter_mixed_blocks(paths, out_rate=TARGET_SAMPLE_RATE):
+    """
+    Yield the sum of the channel files, resampled to `out_rate`, one block at a
+    time. The output stops at the end of the shortest channel.
+    """
+    files = [sf.SoundFile(path) for path in paths]
+    try:
+        resamplers = [StreamResampler(f.samplerate, out_rate) for f in files]
+        pending = [np.zeros(0, dtype=np.float32) for _ in files]
+        finished = [False] * len(files)
+
+        while not all(finished):
+            for i, channel_file in enumerate(files):
+                if finished[i]:
+                    continue
+                block = channel_file.read(int(MIX_BLOCK_SECONDS * channel_file.samplerate), dtype='float32', always_2d=True)[:, 0]
+                if len(block):
+                    resampled = resamplers[i].process(block)
+                else:
+                    resampled = resamplers[i].flush()
+                    finished[i] = True
+                pending[i] = np.concatenate([pending[i], resampled])
+
+            # Ensure same length
+            length = min(len(block) for block in pending)
+            if length:
+                yield [block[:length] for block in pending]
+                pending = [block[length:] for block in pending]
+            if any(finished[i] and not len(pending[i]) for i in range(len(files))):
+                break
+    finally:
+        for channel_file in files:
+            channel_file.close()
+
+def iter_mix(paths, out_rate=TARGET_SAMPLE_RATE, normalize=False, stereo=False):
+    """
+    Yield the final mixed float32 blocks. With `normalize`, a first pass
+    measures the peak so the mix can be scaled to a fixed level. With
+    `stereo`, the channels are not summed and each block is (samples,
+    channels), scaled by the same gain so their relative levels are kept.
+    """
+    gain = 1.0
+    if normalize:
+        peak = 0.0
+        for blocks in iter_mixed_blocks(paths, out_rate):
+            level = np.abs(blocks) if stereo else np.abs(np.sum(blocks, axis=0))
+            peak = max(peak, float(np.max(level)))
+        gain = normalization_gain(peak)
+
+    for blocks in iter_mixed_blocks(paths, out_rate):
+        if gain != 1.0:
+            blocks = [block * np.float32(gain) for block in blocks]
+        yield np.clip(np.stack(blocks, axis=1), -1.0, 1.0) if stereo else mix_blocks(blocks)
+
+def mix_channel_files(mic_path, loopback_path, filename, out_rate=TARGET_SAMPLE_RATE, normalize=False, stereo=False):
+    """
+    Mix the two channel files into a 16 kHz mono WAV (or a stereo one with
+    `stereo`) block by block, so memory use stays flat regardless of the
+    recording length.
+    """
+    channels = 2 if stereo else CHANNELS
+    with sf.SoundFile(filename, mode="w", samplerate=out_rate, channels=channels, subtype="PCM_16") as out_file:
+        for mixed in iter_mix((mic_path, loopback_path), out_rate, normalize, stereo):
+            out_file.write(mixed)
+
+def mix_channel_audio(mic_path, loopback_path, out_rate=TARGET_SAMPLE_RATE, normalize=False, stereo=False):
+    """
+    Mix the two channel files into an in-memory 16 kHz float32 waveform, or a
+    (samples, 2) array with `stereo`.
+    """
+    blocks = list(iter_mix((mic_path, loopback_path), out_rate, normalize, stereo))
+    if not blocks:
+        return np.zeros((0, 2) if stereo else 0, dtype=np.float32)
+    return np.concatenate(blocks)
+
+def save_audio_async(filename, audio, rate=TARGET_SAMPLE_RATE):
+    """
+    Write a waveform to a 16-bit WAV on a background thread. The thread is not
+    a daemon, so the file is always completed before the program exits.
+    """
+    def write():
+        sf.write(filename, audio, rate, subtype="PCM_16")
+        print(f"Mixed audio saved to {filename}")
+
+    thread = threading.Thread(target=write)
+    thread.start()
+    return thread
+
 if __name__ == "__main__":
     record_audio_dual()
@@ -0,0 +1,132 @@
+import os
+import glob
+import json
+import zlib
+import pickle
+import hashlib
+import threading
+import numpy as np
+from model_registry import DIARIZATION_MODEL, DIARIZATION_DEVICE
+
+#----
+# Content-addressed result cache
+#----
+# Stage outputs are stored under a hash of the audio content plus the subset of
+# the configuration that affects that stage, so re-running a meeting with e.g. a
+# different SPEAKER_COUNT only recomputes diarization.
+
+CACHE_SUFFIX = ".pkl.z"
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# Configuration keys each stage depends on
+STAGE_CONFIG_KEYS = {
+    "vad": (),
+    "asr": ("MODEL_NAME", "LANGUAGE", "COMPUTE_TYPE", "BATCH_SIZE", "VAD_PREPASS"),
+    "align": ("MODEL_NAME", "LANGUAGE", "COMPUTE_TYPE", "BATCH_SIZE", "VAD_PREPASS"),
+    "diarize": ("SPEAKER_COUNT", "MAX_SPEAKERS", "VAD_PREPASS", "DIARIZATION_MODE"),
+    "window": ("MODEL_NAME", "LANGUAGE", "COMPUTE_TYPE", "BATCH_SIZE", "VAD_PREPASS", "SPEAKER_COUNT", "MAX_SPEAKERS", "WINDOW_SECONDS"),
+}
+
+# Fixed models a stage runs, keyed like settings so a new pipeline invalidates its results
+STAGE_MODELS = {
+    "diarize": {"diarization_model": DIARIZATION_MODEL, "diarization_device": DIARIZATION_DEVICE},
+    "window": {"diarization_model": DIARIZATION_MODEL, "diarization_device": DIARIZATION_DEVICE},
+}
+
+_lock = threading.Lock()
+
+def audio_fingerprint(audio):
+    """
+    SHA-256 of the audio content: the file bytes for a path, the samples for an array.
+    """
+    digest = hashlib.sha256()
+    if isinstance(audio, str):
+        with open(audio, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+    else:
+        digest.update(str(audio.dtype).encode())
+        digest.update(memoryview(np.ascontiguousarray(audio)).cast("B"))
+    return digest.hexdigest()
+
+def cache_key(stage, fingerprint, configs, extra=None):
+    params = {key: configs.get(key) for key in STAGE_CONFIG_KEYS[stage]}
+    params.update(STAGE_MODELS.get(stage, {}))
+    if extra:
+        params.update(extra)
+    payload = json.dumps([stage, fingerprint, params], sort_keys=True, default=str)
+    return f"{stage}-{hashlib.sha256(payload.encode()).hexdigest()}"
+
+def _path(cache_dir, key):
+    return os.path.join(cache_dir, key + CACHE_SUFFIX)
+
+def load_result(cache_dir, key):
+    """
+    Return (True, value) on a hit, (False, None) on a miss or unreadable entry.
+    """
+    path = _path(cache_dir, key)
+    try:
+        with open(path, "rb") as f:
+            value = pickle.loads(zlib.decompress(f.read()))
+    except FileNotFoundError:
+        return False, None
+    except (OSError, zlib.error, pickle.UnpicklingError, EOFError):
+        print(f"Ignoring unreadable cache entry {path}.")
+        return False, None
+    # Touch the entry so eviction is least-recently-used
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return True, value
+
+def store_result(cache_dir, key, value, max_mb):
+    # Private to the user: anyone who can write here can run code through pickle
+    os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+    path = _path(cache_dir, key)
+    data = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), 6)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    evict(cache_dir, max_mb)
+
+def evict(cache_dir, max_mb):
+    """
+    Delete least-recently-used entries until the cache fits in `max_mb`.
+    """
+    with _lock:
+        entries = []
+        for path in glob.glob(os.path.join(cache_dir, "*" + CACHE_SUFFIX)):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        limit = max_mb * 1024 * 1024
+        for _, size, path in sorted(entries):
+            if total <= limit:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+def cached_stage(configs, stage, fingerprint, compute, extra=None):
+    """
+    Return the cached output of `stage`, or run `compute()` and store it.
+    Caching is skipped when RESULT_CACHE is off or no fingerprint is available.
+    """
+    if not configs.get("RESULT_CACHE") or fingerprint is None:
+        return compute()
+    cache_dir = configs["RESULT_CACHE_DIR"]
+    key = cache_key(stage, fingerprint, configs, extra)
+    hit, value = load_result(cache_dir, key)
+    if hit:
+        print(f"Using cached {stage} result.")
+        return value
+    value = compute()
+    store_result(cache_dir, key, value, configs["RESULT_CACHE_MB"])
+    return value
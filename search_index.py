@@ -0,0 +1,183 @@
+import os
+import re
+import time
+import sqlite3
+import threading
+
+#----
+# Transcript search index
+#----
+# Every finished meeting's speaker turns (from format_transcription) go into a
+# SQLite database with an FTS5 full-text index, so "when did we agree on X"
+# is one ranked query instead of a grep over every transcript. Turns live in
+# a plain table indexed by meeting, and the FTS5 table indexes their text
+# and speaker through triggers. Re-indexing a meeting only touches that
+# meeting's rows, whatever the size of the archive. Hits are ranked with
+# bm25, with the spoken text weighted above the speaker name.
+
+TEXT_WEIGHT = 1.0             # bm25 column weights
+SPEAKER_WEIGHT = 0.3
+SNIPPET_TOKENS = 16           # Words around the match in a hit's snippet
+BUSY_TIMEOUT_SECONDS = 30     # Batch workers may write at the same time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meetings (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    source TEXT,
+    indexed_at REAL NOT NULL,
+    turns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY,
+    meeting_id INTEGER NOT NULL REFERENCES meetings(id) ON DELETE CASCADE,
+    speaker TEXT,
+    start REAL,
+    end REAL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS turns_meeting ON turns(meeting_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS turns_fts USING fts5(
+    text, speaker, content='turns', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS turns_insert AFTER INSERT ON turns BEGIN
+    INSERT INTO turns_fts(rowid, text, speaker) VALUES (new.id, new.text, new.speaker);
+END;
+CREATE TRIGGER IF NOT EXISTS turns_delete AFTER DELETE ON turns BEGIN
+    INSERT INTO turns_fts(turns_fts, rowid, text, speaker) VALUES ('delete', old.id, old.text, old.speaker);
+END;
+"""
+
+TURN_LINE = re.compile(r"^(?:\[(?P<start>[\d.]+|\?)-(?P<end>[\d.]+|\?)\]\s*)?Speaker (?P<speaker>[^:]+): (?P<text>.*)$")
+
+_lock = threading.Lock()
+
+def connect(path):
+    connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT_SECONDS)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute("PRAGMA foreign_keys=ON")
+    connection.executescript(SCHEMA)
+    return connection
+
+def upsert_meeting(connection, name, turns, source=None):
+    """
+    Replace the indexed turns of meeting `name` with `turns` (dicts with
+    start, end, speaker and text) in one transaction.
+    """
+    rows = [
+        (turn.get("speaker"), turn.get("start"), turn.get("end"), turn["text"])
+        for turn in turns if turn.get("text", "").strip()
+    ]
+    with connection:
+        connection.execute("DELETE FROM meetings WHERE name = ?", (name,))
+        meeting_id = connection.execute(
+            "INSERT INTO meetings (name, source, indexed_at, turns) VALUES (?, ?, ?, ?)",
+            (name, source, time.time(), len(rows)),
+        ).lastrowid
+        connection.executemany(
+            "INSERT INTO turns (meeting_id, speaker, start, end, text) VALUES (?, ?, ?, ?, ?)",
+            [(meeting_id,) + row for row in rows],
+        )
+    return len(rows)
+
+def remove_meeting(connection, name):
+    with connection:
+        return connection.execute("DELETE FROM meetings WHERE name = ?", (name,)).rowcount
+
+def list_meetings(connection):
+    return connection.execute("SELECT name, turns, source, indexed_at FROM meetings ORDER BY indexed_at").fetchall()
+
+def match_expression(query):
+    """
+    FTS5 expression for a plain query: every word must appear, "quoted
+    phrases" must appear as phrases, and a trailing * keeps prefix search.
+    """
+    terms = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', query):
+        if phrase.strip():
+            terms.append('"' + phrase.replace('"', "") + '"')
+        elif word:
+            prefix = word.endswith("*")
+            word = word.rstrip("*").replace('"', "")
+            if word:
+                terms.append(f'"{word}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+def search(connection, query, limit=20, speaker=None, meeting=None, raw=False):
+    """
+    Best matching turns as dicts with meeting, speaker, start, end, snippet
+    and score (lower is better). `raw` passes `query` to FTS5 unchanged.
+    """
+    expression = query if raw else match_expression(query)
+    if not expression:
+        return []
+    sql = (
+        "SELECT m.name, t.speaker, t.start, t.end, "
+        f"snippet(turns_fts, 0, '[', ']', '...', {SNIPPET_TOKENS}), "
+        f"bm25(turns_fts, {TEXT_WEIGHT}, {SPEAKER_WEIGHT}) AS score "
+        "FROM turns_fts JOIN turns t ON t.id = turns_fts.rowid JOIN meetings m ON m.id = t.meeting_id "
+        "WHERE turns_fts MATCH ?"
+    )
+    params = [expression]
+    if speaker:
+        sql += " AND t.speaker = ?"
+        params.append(speaker)
+    if meeting:
+        sql += " AND m.name = ?"
+        params.append(meeting)
+    sql += " ORDER BY score LIMIT ?"
+    params.append(limit)
+    return [
+        {"meeting": name, "speaker": turn_speaker, "start": start, "end": end, "snippet": snippet, "score": score}
+        for name, turn_speaker, start, end, snippet, score in connection.execute(sql, params)
+    ]
+
+def parse_transcript(text):
+    """
+    Turns of a saved transcript ("Speaker X: text" lines, optionally with
+    "[start-end] " timestamps in front; "?" marks a missing one).
+    """
+    turns = []
+    for line in text.splitlines():
+        found = TURN_LINE.match(line.strip())
+        if found:
+            start, end = found.group("start"), found.group("end")
+            turns.append({
+                "start": float(start) if start not in (None, "?") else None,
+                "end": float(end) if end not in (None, "?") else None,
+                "speaker": found.group("speaker"),
+                "text": found.group("text"),
+            })
+    return turns
+
+def format_offset(seconds):
+    if seconds is None:
+        return "--:--:--"
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+def format_hit(hit):
+    return f"{hit['meeting']}  {format_offset(hit['start'])}  {hit['speaker']}: {hit['snippet']}"
+
+def index_meeting(name, word_segments, configs, source=None):
+    """
+    Pipeline hook: add a finished meeting to the SEARCH_INDEX database. A
+    failure is reported but never fails the transcription.
+    """
+    path = configs.get("SEARCH_INDEX")
+    if not path:
+        return
+    from transcript import format_transcription
+
+    try:
+        turns = format_transcription(word_segments)
+        with _lock:
+            connection = connect(path)
+            try:
+                count = upsert_meeting(connection, name, turns, os.path.abspath(source) if source else None)
+            finally:
+                connection.close()
+        print(f"Indexed {count} turns of '{name}' for search.")
+    except (sqlite3.Error, OSError) as e:
+        print(f"Could not update the search index {path}: {e}")
@@ -0,0 +1,389 @@
+import os
+import json
+import math
+import time
+import uuid
+import queue
+import tempfile
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+#----
+# Configuration
+#----
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+QUEUE_SIZE = 32              # Uploads waiting for transcription before new ones get 503
+TRANSCRIBE_WORKERS = 1       # Concurrent transcriptions (models are shared and kept warm)
+SUMMARIZE_WORKERS = 2        # Concurrent Ollama summaries
+LATENCY_WINDOW = 1000        # Latencies kept per stage for the percentiles
+MAX_WAIT_SECONDS = 60        # Upper bound for long-polling a job
+MAX_UPLOAD_BYTES = 2 * 1024 ** 3
+JOB_TTL_SECONDS = 3600       # Finished jobs (and their transcripts) are kept this long...
+MAX_FINISHED_JOBS = 1000     # ...and at most this many of them
+FINISHED = ("done", "failed")
+
+def default_transcribe(audio_file, configs):
+    from diarization import transcription_with_diarization
+    return transcription_with_diarization(audio_file, configs)
+
+def default_summarize(transcricao):
+    from summarizer import generate_summary
+    return generate_summary(transcricao)
+
+def warm_models(configs):
+    """
+    Load the WhisperX, alignment and pyannote models into the model registry
+    before the first upload arrives, so no job pays for the model load.
+    """
+    from diarization import load_asr_model, load_align_model, load_diarization_pipeline
+
+    load_asr_model(configs, configs["LANGUAGE"])
+    if configs["LANGUAGE"]:
+        load_align_model(configs["LANGUAGE"], configs)
+    load_diarization_pipeline(configs)
+
+def audio_duration(audio_file, word_segments):
+    """
+    Length of the upload in seconds, falling back to the last word's end time.
+    """
+    try:
+        import soundfile as sf
+        return sf.info(audio_file).duration
+    except Exception:
+        ends = [segment["end"] for segment in word_segments if "end" in segment]
+        return max(ends) if ends else 0.0
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of a list of numbers.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+class TranscriptionService:
+    """
+    Job queue behind the HTTP server. Uploads wait in a bounded queue, a pool
+    of transcription workers shares the warm models of this process, and
+    finished transcripts move on to a separate pool of summary workers.
+    Finished jobs are forgotten after `job_ttl` seconds, oldest first once
+    more than `max_finished_jobs` are kept.
+    `transcribe` and `summarize` can be replaced, e.g. with stubs in tests.
+    """
+
+    def __init__(self, configs=None, transcribe=None, summarize=None, jobs_dir=None,
+                 queue_size=QUEUE_SIZE, transcribe_workers=TRANSCRIBE_WORKERS, summarize_workers=SUMMARIZE_WORKERS,
+                 job_ttl=JOB_TTL_SECONDS, max_finished_jobs=MAX_FINISHED_JOBS):
+        if configs is None:
+            from config import DEFAULT_CONFIGS
+            configs = DEFAULT_CONFIGS.copy()
+        self.configs = configs
+        self.transcribe = transcribe or default_transcribe
+        self.summarize = summarize or default_summarize
+        self.jobs_dir = jobs_dir or tempfile.mkdtemp(prefix="meetsolution_jobs_")
+        os.makedirs(self.jobs_dir, exist_ok=True)
+
+        self.jobs = {}
+        self.finished = deque()      # (finish time, job id), oldest first
+        self.job_ttl = job_ttl
+        self.max_finished_jobs = max_finished_jobs
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.transcribe_queue = queue.Queue(maxsize=queue_size)
+        self.summarize_queue = queue.Queue()
+        self.latencies = {stage: deque(maxlen=LATENCY_WINDOW) for stage in ("queue", "transcribe", "summarize", "total")}
+        self.active = {"transcribe": 0, "summarize": 0}
+        self.audio_seconds_processed = 0.0
+        self.counts = {"submitted": 0, "done": 0, "failed": 0, "rejected": 0}
+
+        self.workers = []
+        for _ in range(transcribe_workers):
+            self.workers.append(threading.Thread(target=self._transcribe_loop, daemon=True))
+        for _ in range(summarize_workers):
+            self.workers.append(threading.Thread(target=self._summarize_loop, daemon=True))
+        for worker in self.workers:
+            worker.start()
+
+    # -------
+    # Jobs
+    # -------
+
+    def submit(self, data, filename="upload.wav", summarize=True):
+        """
+        Store an upload and queue it. Returns the job, or None when the queue is full.
+        """
+        job_id = uuid.uuid4().hex
+        extension = os.path.splitext(filename)[1] or ".wav"
+        audio_file = os.path.join(self.jobs_dir, job_id + extension)
+        with open(audio_file, "wb") as f:
+            f.write(data)
+
+        job = {
+            "id": job_id,
+            "filename": filename,
+            "status": "queued",
+            "summarize": summarize,
+            "created": time.time(),
+            "events": [],
+            "audio_file": audio_file,
+        }
+        with self.lock:
+            self._expire_jobs()
+            try:
+                self.transcribe_queue.put_nowait(job_id)
+            except queue.Full:
+                self.counts["rejected"] += 1
+                os.remove(audio_file)
+                return None
+            self.jobs[job_id] = job
+            self.counts["submitted"] += 1
+            self._event(job, "queued")
+        return job
+
+    def _event(self, job, status, **fields):
+        """
+        Record a status change. Must be called with the lock held.
+        """
+        job["status"] = status
+        job.update(fields)
+        job["events"].append({"status": status, "time": time.time(), **{k: v for k, v in fields.items() if k != "result"}})
+        self.changed.notify_all()
+
+    def public_job(self, job):
+        return {key: value for key, value in job.items() if key not in ("events", "audio_file")}
+
+    def get(self, job_id, wait=0):
+        """
+        Return a job, waiting up to `wait` seconds for it to finish.
+        """
+        deadline = time.time() + min(wait, MAX_WAIT_SECONDS)
+        with self.lock:
+            self._expire_jobs()
+            job = self.jobs.get(job_id)
+            while job is not None and job["status"] not in FINISHED and time.time() < deadline:
+                self.changed.wait(deadline - time.time())
+            return None if job is None else self.public_job(job)
+
+    def events(self, job_id):
+        """
+        Yield job events as they happen until the job finishes.
+        """
+        sent = 0
+        while True:
+            with self.lock:
+                job = self.jobs.get(job_id)
+                if job is None:
+                    return
+                while sent == len(job["events"]) and job["status"] not in FINISHED:
+                    self.changed.wait(MAX_WAIT_SECONDS)
+                pending = job["events"][sent:]
+                sent = len(job["events"])
+                finished = job["status"] in FINISHED
+                snapshot = self.public_job(job) if finished else None
+            for event in pending:
+                yield event
+            if finished:
+                yield {"status": "result", "job": snapshot}
+                return
+
+    # -------
+    # Workers
+    # -------
+
+    def _transcribe_loop(self):
+        from transcript import WordTable
+        from search_index import index_meeting
+
+        while True:
+            job_id = self.transcribe_queue.get()
+            with self.lock:
+                job = self.jobs[job_id]
+                self.latencies["queue"].append(time.time() - job["created"])
+                self.active["transcribe"] += 1
+                self._event(job, "transcribing")
+            start = time.perf_counter()
+            try:
+                word_segments = self.transcribe(job["audio_file"], self.configs)
+                table = WordTable.from_word_segments(word_segments)
+                transcript = table.to_text()
+                turns = table.to_turns()
+                duration = audio_duration(job["audio_file"], word_segments)
+                # Uploads often share a file name; the job id keeps meetings apart
+                index_meeting(f"{os.path.splitext(job['filename'])[0]}-{job_id[:8]}", word_segments, self.configs)
+            except Exception as e:
+                with self.lock:
+                    self.active["transcribe"] -= 1
+                    self._finish(job, "failed", error=str(e))
+                continue
+            elapsed = time.perf_counter() - start
+
+            with self.lock:
+                self.active["transcribe"] -= 1
+                self.latencies["transcribe"].append(elapsed)
+                self.audio_seconds_processed += duration
+                job.update({"transcript": transcript, "turns": turns, "audio_seconds": duration})
+                if job["summarize"]:
+                    self._event(job, "summarizing", transcribe_seconds=round(elapsed, 3))
+                    self.summarize_queue.put(job_id)
+                else:
+                    self._finish(job, "done", transcribe_seconds=round(elapsed, 3))
+
+    def _summarize_loop(self):
+        while True:
+            job_id = self.summarize_queue.get()
+            with self.lock:
+                job = self.jobs[job_id]
+                self.active["summarize"] += 1
+            start = time.perf_counter()
+            try:
+                summary = self.summarize(job["transcript"])
+            except Exception as e:
+                with self.lock:
+                    self.active["summarize"] -= 1
+                    self._finish(job, "failed", error=str(e))
+                continue
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.active["summarize"] -= 1
+                self.latencies["summarize"].append(elapsed)
+                job["summary"] = summary
+                self._finish(job, "done", summarize_seconds=round(elapsed, 3))
+
+    def _finish(self, job, status, **fields):
+        """
+        Mark a job done or failed and drop its upload. Must be called with the lock held.
+        """
+        self.counts[status] += 1
+        self.latencies["total"].append(time.time() - job["created"])
+        self._event(job, status, **fields)
+        try:
+            os.remove(job["audio_file"])
+        except OSError:
+            pass
+        self.finished.append((time.time(), job["id"]))
+        self._expire_jobs()
+
+    def _expire_jobs(self):
+        """
+        Forget finished jobs past their TTL or over the cap. Must be called with the lock held.
+        """
+        deadline = time.time() - self.job_ttl
+        while self.finished and (self.finished[0][0] < deadline or len(self.finished) > self.max_finished_jobs):
+            _, job_id = self.finished.popleft()
+            self.jobs.pop(job_id, None)
+
+    # -------
+    # Metrics
+    # -------
+
+    def metrics(self):
+        with self.lock:
+            self._expire_jobs()
+            latencies = {
+                stage: {
+                    "count": len(values),
+                    "p50": percentile(values, 0.50),
+                    "p90": percentile(values, 0.90),
+                    "p99": percentile(values, 0.99),
+                }
+                for stage, values in self.latencies.items()
+            }
+            return {
+                "queue_depth": self.transcribe_queue.qsize(),
+                "summary_queue_depth": self.summarize_queue.qsize(),
+                "active": dict(self.active),
+                "jobs": dict(self.counts),
+                "jobs_kept": len(self.jobs),
+                "audio_seconds_processed": round(self.audio_seconds_processed, 3),
+                "stage_latency_seconds": latencies,
+            }
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /jobs?filename=x.wav&summarize=1  upload audio (raw request body)
+    GET  /jobs/<id>?wait=<seconds>          job status and results
+    GET  /jobs/<id>/events                  newline-delimited JSON events until the job finishes
+    GET  /metrics                           queue depth, stage latency percentiles, audio processed
+    """
+
+    service = None
+    server_version = "MeetSolution"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/jobs":
+            return self._send_json(404, {"error": "not found"})
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0:
+            return self._send_json(400, {"error": "empty upload"})
+        if length > MAX_UPLOAD_BYTES:
+            return self._send_json(413, {"error": "upload too large"})
+        params = parse_qs(url.query)
+        filename = os.path.basename(params.get("filename", ["upload.wav"])[0])
+        summarize = params.get("summarize", ["1"])[0].lower() not in ("0", "false", "no")
+        job = self.service.submit(self.rfile.read(length), filename, summarize)
+        if job is None:
+            return self._send_json(503, {"error": "queue full, retry later"})
+        self._send_json(202, {"id": job["id"], "status": job["status"]})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        if parts == ["metrics"]:
+            return self._send_json(200, self.service.metrics())
+        if len(parts) == 2 and parts[0] == "jobs":
+            try:
+                wait = float(parse_qs(url.query).get("wait", ["0"])[0])
+            except ValueError:
+                return self._send_json(400, {"error": "invalid wait"})
+            job = self.service.get(parts[1], wait)
+            if job is None:
+                return self._send_json(404, {"error": "unknown job"})
+            return self._send_json(200, job)
+        if len(parts) == 3 and parts[0] == "jobs" and parts[2] == "events":
+            if self.service.get(parts[1]) is None:
+                return self._send_json(404, {"error": "unknown job"})
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            for event in self.service.events(parts[1]):
+                self.wfile.write((json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8"))
+                self.wfile.flush()
+            return
+        self._send_json(404, {"error": "not found"})
+
+def create_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """
+    Build the HTTP server; port 0 picks a free port (see server.server_address).
+    """
+    handler = type("BoundRequestHandler", (RequestHandler,), {"service": service})
+    return ThreadingHTTPServer((host, port), handler)
+
+def serve(configs=None, host=DEFAULT_HOST, port=DEFAULT_PORT, warm=True, **service_options):
+    service = TranscriptionService(configs, **service_options)
+    if warm and service.transcribe is default_transcribe:
+        warm_models(service.configs)
+    httpd = create_server(service, host, port)
+    print(f"MeetSolution server listening on http://{httpd.server_address[0]}:{httpd.server_address[1]}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("Server stopped.")
+    finally:
+        httpd.server_close()
@@ -0,0 +1,217 @@
+import os
+import threading
+import numpy as np
+
+#----
+# Speaker index
+#----
+# Known people are stored as unit-length speaker embeddings (one running mean
+# per name) in a .npz file. After diarization, the embedding pyannote computed
+# for each SPEAKER_xx cluster is matched against the index by cosine
+# similarity and the label is replaced by the person's name. Exact search is a
+# single matrix product. Large indexes can switch to random-hyperplane LSH, or
+# to faiss when it is installed.
+
+MATCH_THRESHOLD = 0.55        # Minimum cosine similarity to accept a name
+ANN_MIN_SIZE = 50000          # SPEAKER_SEARCH "auto" switches from exact search to LSH here
+LSH_TABLES = 24               # 24 x 10 bits: ~99% recall at cosine 0.9 over 20k speakers
+LSH_BITS = 10
+FAISS_NEIGHBORS = 32          # HNSW graph degree
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+class LSHIndex:
+    """
+    Random-hyperplane LSH over unit vectors: candidates share a hash bucket
+    with the query in at least one table and are re-ranked exactly.
+    """
+
+    def __init__(self, embeddings, tables=LSH_TABLES, bits=LSH_BITS, seed=0):
+        self.embeddings = embeddings
+        rng = np.random.default_rng(seed)
+        self.planes = rng.standard_normal((tables, bits, embeddings.shape[1])).astype(np.float32)
+        self.weights = 1 << np.arange(bits)
+        self.buckets = []
+        for codes in self._codes(embeddings):
+            buckets = {}
+            for row, code in enumerate(codes.tolist()):
+                buckets.setdefault(code, []).append(row)
+            self.buckets.append(buckets)
+
+    def _codes(self, vectors):
+        # (tables, n) integer bucket codes
+        return ((np.einsum("tbd,nd->tnb", self.planes, vectors) > 0) * self.weights).sum(axis=2)
+
+    def search(self, queries):
+        best = np.full(len(queries), -1, dtype=np.int64)
+        scores = np.full(len(queries), -1.0, dtype=np.float32)
+        codes = self._codes(queries)
+        for i, query in enumerate(queries):
+            candidates = sorted({row for table, buckets in enumerate(self.buckets) for row in buckets.get(int(codes[table, i]), ())})
+            if not candidates:
+                candidates = range(len(self.embeddings))
+            candidates = np.fromiter(candidates, dtype=np.int64)
+            similarities = self.embeddings[candidates] @ query
+            top = int(np.argmax(similarities))
+            best[i], scores[i] = candidates[top], similarities[top]
+        return best, scores
+
+class FaissIndex:
+    """
+    HNSW inner-product index from faiss (optional dependency).
+    """
+
+    def __init__(self, embeddings):
+        import faiss
+        self.index = faiss.IndexHNSWFlat(embeddings.shape[1], FAISS_NEIGHBORS, faiss.METRIC_INNER_PRODUCT)
+        self.index.add(np.ascontiguousarray(embeddings))
+
+    def search(self, queries):
+        scores, best = self.index.search(np.ascontiguousarray(queries), 1)
+        return best[:, 0].astype(np.int64), scores[:, 0]
+
+class SpeakerIndex:
+    """
+    Names and unit-length mean embeddings of enrolled speakers.
+    """
+
+    def __init__(self, names=None, embeddings=None, counts=None):
+        self.names = list(names) if names is not None else []
+        self.embeddings = np.asarray(embeddings, dtype=np.float32) if embeddings is not None else None
+        self.counts = np.asarray(counts, dtype=np.int64) if counts is not None else np.zeros(0, dtype=np.int64)
+        self._ann = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return cls()
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["names"].tolist(), data["embeddings"], data["counts"])
+
+    def save(self, path):
+        """
+        Write the index atomically.
+        """
+        tmp_path = path + ".tmp.npz"
+        embeddings = self.embeddings if self.embeddings is not None else np.zeros((0, 0), dtype=np.float32)
+        np.savez(tmp_path, names=np.array(self.names, dtype=str), embeddings=embeddings, counts=self.counts)
+        os.replace(tmp_path, path)
+
+    def enroll(self, name, embedding):
+        """
+        Add a person, or fold one more embedding into their running mean.
+        """
+        embedding = normalize(embedding).reshape(-1)
+        self._ann = {}
+        if name in self.names:
+            row = self.names.index(name)
+            count = self.counts[row]
+            self.embeddings[row] = normalize(self.embeddings[row] * count + embedding)
+            self.counts[row] = count + 1
+            return
+        if self.embeddings is None or len(self.embeddings) == 0:
+            self.embeddings = embedding[None, :]
+        else:
+            if embedding.shape[0] != self.embeddings.shape[1]:
+                raise ValueError(f"Embedding has {embedding.shape[0]} dimensions, the index uses {self.embeddings.shape[1]}")
+            self.embeddings = np.vstack([self.embeddings, embedding])
+        self.names.append(name)
+        self.counts = np.append(self.counts, 1)
+
+    def remove(self, name):
+        if name not in self.names:
+            raise KeyError(name)
+        row = self.names.index(name)
+        self.names.pop(row)
+        self.embeddings = np.delete(self.embeddings, row, axis=0)
+        self.counts = np.delete(self.counts, row)
+        self._ann = {}
+
+    def _searcher(self, method):
+        if method == "auto":
+            method = "lsh" if len(self) >= ANN_MIN_SIZE else "exact"
+        if method == "exact":
+            return None
+        if method not in self._ann:
+            if method == "faiss":
+                try:
+                    self._ann[method] = FaissIndex(self.embeddings)
+                except ImportError:
+                    print("faiss is not installed, using LSH for speaker search.")
+                    self._ann[method] = self._searcher("lsh")
+            elif method == "lsh":
+                self._ann[method] = LSHIndex(self.embeddings)
+            else:
+                raise ValueError(f"Unknown speaker search method: {method}")
+        return self._ann[method]
+
+    def search(self, queries, method="auto"):
+        """
+        Best enrolled row and its cosine similarity for each query embedding.
+        """
+        queries = normalize(queries).reshape(len(queries), -1)
+        searcher = self._searcher(method)
+        if searcher is not None:
+            return searcher.search(queries)
+        similarities = queries @ self.embeddings.T
+        best = np.argmax(similarities, axis=1)
+        return best, similarities[np.arange(len(queries)), best]
+
+    def match(self, speaker_embeddings, threshold=MATCH_THRESHOLD, method="auto"):
+        """
+        Map diarization labels to enrolled names. A name is given to at most one
+        label per meeting (the most similar one); labels below `threshold`
+        keep their SPEAKER_xx name.
+        """
+        if not len(self) or not speaker_embeddings:
+            return {}
+        labels = list(speaker_embeddings)
+        best, scores = self.search(np.array([speaker_embeddings[label] for label in labels]), method)
+        mapping, taken = {}, set()
+        for i in np.argsort(-scores).tolist():
+            name = self.names[best[i]]
+            if scores[i] >= threshold and name not in taken:
+                mapping[labels[i]] = name
+                taken.add(name)
+        return mapping
+
+def load_index(path):
+    """
+    Load the index once per file version, so lookups during transcription do
+    not re-read it.
+    """
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return SpeakerIndex()
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, SpeakerIndex.load(path))
+            _cache[path] = cached
+        return cached[1]
+
+def name_speakers(word_segments, speaker_embeddings, configs):
+    """
+    Replace SPEAKER_xx labels in `word_segments` (in place) with the names of
+    enrolled speakers. Returns the label to name mapping.
+    """
+    path = configs.get("SPEAKER_INDEX")
+    if not path or not speaker_embeddings:
+        return {}
+    mapping = load_index(path).match(speaker_embeddings, method=configs.get("SPEAKER_SEARCH", "auto"))
+    if mapping:
+        for segment in word_segments:
+            if segment.get("speaker") in mapping:
+                segment["speaker"] = mapping[segment["speaker"]]
+        print("Identified speakers: " + ", ".join(f"{label} = {name}" for label, name in sorted(mapping.items())))
+    return mapping
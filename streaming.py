@@ -0,0 +1,207 @@
+import queue
+import threading
+import numpy as np
+from mixer import StreamResampler, TARGET_SAMPLE_RATE as TARGET_RATE, mix_blocks
+from vad import detect_speech
+
+#----
+# Configuration
+#----
+
+FRAME_SECONDS = 0.02      # Frame length used to look for quiet cut points when VAD finds no pause
+
+class StreamingTranscriber:
+    """
+    Transcribe audio while it is still being recorded.
+
+    The recorder calls `feed()` from its audio callbacks. A mixer thread
+    resamples each source to 16 kHz with a streaming resampler, mixes them
+    and cuts fixed-size windows in a pause that `vad.detect_speech` finds near
+    the window end, or at the quietest point there when nobody paused long
+    enough. A worker thread transcribes and
+    aligns each window and appends the segments to the transcript file as soon
+    as they are ready. `finish()` flushes the last window and reconciles
+    speakers with one diarization pass over the full recording.
+    """
+
+    def __init__(self, configs, transcript_file=None, sources=("mic", "loopback"), window_seconds=30, search_seconds=5):
+        self.configs = dict(configs)
+        self.transcript_file = transcript_file
+        self.sources = sources
+        self.window_samples = int(window_seconds * TARGET_RATE)
+        self.search_samples = int(search_seconds * TARGET_RATE)
+        self.segments = []
+
+        self._resamplers = {}
+        self._pending = {source: np.zeros(0, dtype=np.float32) for source in sources}
+        self._window = np.zeros(0, dtype=np.float32)
+        self._offset = 0  # samples already handed to the worker
+
+        self._blocks = queue.Queue()
+        self._windows = queue.Queue()
+        self._mixer = threading.Thread(target=self._mix_loop, daemon=True)
+        self._worker = threading.Thread(target=self._transcribe_loop, daemon=True)
+        self._errors = []
+
+    def start(self):
+        if self.transcript_file:
+            open(self.transcript_file, "w", encoding="utf-8").close()
+        self._mixer.start()
+        self._worker.start()
+        return self
+
+    def feed(self, source, block, rate):
+        """
+        Queue a chunk of int16 audio from one source. Safe to call from audio callbacks.
+        """
+        self._blocks.put((source, block.copy(), rate))
+
+    def finish(self, audio=None):
+        """
+        Transcribe the last window and assign speakers using the full recording
+        (a file path or the 16 kHz waveform, mono or mic/loopback). Returns
+        word segments in the same format as `transcription_with_diarization`.
+        """
+        self._blocks.put(None)
+        self._mixer.join()
+        self._worker.join()
+        if self._errors:
+            raise self._errors[0]
+
+        from diarization import diarize_for_configs, assign_named_speakers, load_audio
+        from channels import use_channels, diarize_channels
+
+        word_segments = [word for segment in self.segments for word in segment.get("words", [])]
+        result_aligned = {"segments": self.segments, "word_segments": word_segments}
+        if audio is None:
+            return word_segments
+
+        print("Reconciling speakers over the full recording...")
+        if use_channels(audio, self.configs):
+            diarize_result = diarize_channels(audio, self.configs)
+        else:
+            diarize_result = diarize_for_configs(audio if isinstance(audio, str) else load_audio(audio), self.configs)
+        return assign_named_speakers(diarize_result, result_aligned, self.configs)
+
+    # -------
+    # Mixer thread
+    # -------
+
+    def _resample(self, source, block=None, flush=False):
+        if source not in self._resamplers:
+            return
+        if flush:
+            samples = self._resamplers[source].flush()
+        else:
+            samples = self._resamplers[source].process(block.reshape(-1).astype(np.float32) / 32768.0)
+        self._pending[source] = np.concatenate([self._pending[source], samples])
+
+    def _mix_pending(self, flush=False):
+        active = [source for source in self.sources if source in self._resamplers]
+        # Wait until every source has delivered audio so the timelines line up
+        if not active or (not flush and len(active) < len(self.sources)):
+            return
+        length = min(len(self._pending[source]) for source in active)
+        if flush:
+            length = max(len(self._pending[source]) for source in active)
+        if length == 0:
+            return
+        blocks = []
+        for source in active:
+            chunk = self._pending[source][:length]
+            blocks.append(np.pad(chunk, (0, length - len(chunk))))
+            self._pending[source] = self._pending[source][length:]
+        self._window = np.concatenate([self._window, mix_blocks(blocks)])
+
+    def _cut_point(self):
+        """
+        Where to end the window: the middle of the last pause between speech
+        regions within the last `search_samples`, else the quietest frame there.
+        """
+        search_start = max(0, self.window_samples - self.search_samples)
+        regions = detect_speech(self._window[:self.window_samples]).regions
+        # Pauses between regions, and after the last one when the window ends in silence
+        pauses = np.stack([regions[:, 1], np.append(regions[1:, 0], self.window_samples)], axis=1)
+        pauses = pauses[(pauses[:, 1] > pauses[:, 0]) & (pauses[:, 1] > search_start)]
+        if len(pauses):
+            start, end = np.clip(pauses[-1], search_start, self.window_samples)
+            return int((start + end) // 2)
+        return self._quietest_point(search_start)
+
+    def _quietest_point(self, search_start):
+        frame = int(FRAME_SECONDS * TARGET_RATE)
+        region = self._window[search_start:self.window_samples]
+        frames = len(region) // frame
+        if frames == 0:
+            return self.window_samples
+        energy = np.square(region[:frames * frame].reshape(frames, frame)).mean(axis=1)
+        return search_start + int(np.argmin(energy)) * frame + frame // 2
+
+    def _emit_windows(self, flush=False):
+        while len(self._window) >= self.window_samples:
+            cut = self._cut_point()
+            self._windows.put((self._offset, self._window[:cut]))
+            self._offset += cut
+            self._window = self._window[cut:]
+        if flush and len(self._window):
+            self._windows.put((self._offset, self._window))
+            self._offset += len(self._window)
+            self._window = np.zeros(0, dtype=np.float32)
+
+    def _mix_loop(self):
+        try:
+            while True:
+                item = self._blocks.get()
+                if item is None:
+                    break
+                source, block, rate = item
+                if source not in self._resamplers:
+                    self._resamplers[source] = StreamResampler(rate, TARGET_RATE)
+                self._resample(source, block)
+                self._mix_pending()
+                self._emit_windows()
+            for source in self.sources:
+                self._resample(source, flush=True)
+            self._mix_pending(flush=True)
+            self._emit_windows(flush=True)
+        except Exception as e:
+            self._errors.append(e)
+        finally:
+            self._windows.put(None)
+
+    # -------
+    # Transcription thread
+    # -------
+
+    def _transcribe_loop(self):
+        from diarization import run_asr, run_alignment
+
+        while True:
+            item = self._windows.get()
+            if item is None:
+                break
+            if self._errors:
+                continue
+            offset, audio = item
+            try:
+                result = run_asr(audio, self.configs)
+                if not result["segments"]:
+                    continue
+                aligned = run_alignment(result["segments"], result["language"], audio, self.configs)
+                self._append(aligned["segments"], offset / TARGET_RATE)
+            except Exception as e:
+                self._errors.append(e)
+
+    def _append(self, segments, offset_seconds):
+        for segment in segments:
+            for item in [segment] + segment.get("words", []):
+                if "start" in item:
+                    item["start"] += offset_seconds
+                if "end" in item:
+                    item["end"] += offset_seconds
+            self.segments.append(segment)
+
+        if self.transcript_file:
+            with open(self.transcript_file, "a", encoding="utf-8") as f:
+                for segment in segments:
+                    f.write(f"[{segment['start']:.2f}-{segment['end']:.2f}] {segment['text'].strip()}\n")
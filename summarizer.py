@@ -1,7 +1,19 @@
+import re
+import time
+import asyncio
 from langchain_ollama import OllamaLLM
 from langchain_core.prompts import PromptTemplate
 
-llm = OllamaLLM(model="deepseek-r1:8b")
+#----
+# Configuration
+#----
+
+CONTEXT_TOKENS = 8192    # Context window requested from Ollama
+OUTPUT_TOKENS = 1024     # Room left for the model's answer
+CHARS_PER_TOKEN = 4      # Rough average for English text
+MAX_IN_FLIGHT = 4        # Concurrent Ollama requests during the map step
+
+llm = OllamaLLM(model="deepseek-r1:8b", num_ctx=CONTEXT_TOKENS)
 template = PromptTemplate.from_template("""
 You are an assistant specialized in analyzing and synthesizing meeting transcriptions.
 Your goal is to extract clear, objective, and reliable information, without inferring or inventing data that is not explicitly present in the text.
@@ -36,6 +48,7 @@ RULES:
 - Prioritize actionable information
 - Faithfully preserve names, tasks, and deadlines
 - Record deadlines exactly as mentioned, even if vague
+- Lines from the speaker "Me" are mine: use them, and what others ask of "Me", for My Activities
 
 OUTPUT FORMAT (MANDATORY):
 
@@ -65,7 +78,327 @@ Return only the summary in the format above, without additional comments, explan
 
 chain = template | llm
 
-def generate_summary(transcricao: str) -> str:
-    response = chain.invoke({"transcricao": transcricao})
-    return response
+map_template = PromptTemplate.from_template("""
+You are an assistant specialized in analyzing meeting transcriptions.
+Below is one consecutive PART of a longer meeting transcription.
+
+Language: English
+Single source of truth: only the provided part
+
+TASK:
+List exclusively the explicit information in this part for each field. Do not assume, interpret or use external knowledge.
+Faithfully preserve names, tasks, and deadlines exactly as mentioned.
+Lines from the speaker "Me" are mine: use them, and what others ask of "Me", for My Activities.
+
+TRANSCRIPTION PART:
+{transcricao}
+
+OUTPUT FORMAT (MANDATORY):
+
+Main Subject:
+<text or "Not mentioned in this part.">
+
+My Activities:
+- <activity>
+(or "Not mentioned in this part.")
+
+Goals:
+- <goal>
+(or "Not mentioned in this part.")
+
+The Most Important of the Meeting:
+<objective summary or "Not mentioned in this part.">
+
+Deadlines / Deliverables:
+- <deadline or deliverable>
+(or "Not mentioned in this part.")
+
+Return only the notes in the format above, without additional comments.
+""")
+
+reduce_template = PromptTemplate.from_template("""
+You are an assistant specialized in analyzing and synthesizing meeting transcriptions.
+The notes below were extracted, in order, from consecutive parts of ONE meeting.
+Merge them into a single structured summary.
+
+Language: English
+Tone: Professional, direct, and neutral
+Single source of truth: only the provided notes
+
+NOTES:
+{transcricao}
+
+RULES:
+- Do not assume or add information that is not in the notes
+- Remove duplicates and keep the chronological order
+- Use short and objective sentences
+- Faithfully preserve names, tasks, and deadlines
+- If no part mentions a field, write exactly: "Not mentioned in the transcription."
+
+OUTPUT FORMAT (MANDATORY):
+
+Main Subject:
+<text or "Not mentioned in the transcription.">
+
+My Activities:
+- <activity 1>
+- <activity 2>
+(or "Not mentioned in the transcription.")
+
+Goals:
+- <goal 1>
+- <goal 2>
+(or "Not mentioned in the transcription.")
+
+The Most Important of the Meeting:
+<objective summary or "Not mentioned in the transcription.">
+
+Deadlines / Deliverables:
+- <deadline or deliverable>
+(or "Not mentioned in the transcription.")
+
+FINAL INSTRUCTION:
+Return only the summary in the format above, without additional comments, explanations, or opinions.
+""")
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate, good enough to decide how to split a transcript.
+    """
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def prompt_budget(prompt_template) -> int:
+    """
+    Tokens available for the transcription inside `prompt_template`.
+    """
+    overhead = estimate_tokens(prompt_template.format(transcricao=""))
+    return CONTEXT_TOKENS - OUTPUT_TOKENS - overhead
+
+def split_long_turn(turn: str, budget: int) -> list:
+    """
+    Split a single speaker turn that does not fit in `budget` on word boundaries.
+    """
+    speaker, separator, text = turn.partition(": ")
+    prefix = speaker + separator if separator else ""
+    pieces = []
+    current = []
+    for word in (text if separator else turn).split():
+        if current and estimate_tokens(prefix + " ".join(current + [word])) > budget:
+            pieces.append(prefix + " ".join(current))
+            current = []
+        current.append(word)
+    if current:
+        pieces.append(prefix + " ".join(current))
+    return pieces
+
+def split_transcript(transcricao: str, budget: int) -> list:
+    """
+    Group speaker turns (one per line, as written by `WordTable.to_text`) into
+    chunks that fit in `budget` tokens without cutting a turn in half.
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+    for turn in transcricao.splitlines():
+        if not turn.strip():
+            continue
+        pieces = split_long_turn(turn, budget) if estimate_tokens(turn) > budget else [turn]
+        for piece in pieces:
+            piece_tokens = estimate_tokens(piece) + 1
+            if current and current_tokens + piece_tokens > budget:
+                chunks.append("\n".join(current))
+                current = []
+                current_tokens = 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+def strip_reasoning(text: str) -> str:
+    """
+    Drop the <think> block reasoning models put before their answer.
+    """
+    return re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL).strip()
+
+def group_notes(notes: list, budget: int) -> list:
+    """
+    Pack consecutive partial notes into groups that fit in `budget` tokens.
+    """
+    groups = []
+    current = []
+    current_tokens = 0
+    for note in notes:
+        note_tokens = estimate_tokens(note) + 4
+        if current and current_tokens + note_tokens > budget:
+            groups.append(current)
+            current = []
+            current_tokens = 0
+        current.append(note)
+        current_tokens += note_tokens
+    if current:
+        groups.append(current)
+    return groups
+
+def join_notes(notes: list) -> str:
+    return "\n\n".join(f"PART {i + 1}:\n{note}" for i, note in enumerate(notes))
+
+def truncate_note(note: str, budget: int) -> str:
+    """
+    Cut a partial note to `budget` tokens on a line or word boundary.
+    """
+    if estimate_tokens(note) <= budget:
+        return note
+    cut = note[:(budget - 1) * CHARS_PER_TOKEN]
+    boundary = max(cut.rfind("\n"), cut.rfind(" "))
+    return cut[:boundary] if boundary > 0 else cut
+
+def next_reduce_round(notes: list):
+    """
+    Groups to merge before the final reduce prompt, or None once all notes fit.
+    A note that does not fit in a reduce prompt on its own is truncated, and
+    when no two notes fit together they are truncated to half the budget, so
+    every round merges at least a pair.
+    """
+    reduce_budget = prompt_budget(reduce_template)
+    if len(notes) <= 1 or estimate_tokens(join_notes(notes)) <= reduce_budget:
+        return None
+    notes = [truncate_note(note, reduce_budget - 8) for note in notes]
+    groups = group_notes(notes, reduce_budget)
+    if len(groups) < len(notes):
+        return groups
+    print(f"Partial notes too long to merge, truncating each to {reduce_budget // 2} tokens.")
+    return group_notes([truncate_note(note, reduce_budget // 2 - 8) for note in notes], reduce_budget)
+
+def final_notes(notes: list) -> str:
+    """
+    Input of the final reduce prompt. next_reduce_round leaves either notes
+    that fit together or a single note, which is truncated if it is too long.
+    """
+    if len(notes) == 1:
+        notes = [truncate_note(notes[0], prompt_budget(reduce_template) - 8)]
+    return join_notes(notes)
+
+def build_chains(model=None):
+    """
+    (single-prompt, map, reduce) chains for `model`, defaulting to the Ollama LLM.
+    """
+    model = llm if model is None else model
+    summary_chain = chain if model is llm else template | model
+    return summary_chain, map_template | model, reduce_template | model
+
+def generate_summary(transcricao: str, model=None, max_in_flight=MAX_IN_FLIGHT) -> str:
+    """
+    Summarize a transcription. When it fits in the context window it is sent in
+    a single prompt; otherwise it is split on speaker turns, the chunks are
+    summarized concurrently (at most `max_in_flight` requests at a time) and the
+    partial notes are merged into the five mandatory fields.
+    `model` replaces the Ollama LLM, e.g. with a local stub.
+    """
+    summary_chain, map_chain, reduce_chain = build_chains(model)
+    if estimate_tokens(transcricao) <= prompt_budget(template):
+        return summary_chain.invoke({"transcricao": transcricao})
+
+    batch_config = {"max_concurrency": max_in_flight}
+    chunks = split_transcript(transcricao, prompt_budget(map_template))
+    print(f"Transcription too long for one prompt, summarizing {len(chunks)} parts...")
+    notes = map_chain.batch([{"transcricao": chunk} for chunk in chunks], config=batch_config)
+    notes = [strip_reasoning(note) for note in notes]
+
+    # Merge in rounds until every note fits in a single reduce prompt
+    while (groups := next_reduce_round(notes)) is not None:
+        outputs = reduce_chain.batch([{"transcricao": join_notes(group)} for group in groups], config=batch_config)
+        notes = [strip_reasoning(output) for output in outputs]
+
+    return reduce_chain.invoke({"transcricao": final_notes(notes)})
+
+# -------
+# Async API
+# -------
+
+async def prepare_final_prompt(transcricao: str, model=None, max_in_flight=MAX_IN_FLIGHT):
+    """
+    Run the map/reduce rounds asynchronously and return the (chain, input) pair
+    of the last call, which is the one worth streaming.
+    """
+    summary_chain, map_chain, reduce_chain = build_chains(model)
+    if estimate_tokens(transcricao) <= prompt_budget(template):
+        return summary_chain, {"transcricao": transcricao}
+
+    batch_config = {"max_concurrency": max_in_flight}
+    chunks = split_transcript(transcricao, prompt_budget(map_template))
+    print(f"Transcription too long for one prompt, summarizing {len(chunks)} parts...")
+    notes = await map_chain.abatch([{"transcricao": chunk} for chunk in chunks], config=batch_config)
+    notes = [strip_reasoning(note) for note in notes]
+
+    while (groups := next_reduce_round(notes)) is not None:
+        outputs = await reduce_chain.abatch([{"transcricao": join_notes(group)} for group in groups], config=batch_config)
+        notes = [strip_reasoning(output) for output in outputs]
+
+    return reduce_chain, {"transcricao": final_notes(notes)}
+
+async def agenerate_summary(transcricao: str, model=None, max_in_flight=MAX_IN_FLIGHT) -> str:
+    final_chain, final_input = await prepare_final_prompt(transcricao, model, max_in_flight)
+    return await final_chain.ainvoke(final_input)
+
+async def stream_summary(transcricao: str, summary_file=None, model=None, echo=False, max_in_flight=MAX_IN_FLIGHT):
+    """
+    Stream the summary token by token, appending each chunk to `summary_file`
+    as it arrives (and printing it with `echo`). Returns (summary, metrics) with
+    time-to-first-token and tokens/sec of the streamed call.
+    """
+    start = time.perf_counter()
+    final_chain, final_input = await prepare_final_prompt(transcricao, model, max_in_flight)
+
+    parts = []
+    first_token = None
+    stream_start = time.perf_counter()
+    output = open(summary_file, "w", encoding="utf-8") if summary_file else None
+    try:
+        async for token in final_chain.astream(final_input):
+            if first_token is None:
+                first_token = time.perf_counter()
+            parts.append(token)
+            if output:
+                output.write(token)
+                output.flush()
+            if echo:
+                print(token, end="", flush=True)
+    finally:
+        if output:
+            output.close()
+    end = time.perf_counter()
+    if echo:
+        print()
+
+    # Ollama streams one token per chunk
+    generation_seconds = end - (first_token if first_token is not None else stream_start)
+    metrics = {
+        "seconds": end - start,
+        "time_to_first_token": (first_token - start) if first_token is not None else None,
+        "tokens": len(parts),
+        "tokens_per_second": len(parts) / generation_seconds if generation_seconds > 0 else 0.0,
+    }
+    return "".join(parts), metrics
+
+def format_metrics(metrics) -> str:
+    ttft = metrics["time_to_first_token"]
+    ttft_text = f"{ttft:.2f}s" if ttft is not None else "n/a"
+    return f"time to first token {ttft_text}, {metrics['tokens_per_second']:.1f} tokens/s, {metrics['seconds']:.1f}s total"
+
+async def summarize_many(jobs, model=None, max_concurrency=MAX_IN_FLIGHT):
+    """
+    Summarize many transcripts concurrently. `jobs` is a list of
+    (transcription, summary_file) pairs; every request goes through the same
+    LLM client, so its HTTP connections are reused. Returns (summary, metrics)
+    pairs in the same order.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(transcricao, summary_file):
+        async with semaphore:
+            summary, metrics = await stream_summary(transcricao, summary_file, model, max_in_flight=1)
+        print(f"Summary saved to {summary_file}: {format_metrics(metrics)}")
+        return summary, metrics
 
+    return await asyncio.gather(*(run(transcricao, summary_file) for transcricao, summary_file in jobs))
@@ -0,0 +1,66 @@
+import random
+
+import pytest
+
+from alignment import shard_segments, merge_shards, resolve_workers, worker_threads, diarization_threads
+
+def synthetic_segments(count=200, seed=0):
+    rng = random.Random(seed)
+    segments = []
+    current = 0.0
+    for i in range(count):
+        duration = rng.uniform(0.5, 12.0)
+        segments.append({"start": round(current, 3), "end": round(current + duration, 3), "text": f"segment {i} words here"})
+        current += duration + rng.uniform(0.0, 3.0)
+    return segments
+
+def fake_align(segments):
+    """
+    Stand-in for whisperx.align: one aligned segment and a few words per
+    input segment, depending only on that segment.
+    """
+    aligned = {"segments": [], "word_segments": []}
+    for segment in segments:
+        words = segment["text"].split()
+        step = (segment["end"] - segment["start"]) / len(words)
+        timed = [{"word": word, "start": segment["start"] + i * step, "end": segment["start"] + (i + 1) * step} for i, word in enumerate(words)]
+        aligned["segments"].append({"start": segment["start"], "end": segment["end"], "text": segment["text"], "words": timed})
+        aligned["word_segments"].extend(timed)
+    return aligned
+
+@pytest.mark.parametrize("shards", [1, 2, 3, 8, 16, 500])
+def test_sharded_alignment_matches_unsharded_order(shards):
+    segments = synthetic_segments()
+    parts = shard_segments(segments, shards)
+
+    assert 1 <= len(parts) <= min(shards, len(segments))
+    assert all(parts)
+    assert [segment for part in parts for segment in part] == segments
+    assert merge_shards([fake_align(part) for part in parts]) == fake_align(segments)
+
+def test_shards_have_similar_durations():
+    segments = synthetic_segments(400)
+    parts = shard_segments(segments, 4)
+    durations = [sum(s["end"] - s["start"] for s in part) for part in parts]
+    assert len(parts) == 4
+    assert max(durations) < 1.2 * min(durations)
+
+def test_tiny_inputs_are_not_sharded():
+    assert shard_segments([], 4) == [[]]
+    one = synthetic_segments(1)
+    assert shard_segments(one, 4) == [one]
+
+def test_pool_is_opt_in():
+    assert resolve_workers({}, "cpu") == 1
+    assert resolve_workers({"ALIGN_WORKERS": 1}, "cpu") == 1
+    assert resolve_workers({"ALIGN_WORKERS": 3}, "cpu") == 3
+    assert resolve_workers({"ALIGN_WORKERS": 3}, "cuda") == 1
+
+def test_thread_budget_leaves_room_for_diarization():
+    configs = {"TORCH_THREADS": 8, "PARALLEL_STAGES": True}
+    assert worker_threads(configs, 3) == 2
+    assert diarization_threads(configs, 3) == 2
+    assert 3 * worker_threads(configs, 3) + diarization_threads(configs, 3) <= 8
+
+    sequential = {"TORCH_THREADS": 8, "PARALLEL_STAGES": False}
+    assert worker_threads(sequential, 4) == 2
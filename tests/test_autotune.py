@@ -0,0 +1,34 @@
+import json
+
+import autotune
+from autotune import CALIBRATION_SECONDS
+from config import DEFAULT_CONFIGS
+from diarization import asr_model_key
+
+def test_main_applies_settings_file_environment_and_set(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(autotune, "tune", lambda configs, name, audio, seconds: calls.append((configs, name, audio, seconds)))
+    settings = tmp_path / "settings.json"
+    settings.write_text(json.dumps({"BATCH_SIZE": 3, "MODEL_NAME": "base"}))
+    monkeypatch.setenv("MEETSOLUTION_MODEL_NAME", "small")
+
+    assert autotune.main(["--config", str(settings), "--set", "LANGUAGE=pt", "--name", "laptop"]) == 0
+    (configs, name, audio, seconds), = calls
+    assert (configs["BATCH_SIZE"], configs["MODEL_NAME"], configs["LANGUAGE"]) == (3, "small", "pt")
+    assert (name, audio, seconds) == ("laptop", None, CALIBRATION_SECONDS)
+
+def test_asr_threads_are_part_of_the_cpu_model_key():
+    cpu = dict(DEFAULT_CONFIGS, DEVICE="cpu")
+    assert asr_model_key(dict(cpu, ASR_THREADS=4)) != asr_model_key(dict(cpu, ASR_THREADS=8))
+    # CTranslate2 ignores the thread count on CUDA, so it must not force a reload there
+    cuda = dict(DEFAULT_CONFIGS, DEVICE="cuda")
+    assert asr_model_key(dict(cuda, ASR_THREADS=4)) == asr_model_key(dict(cuda, ASR_THREADS=8))
+
+def test_set_tuning_profile_applies_the_profile(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(autotune, "tune", lambda configs, name, audio, seconds: calls.append(configs))
+    profiles = tmp_path / "profiles.json"
+    profiles.write_text(json.dumps({"laptop": {"settings": {"BATCH_SIZE": 16}}}))
+    argv = ["--set", f"TUNING_PROFILES_FILE={profiles}", "--set", "TUNING_PROFILE=laptop"]
+    assert autotune.main(argv) == 0
+    assert (calls[0]["TUNING_PROFILE"], calls[0]["BATCH_SIZE"]) == ("laptop", 16)
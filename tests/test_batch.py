@@ -0,0 +1,57 @@
+import os
+
+from batch import find_audio_files, source_root, meeting_names, output_path
+
+def touch(path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"")
+    return str(path)
+
+def test_same_name_in_different_subdirectories_gets_separate_outputs(tmp_path):
+    touch(tmp_path / "rec" / "team_a" / "standup.wav")
+    touch(tmp_path / "rec" / "team_b" / "standup.wav")
+    source = str(tmp_path / "rec")
+
+    audio_files = find_audio_files(source)
+    meetings = meeting_names(audio_files, source_root(source))
+    assert sorted(meetings.values()) == ["team_a/standup", "team_b/standup"]
+
+    outputs = {output_path(meeting, "out") for meeting in meetings.values()}
+    assert outputs == {os.path.join("out", "team_a", "standup.txt"), os.path.join("out", "team_b", "standup.txt")}
+
+def test_glob_root_is_the_part_before_the_wildcard(tmp_path):
+    touch(tmp_path / "rec" / "2024" / "planning.mp3")
+    touch(tmp_path / "rec" / "review.wav")
+    pattern = str(tmp_path / "rec" / "**" / "*.*")
+
+    assert source_root(pattern) == str(tmp_path / "rec")
+    meetings = meeting_names(find_audio_files(pattern), source_root(pattern))
+    assert sorted(meetings.values()) == ["2024/planning", "review"]
+
+def test_flat_directory_keeps_plain_names(tmp_path):
+    path = touch(tmp_path / "meeting.wav")
+    assert meeting_names([path], source_root(str(tmp_path))) == {path: "meeting"}
+    assert source_root(path) == str(tmp_path)
+
+def test_names_differing_only_by_extension_keep_it(tmp_path):
+    wav = touch(tmp_path / "call.wav")
+    mp3 = touch(tmp_path / "call.mp3")
+    assert meeting_names([mp3, wav], str(tmp_path)) == {mp3: "call_mp3", wav: "call_wav"}
+
+def test_main_layers_flags_over_the_loaded_settings(tmp_path, monkeypatch):
+    import batch
+
+    captured = {}
+
+    def fake_transcribe_batch(source, output_dir, configs, workers, manifest_path):
+        captured.update(configs)
+        return {"files": {}}
+
+    monkeypatch.setattr(batch, "transcribe_batch", fake_transcribe_batch)
+    monkeypatch.setenv("MEETSOLUTION_SPEAKER_COUNT", "3")
+    monkeypatch.setenv("MEETSOLUTION_MODEL_NAME", "small")
+
+    assert batch.main([str(tmp_path), "--model", "medium", "--batch-size", "4"]) == 0
+    assert captured["SPEAKER_COUNT"] == 3
+    assert captured["MODEL_NAME"] == "medium"
+    assert captured["BATCH_SIZE"] == 4
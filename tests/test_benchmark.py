@@ -0,0 +1,35 @@
+import sys
+
+import pytest
+
+from benchmark import find_regressions, benchmark_pipeline, benchmark_summary
+
+def test_failed_required_import_is_a_regression():
+    results = {"import_main": None, "import_config": 0.01, "import_diarization": None}
+    assert find_regressions(results, {}) == ["import_main"]
+
+def test_optional_result_without_dependencies_is_skipped():
+    assert find_regressions({"import_diarization": None}, {"import_diarization": 1.0}) == []
+
+def test_slower_than_tolerance_is_a_regression():
+    baseline = {"wordtable_format": 0.1, "rows_per_second": 1000.0, "peak_mb": 100.0}
+    results = {"wordtable_format": 0.5, "rows_per_second": 500.0, "peak_mb": 120.0}
+    assert find_regressions(results, baseline, tolerance=1.5) == ["wordtable_format", "rows_per_second"]
+
+def test_stub_pipeline_runs_without_model_backends():
+    results = benchmark_pipeline(minutes=0.5, speakers=2)
+    assert results["pipeline_seconds"] is not None
+    assert "whisperx" not in sys.modules and "torch" not in sys.modules
+
+def test_stub_summary_runs():
+    pytest.importorskip("langchain_core")
+    assert benchmark_summary(minutes=0.5, repeats=1)["summary_seconds"] is not None
+
+def test_missing_baseline_is_not_a_pass(tmp_path, monkeypatch, capsys):
+    import benchmark
+
+    monkeypatch.setattr(benchmark, "BASELINE_FILE", str(tmp_path / "baseline.json"))
+    monkeypatch.setattr(benchmark, "load_baseline", lambda: {})
+    monkeypatch.setitem(benchmark.BENCHMARKS, "format", lambda minutes=1.0: {"wordtable_format": 0.1, "optional": None})
+    assert benchmark.main(["format"]) == 2
+    assert "WARNING: no baseline" in capsys.readouterr().out
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+import soundfile as sf
+
+import diarization
+from channels import ME_LABEL, REMOTE_LABEL, channel_activity, diarize_channels, load_channels, mask_runs
+from config import DEFAULT_CONFIGS
+from mixer import TARGET_SAMPLE_RATE
+
+FILE_RATE = 48000
+DURATION = 20.0
+MIC_SPEECH = [(1.0, 5.0), (14.0, 17.0)]
+REMOTE_SPEECH = [(7.0, 12.0), (14.0, 17.0)]  # 14-17 s: both talk at once
+TOLERANCE = 0.35
+
+def write_call(path):
+    """
+    Stereo mic/loopback file. The remote voice leaks into the microphone 20 dB down.
+    """
+    rng = np.random.default_rng(0)
+    mic = rng.normal(0, 1e-4, int(DURATION * FILE_RATE))
+    loopback = rng.normal(0, 1e-4, int(DURATION * FILE_RATE))
+    for start, end in MIC_SPEECH:
+        mic[int(start * FILE_RATE):int(end * FILE_RATE)] += rng.normal(0, 0.3, int((end - start) * FILE_RATE))
+    for start, end in REMOTE_SPEECH:
+        voice = rng.normal(0, 0.3, int((end - start) * FILE_RATE))
+        loopback[int(start * FILE_RATE):int(end * FILE_RATE)] += voice
+        mic[int(start * FILE_RATE):int(end * FILE_RATE)] += 0.1 * voice
+    sf.write(path, np.stack([mic, loopback], axis=1), FILE_RATE, subtype="FLOAT")
+    return path
+
+def runs_seconds(mask, frame_samples):
+    return (mask_runs(mask) * frame_samples / TARGET_SAMPLE_RATE).tolist()
+
+def test_activity_separates_me_remote_and_overlap(tmp_path):
+    mic, loopback = load_channels(write_call(str(tmp_path / "call.wav")))
+    assert len(mic) == len(loopback) == DURATION * TARGET_SAMPLE_RATE
+    me, remote, frame_samples = channel_activity(mic, loopback)
+    # The echo of the remote voice on the microphone is not "me"
+    np.testing.assert_allclose(runs_seconds(me, frame_samples), MIC_SPEECH, atol=TOLERANCE)
+    # Both masks hold the frames where both sides talk
+    np.testing.assert_allclose(runs_seconds(remote, frame_samples), REMOTE_SPEECH, atol=TOLERANCE)
+
+def test_channels_mode_labels_me_and_remote(tmp_path):
+    pytest.importorskip("pandas")
+    frame = diarize_channels(write_call(str(tmp_path / "call.wav")), dict(DEFAULT_CONFIGS, DIARIZATION_MODE="channels"))
+    segments = sorted(zip(frame["start"], frame["end"], frame["speaker"]), key=lambda segment: (segment[2], segment[0]))
+    assert [speaker for _, _, speaker in segments] == [ME_LABEL, ME_LABEL, REMOTE_LABEL, REMOTE_LABEL]
+    np.testing.assert_allclose([segment[:2] for segment in segments], MIC_SPEECH + REMOTE_SPEECH, atol=TOLERANCE)
+
+def test_hybrid_mode_diarizes_only_the_remote_speech(tmp_path, monkeypatch):
+    pd = pytest.importorskip("pandas")
+    calls = []
+
+    def fake_diarize(audio, configs):
+        calls.append((len(audio) / TARGET_SAMPLE_RATE, configs["SPEAKER_COUNT"]))
+        # Two remote people, split at the middle of the compacted loopback speech
+        middle = len(audio) / TARGET_SAMPLE_RATE / 2
+        return pd.DataFrame({"start": [0.0, middle], "end": [middle, 2 * middle], "speaker": ["SPEAKER_00", "SPEAKER_01"]})
+
+    monkeypatch.setattr(diarization, "diarize_for_configs", fake_diarize)
+    configs = dict(DEFAULT_CONFIGS, DIARIZATION_MODE="hybrid", SPEAKER_COUNT=3, SPEAKER_INDEX=None)
+    frame = diarize_channels(write_call(str(tmp_path / "call.wav")), configs)
+
+    (seconds, speaker_count), = calls
+    # Only the 8 s of remote speech (plus padding) reach pyannote, and the microphone person is not counted
+    assert seconds == pytest.approx(8.0 + 4 * 0.3, abs=2 * TOLERANCE)
+    assert speaker_count == 2
+    remote = frame[frame["speaker"] != ME_LABEL].sort_values("start")
+    assert set(remote["speaker"]) == {"SPEAKER_00", "SPEAKER_01"}
+    # Remote segments are back on the recording timeline, inside the loopback speech
+    assert remote["start"].min() == pytest.approx(7.0 - 0.3, abs=TOLERANCE)
+    assert remote["end"].max() == pytest.approx(17.0 + 0.3, abs=TOLERANCE)
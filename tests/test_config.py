@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from config import DEFAULT_CONFIGS, load_configs, parse_value
+
+def test_none_only_for_settings_that_default_to_none():
+    assert parse_value("SPEAKER_COUNT", "none") is None
+    assert parse_value("LANGUAGE", "") is None
+    assert parse_value("SPEAKER_COUNT", "3") == 3
+    with pytest.raises(ValueError):
+        parse_value("BATCH_SIZE", "")
+    with pytest.raises(ValueError):
+        parse_value("VAD_PREPASS", "none")
+    # An empty path setting switches the feature off; it is not None
+    assert parse_value("SEARCH_INDEX", "") == ""
+
+def test_strings_are_converted_to_the_default_type():
+    assert parse_value("VAD_PREPASS", "off") is False
+    assert parse_value("BATCH_SIZE", " 8 ") == 8
+    assert parse_value("MODEL_NAME", "small") == "small"
+    with pytest.raises(ValueError):
+        parse_value("BATCH_SIZE", "eight")
+
+@pytest.mark.parametrize("key, value", [
+    ("BATCH_SIZE", True),
+    ("BATCH_SIZE", 8.5),
+    ("BATCH_SIZE", None),
+    ("VAD_PREPASS", 1),
+    ("MODEL_NAME", 3),
+    ("SPEAKER_COUNT", "two"),
+])
+def test_json_values_are_type_checked(tmp_path, key, value):
+    settings = tmp_path / "settings.json"
+    settings.write_text(json.dumps({key: value}))
+    with pytest.raises(ValueError):
+        load_configs(str(settings), environ={})
+
+def test_json_strings_are_parsed_like_environment_values(tmp_path):
+    settings = tmp_path / "settings.json"
+    settings.write_text(json.dumps({"BATCH_SIZE": "8", "VAD_PREPASS": "no"}))
+    configs = load_configs(str(settings), environ={})
+    assert configs["BATCH_SIZE"] == 8 and configs["VAD_PREPASS"] is False
+
+def test_layers_file_then_environment(tmp_path):
+    settings = tmp_path / "settings.json"
+    settings.write_text(json.dumps({"BATCH_SIZE": 4, "SPEAKER_COUNT": None, "LANGUAGE": "en"}))
+    configs = load_configs(str(settings), environ={"MEETSOLUTION_BATCH_SIZE": "2", "MEETSOLUTION_LANGUAGE": "none"})
+    assert configs["BATCH_SIZE"] == 2
+    assert configs["SPEAKER_COUNT"] is None
+    assert configs["LANGUAGE"] is None
+    assert configs["MODEL_NAME"] == DEFAULT_CONFIGS["MODEL_NAME"]
+
+def test_unknown_settings_are_rejected(tmp_path):
+    settings = tmp_path / "settings.json"
+    settings.write_text(json.dumps({"BATCH_SIZ": 4}))
+    with pytest.raises(ValueError, match="BATCH_SIZ"):
+        load_configs(str(settings), environ={})
+
+def test_command_line_tuning_profile_is_loaded(tmp_path):
+    profiles = tmp_path / "profiles.json"
+    profiles.write_text(json.dumps({"laptop": {"settings": {"BATCH_SIZE": 16, "ASR_THREADS": 4}}}))
+    configs = load_configs(environ={}, command_line={
+        "TUNING_PROFILES_FILE": str(profiles), "TUNING_PROFILE": "laptop", "ASR_THREADS": "2",
+    })
+    # The profile applies, and other command-line settings still override it
+    assert (configs["TUNING_PROFILE"], configs["BATCH_SIZE"], configs["ASR_THREADS"]) == ("laptop", 16, 2)
+    with pytest.raises(ValueError):
+        load_configs(environ={}, command_line={"NOT_A_SETTING": "1"})
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+from scipy.signal import resample_poly
+
+from mixer import StreamResampler, mix_blocks
+
+def stream(resampler, signal, sizes):
+    blocks, position, index = [], 0, 0
+    while position < len(signal):
+        size = sizes[index % len(sizes)]
+        blocks.append(resampler.process(signal[position:position + size]))
+        position += size
+        index += 1
+    blocks.append(resampler.flush())
+    return np.concatenate(blocks)
+
+@pytest.mark.parametrize("rate, up, down", [(44100, 160, 441), (48000, 1, 3)])
+@pytest.mark.parametrize("sizes", [[1024], [441, 4800, 7, 2048], [10 ** 6]])
+def test_chunked_output_matches_one_shot_resample_poly(rate, up, down, sizes):
+    rng = np.random.default_rng(rate)
+    signal = (0.3 * rng.standard_normal(rate * 3 + 123)).astype(np.float32)
+    expected = resample_poly(signal, up, down).astype(np.float32)
+    output = stream(StreamResampler(rate), signal, sizes)
+    assert len(output) == len(expected)
+    np.testing.assert_allclose(output, expected, atol=1e-5)
+
+def test_same_rate_passes_through():
+    resampler = StreamResampler(16000)
+    block = np.arange(10, dtype=np.float32)
+    np.testing.assert_array_equal(resampler.process(block), block)
+    assert len(resampler.flush()) == 0
+
+def test_mix_blocks_sums_and_protects_from_clipping():
+    mixed = mix_blocks([np.full(4, 0.3, dtype=np.float32), np.full(4, 0.2, dtype=np.float32)])
+    np.testing.assert_allclose(mixed, 0.5)
+    loud = mix_blocks([np.full(4, 0.9, dtype=np.float32), np.full(4, 0.9, dtype=np.float32)])
+    assert np.all(loud <= 1.0) and np.all(loud > 0.9)
@@ -0,0 +1,90 @@
+import threading
+import time
+
+import pytest
+
+import model_registry
+from model_registry import get_model, model_key, clear_registry, registry_stats
+
+@pytest.fixture(autouse=True)
+def empty_registry():
+    clear_registry()
+    yield
+    clear_registry()
+
+def test_different_models_load_at_the_same_time():
+    both_loading = threading.Barrier(2, timeout=5)
+
+    def loader(name):
+        def load():
+            # Fails with BrokenBarrierError if the loads were serialized
+            both_loading.wait()
+            return name
+        return load
+
+    results = {}
+    keys = {"asr": model_key("asr", "medium", "cpu", "int8"), "diarize": model_key("diarize", "pyannote", "cpu")}
+    threads = [
+        threading.Thread(target=lambda kind=kind: results.__setitem__(kind, get_model(keys[kind], loader(kind), 10000)))
+        for kind in keys
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {"asr": "asr", "diarize": "diarize"}
+    assert registry_stats()["models"] == 2
+
+def test_concurrent_requests_for_one_model_load_it_once():
+    calls = []
+
+    def load():
+        calls.append(1)
+        time.sleep(0.2)
+        return object()
+
+    key = model_key("align", "wav2vec2", "cpu", None, "en")
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(get_model(key, load, 10000))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(results) == 4 and all(result is results[0] for result in results)
+
+def test_failed_load_is_not_cached():
+    key = model_key("asr", "small", "cpu", "int8")
+
+    def broken():
+        raise RuntimeError("download failed")
+
+    with pytest.raises(RuntimeError):
+        get_model(key, broken, 10000)
+    assert get_model(key, lambda: "loaded", 10000) == "loaded"
+    assert not model_registry._loading
+
+def test_least_recently_used_model_is_evicted_over_budget():
+    evicted = []
+    small = model_key("asr", "small", "cpu", "float16")
+    base = model_key("asr", "base", "cpu", "float16")
+    get_model(small, lambda: "small", 600, cleanup=lambda: evicted.append("small"))
+    get_model(base, lambda: "base", 600)
+
+    assert evicted == ["small"]
+    assert registry_stats()["models"] == 1
+
+def test_zero_budget_keeps_no_model_resident():
+    loads = []
+    key = model_key("asr", "small", "cpu", "int8")
+
+    def loader():
+        loads.append(key)
+        return "small"
+
+    assert get_model(key, loader, 0) == "small"
+    assert registry_stats()["models"] == 0
+    assert get_model(key, loader, 0) == "small"
+    assert len(loads) == 2
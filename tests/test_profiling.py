@@ -0,0 +1,30 @@
+import cli
+import profiling
+from profiling import stage, add_sink, remove_sink, TraceRecorder, format_records
+
+def test_stage_reports_growth_and_process_peak():
+    recorder = add_sink(TraceRecorder())
+    try:
+        with stage("grow"):
+            block = bytearray(64 * 1024 * 1024)
+            block[::4096] = b"x" * len(block[::4096])
+        with stage("idle"):
+            pass
+    finally:
+        remove_sink(recorder)
+    grow, idle = recorder.records
+    if grow["process_rss_peak_mb"] is None:
+        return
+    assert grow["rss_growth_mb"] >= 32
+    # The lifetime peak stays where "grow" left it, but "idle" did not raise it
+    assert idle["process_rss_peak_mb"] >= grow["process_rss_peak_mb"]
+    assert idle["rss_growth_mb"] < 32
+    assert "rss growth" in format_records(recorder.records)
+
+def test_cli_main_removes_its_sinks(tmp_path):
+    argv = ["--set", f"SEARCH_INDEX={tmp_path / 'search.db'}", "--profile-log", str(tmp_path / "stages.jsonl"), "index", "list"]
+    assert cli.main(argv) == 0
+    assert cli.main(argv) == 0
+    assert profiling._sinks == []
+    # One "total" record per run, not one per sink left behind by earlier runs
+    assert len((tmp_path / "stages.jsonl").read_text().splitlines()) == 2
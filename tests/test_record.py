@@ -0,0 +1,66 @@
+import sys
+import threading
+import types
+
+import numpy as np
+import soundfile as sf
+
+import record
+
+BLOCK = 480
+BLOCKS = 200
+
+class FakeStream:
+    """
+    sounddevice.InputStream stand-in: a thread delivers BLOCKS numbered int16
+    blocks to the callback while the stream is open.
+    """
+
+    def __init__(self, samplerate, channels, callback, dtype, device):
+        self.callback = callback
+        self.base = 0 if device == 0 else 10000
+        self.thread = threading.Thread(target=self.run)
+
+    def run(self):
+        for index in range(BLOCKS):
+            block = (self.base + index + np.zeros((BLOCK, 1))).astype(np.int16)
+            self.callback(block, BLOCK, None, None)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        # Closing a stream waits for its last callback
+        self.thread.join()
+
+def fake_sounddevice():
+    return types.SimpleNamespace(
+        query_devices=lambda: [{"name": "mic", "max_input_channels": 1, "default_samplerate": 48000.0},
+                               {"name": "loopback", "max_input_channels": 2, "default_samplerate": 44100.0}],
+        InputStream=FakeStream,
+    )
+
+def test_writer_keeps_block_order_and_drains_on_stop(tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, "sounddevice", fake_sounddevice())
+    channels = {}
+
+    def capture(mic_path, loopback_path, filename, **kwargs):
+        for source, path in (("mic", mic_path), ("loopback", loopback_path)):
+            channels[source] = sf.read(path, dtype="int16")
+    monkeypatch.setattr(record, "mix_channel_files", capture)
+
+    fed = []
+    streamer = types.SimpleNamespace(feed=lambda source, block, rate: fed.append((source, rate)))
+    filename = str(tmp_path / "meeting.wav")
+    assert record.record_audio_dual(filename, mic_device=0, loopback_device=1, streamer=streamer, duration=0, prompt_devices=False) == filename
+
+    mic, mic_rate = channels["mic"]
+    loopback, loopback_rate = channels["loopback"]
+    assert (mic_rate, loopback_rate) == (48000, 44100)
+    # Every block reached its file, in callback order, including the ones queued when recording stopped
+    np.testing.assert_array_equal(mic, np.repeat(np.arange(BLOCKS), BLOCK))
+    np.testing.assert_array_equal(loopback, np.repeat(10000 + np.arange(BLOCKS), BLOCK))
+    assert fed.count(("mic", 48000.0)) == BLOCKS and fed.count(("loopback", 44100.0)) == BLOCKS
+    # The channel files are removed after mixing
+    assert not list(tmp_path.glob("*.mic.wav")) and not list(tmp_path.glob("*.loopback.wav"))
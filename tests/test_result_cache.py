@@ -0,0 +1,31 @@
+import os
+
+from config import DEFAULT_CONFIGS
+import result_cache
+from result_cache import cache_key, cached_stage
+
+def test_default_cache_dir_is_per_user_and_absolute():
+    assert os.path.isabs(DEFAULT_CONFIGS["RESULT_CACHE_DIR"])
+
+def test_diarize_key_ignores_asr_settings():
+    base = cache_key("diarize", "abc", DEFAULT_CONFIGS)
+    # pyannote runs on the CPU with its own model, whatever the ASR model and device
+    for setting in ({"MODEL_NAME": "small"}, {"DEVICE": "cuda"}, {"BATCH_SIZE": 32}, {"COMPUTE_TYPE": "float16"}):
+        assert cache_key("diarize", "abc", dict(DEFAULT_CONFIGS, **setting)) == base
+    for setting in ({"SPEAKER_COUNT": 3}, {"VAD_PREPASS": True}, {"DIARIZATION_MODE": "channels"}):
+        assert cache_key("diarize", "abc", dict(DEFAULT_CONFIGS, **setting)) != base
+
+def test_diarize_key_depends_on_the_diarization_model(monkeypatch):
+    base = cache_key("diarize", "abc", DEFAULT_CONFIGS)
+    monkeypatch.setitem(result_cache.STAGE_MODELS, "diarize", {"diarization_model": "pyannote/speaker-diarization-3.1", "diarization_device": "cpu"})
+    assert cache_key("diarize", "abc", DEFAULT_CONFIGS) != base
+
+def test_cached_stage_hits_and_keeps_the_directory_private(tmp_path):
+    configs = dict(DEFAULT_CONFIGS, RESULT_CACHE_DIR=str(tmp_path / "results"))
+    calls = []
+    compute = lambda: calls.append(1) or {"segments": []}
+    assert cached_stage(configs, "diarize", "abc", compute) == {"segments": []}
+    assert cached_stage(configs, "diarize", "abc", compute) == {"segments": []}
+    assert len(calls) == 1
+    if os.name != "nt":
+        assert os.stat(configs["RESULT_CACHE_DIR"]).st_mode & 0o077 == 0
@@ -0,0 +1,72 @@
+import pytest
+
+from config import DEFAULT_CONFIGS
+from search_index import (
+    connect, upsert_meeting, remove_meeting, list_meetings, search, match_expression,
+    parse_transcript, format_hit, index_meeting,
+)
+
+TRANSCRIPT = """[0.00-4.20] Speaker SPEAKER_00: Let's start with the budget for next quarter.
+[4.50-9.10] Speaker SPEAKER_01: I think the marketing budget should be approved today.
+[?-12.00] Speaker SPEAKER_00: Agreed, approve it.
+Speaker SPEAKER_02: Deadline is Friday."""
+
+@pytest.fixture
+def connection(tmp_path):
+    connection = connect(str(tmp_path / "search.db"))
+    yield connection
+    connection.close()
+
+def test_parse_transcript_reads_timestamps_and_placeholders():
+    turns = parse_transcript(TRANSCRIPT + "\nnot a turn")
+    assert len(turns) == 4
+    assert turns[0] == {"start": 0.0, "end": 4.2, "speaker": "SPEAKER_00", "text": "Let's start with the budget for next quarter."}
+    assert (turns[2]["start"], turns[2]["end"]) == (None, 12.0)
+    assert (turns[3]["start"], turns[3]["speaker"]) == (None, "SPEAKER_02")
+
+def test_search_ranks_and_highlights(connection):
+    upsert_meeting(connection, "weekly", parse_transcript(TRANSCRIPT))
+    upsert_meeting(connection, "standup", [{"speaker": "A", "start": 1.0, "end": 2.0, "text": "No budget talk today."}])
+    hits = search(connection, "marketing budget")
+    assert [(hit["meeting"], hit["speaker"], hit["start"]) for hit in hits] == [("weekly", "SPEAKER_01", 4.5)]
+    assert "[marketing]" in hits[0]["snippet"] and "[budget]" in hits[0]["snippet"]
+    assert format_hit(hits[0]).startswith("weekly  00:00:04  SPEAKER_01: ")
+
+    hits = search(connection, "budget")
+    assert {hit["meeting"] for hit in hits} == {"weekly", "standup"}
+    assert hits == sorted(hits, key=lambda hit: hit["score"])
+    assert [hit["meeting"] for hit in search(connection, "budget", meeting="standup")] == ["standup"]
+    assert [hit["speaker"] for hit in search(connection, "budget", speaker="SPEAKER_00")] == ["SPEAKER_00"]
+
+def test_phrases_and_prefixes(connection):
+    upsert_meeting(connection, "weekly", parse_transcript(TRANSCRIPT))
+    assert match_expression('"next quarter" appro*') == '"next quarter" "appro"*'
+    assert len(search(connection, '"next quarter"')) == 1
+    assert len(search(connection, '"quarter next"')) == 0
+    assert len(search(connection, "appro*")) == 2
+    assert search(connection, '  "" * ') == []
+
+def test_reindexing_replaces_a_meeting(connection):
+    upsert_meeting(connection, "weekly", parse_transcript(TRANSCRIPT))
+    assert upsert_meeting(connection, "weekly", [{"speaker": "A", "text": "Only the new text."}, {"speaker": "B", "text": "  "}]) == 1
+    assert search(connection, "budget") == []
+    assert len(search(connection, "new text")) == 1
+    assert [(name, turns) for name, turns, _, _ in list_meetings(connection)] == [("weekly", 1)]
+    assert remove_meeting(connection, "weekly") == 1
+    assert list_meetings(connection) == [] and search(connection, "new") == []
+
+def test_index_meeting_hook(tmp_path):
+    path = str(tmp_path / "search.db")
+    words = [
+        {"word": "Ship", "start": 0.0, "end": 0.3, "speaker": "SPEAKER_00"},
+        {"word": "it", "start": 0.4, "end": 0.6, "speaker": "SPEAKER_00"},
+        {"word": "Friday.", "start": 1.0, "end": 1.4, "speaker": "SPEAKER_01"},
+    ]
+    index_meeting("planning", words, dict(DEFAULT_CONFIGS, SEARCH_INDEX=path))
+    index_meeting("planning", words, dict(DEFAULT_CONFIGS, SEARCH_INDEX=path))
+    connection = connect(path)
+    try:
+        assert [(name, turns) for name, turns, _, _ in list_meetings(connection)] == [("planning", 2)]
+        assert [hit["speaker"] for hit in search(connection, "friday")] == ["SPEAKER_01"]
+    finally:
+        connection.close()
@@ -0,0 +1,101 @@
+import json
+import time
+import threading
+import urllib.request
+
+import pytest
+
+from server import TranscriptionService, create_server
+
+WORDS = [
+    {"word": "Hello", "start": 0.0, "end": 0.4, "speaker": "SPEAKER_00"},
+    {"word": "team.", "start": 0.5, "end": 0.9, "speaker": "SPEAKER_00"},
+    {"word": "Hi!", "start": 1.2, "end": 1.5, "speaker": "SPEAKER_01"},
+]
+CONFIGS = {"SEARCH_INDEX": None}
+
+def stub_transcribe(audio_file, configs):
+    return [dict(word) for word in WORDS]
+
+def stub_summarize(transcricao):
+    return "Main Subject:\n" + transcricao.splitlines()[0]
+
+@pytest.fixture
+def service(tmp_path):
+    return TranscriptionService(CONFIGS, stub_transcribe, stub_summarize, jobs_dir=str(tmp_path))
+
+@pytest.fixture
+def base_url(service):
+    httpd = create_server(service, port=0)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+def request(url, data=None):
+    with urllib.request.urlopen(urllib.request.Request(url, data=data), timeout=10) as response:
+        return response.status, json.loads(response.read())
+
+def test_upload_is_transcribed_and_summarized(base_url):
+    status, created = request(f"{base_url}/jobs?filename=standup.wav", data=b"RIFF fake audio")
+    assert status == 202
+
+    deadline = time.time() + 10
+    job = created
+    while job["status"] not in ("done", "failed") and time.time() < deadline:
+        _, job = request(f"{base_url}/jobs/{created['id']}?wait=1")
+
+    assert job["status"] == "done", job
+    assert job["transcript"] == "Speaker SPEAKER_00: Hello team.\nSpeaker SPEAKER_01: Hi!"
+    assert [turn["speaker"] for turn in job["turns"]] == ["SPEAKER_00", "SPEAKER_01"]
+    assert job["summary"] == "Main Subject:\nSpeaker SPEAKER_00: Hello team."
+
+    _, metrics = request(f"{base_url}/metrics")
+    assert metrics["jobs"]["done"] == 1
+    assert metrics["stage_latency_seconds"]["transcribe"]["count"] == 1
+
+def test_events_stream_until_the_job_finishes(base_url):
+    _, created = request(f"{base_url}/jobs?filename=a.wav&summarize=0", data=b"audio")
+    with urllib.request.urlopen(f"{base_url}/jobs/{created['id']}/events", timeout=10) as response:
+        events = [json.loads(line) for line in response.read().splitlines()]
+
+    statuses = [event["status"] for event in events]
+    assert statuses[0] == "queued"
+    assert statuses[-2:] == ["done", "result"]
+    assert "summary" not in events[-1]["job"]
+
+def test_unknown_job_is_404(base_url):
+    with pytest.raises(urllib.error.HTTPError) as error:
+        request(f"{base_url}/jobs/missing")
+    assert error.value.code == 404
+
+def test_failed_transcription_is_reported(tmp_path):
+    def broken(audio_file, configs):
+        raise RuntimeError("no model")
+
+    service = TranscriptionService(CONFIGS, broken, stub_summarize, jobs_dir=str(tmp_path))
+    job = service.submit(b"audio", "x.wav")
+    result = service.get(job["id"], wait=10)
+    assert result["status"] == "failed"
+    assert result["error"] == "no model"
+
+def test_finished_jobs_are_capped(tmp_path):
+    service = TranscriptionService(CONFIGS, stub_transcribe, stub_summarize, jobs_dir=str(tmp_path), max_finished_jobs=2)
+    ids = []
+    for _ in range(4):
+        job = service.submit(b"audio", "x.wav", summarize=False)
+        assert service.get(job["id"], wait=10)["status"] == "done"
+        ids.append(job["id"])
+
+    assert service.get(ids[0]) is None and service.get(ids[1]) is None
+    assert service.get(ids[3])["status"] == "done"
+    assert service.metrics()["jobs_kept"] == 2
+
+def test_finished_jobs_expire(tmp_path):
+    service = TranscriptionService(CONFIGS, stub_transcribe, stub_summarize, jobs_dir=str(tmp_path), job_ttl=0.2)
+    job = service.submit(b"audio", "x.wav", summarize=False)
+    assert service.get(job["id"], wait=10)["status"] == "done"
+    time.sleep(0.3)
+    assert service.get(job["id"]) is None
+    assert service.metrics()["jobs_kept"] == 0
@@ -0,0 +1,86 @@
+import sys
+
+import numpy as np
+import pytest
+
+from config import DEFAULT_CONFIGS
+from speaker_index import MATCH_THRESHOLD, SpeakerIndex, normalize, name_speakers
+
+DIMENSIONS = 64
+
+def at_similarity(embedding, similarity, rng):
+    """
+    A unit vector with exactly `similarity` cosine to `embedding`.
+    """
+    embedding = normalize(embedding)
+    other = rng.normal(size=embedding.shape)
+    other = normalize(other - (other @ embedding) * embedding)
+    return similarity * embedding + np.sqrt(1 - similarity ** 2) * other
+
+@pytest.fixture
+def people():
+    rng = np.random.default_rng(0)
+    index = SpeakerIndex()
+    embeddings = {name: rng.normal(size=DIMENSIONS) for name in ("alice", "bob", "carol")}
+    for name, embedding in embeddings.items():
+        index.enroll(name, embedding)
+    return index, embeddings, rng
+
+def test_known_speaker_is_named_and_unknown_rejected_at_the_threshold(people):
+    index, embeddings, rng = people
+    mapping = index.match({
+        "SPEAKER_00": at_similarity(embeddings["bob"], MATCH_THRESHOLD + 0.02, rng),
+        "SPEAKER_01": at_similarity(embeddings["alice"], MATCH_THRESHOLD - 0.02, rng),
+        "SPEAKER_02": rng.normal(size=DIMENSIONS),
+    }, method="exact")
+    assert mapping == {"SPEAKER_00": "bob"}
+
+def test_a_name_goes_to_the_most_similar_label_only(people):
+    index, embeddings, rng = people
+    mapping = index.match({
+        "SPEAKER_00": at_similarity(embeddings["carol"], 0.8, rng),
+        "SPEAKER_01": at_similarity(embeddings["carol"], 0.95, rng),
+    }, method="exact")
+    assert mapping == {"SPEAKER_01": "carol"}
+
+def test_enrolling_again_updates_the_running_mean(people):
+    index, embeddings, rng = people
+    second = at_similarity(embeddings["alice"], 0.6, rng)
+    index.enroll("alice", second)
+    row = index.names.index("alice")
+    assert len(index) == 3 and index.counts[row] == 2
+    np.testing.assert_allclose(index.embeddings[row], normalize(normalize(embeddings["alice"]) + second), atol=1e-5)
+    with pytest.raises(ValueError):
+        index.enroll("dave", np.ones(DIMENSIONS + 1))
+    index.remove("bob")
+    assert index.names == ["alice", "carol"] and len(index.embeddings) == 2
+
+def test_lsh_recall_matches_exact_search():
+    rng = np.random.default_rng(1)
+    index = SpeakerIndex([f"p{i}" for i in range(3000)], normalize(rng.normal(size=(3000, DIMENSIONS))), np.ones(3000))
+    rows = rng.choice(3000, 200, replace=False)
+    queries = np.stack([at_similarity(index.embeddings[row], 0.9, rng) for row in rows])
+    exact, _ = index.search(queries, method="exact")
+    lsh, scores = index.search(queries, method="lsh")
+    assert (exact == rows).all()
+    assert np.mean(lsh == rows) >= 0.95
+    assert np.all(scores[lsh == rows] > 0.89)
+
+def test_faiss_falls_back_to_lsh(people, monkeypatch, capsys):
+    index, embeddings, rng = people
+    monkeypatch.setitem(sys.modules, "faiss", None)
+    best, _ = index.search(np.stack([at_similarity(embeddings["carol"], 0.95, rng)]), method="faiss")
+    assert index.names[best[0]] == "carol"
+    assert "using LSH" in capsys.readouterr().out
+
+def test_name_speakers_from_a_saved_index(people, tmp_path):
+    index, embeddings, rng = people
+    path = str(tmp_path / "speakers.npz")
+    index.save(path)
+    words = [{"word": "hi", "speaker": "SPEAKER_00"}, {"word": "yo", "speaker": "SPEAKER_01"}]
+    mapping = name_speakers(words, {
+        "SPEAKER_00": at_similarity(embeddings["alice"], 0.9, rng),
+        "SPEAKER_01": rng.normal(size=DIMENSIONS),
+    }, dict(DEFAULT_CONFIGS, SPEAKER_INDEX=path))
+    assert mapping == {"SPEAKER_00": "alice"}
+    assert [word["speaker"] for word in words] == ["alice", "SPEAKER_01"]
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from scipy.signal import resample_poly
+
+import diarization
+from config import DEFAULT_CONFIGS
+from streaming import StreamingTranscriber
+
+RATE = 48000
+TARGET = 16000
+
+def speech_with_pauses(seconds, pauses, rng):
+    """
+    int16 noise standing in for speech, silent during `pauses` (start, end) seconds.
+    """
+    audio = rng.normal(0, 0.2, int(seconds * RATE))
+    for start, end in pauses:
+        audio[int(start * RATE):int(end * RATE)] = rng.normal(0, 1e-4, int((end - start) * RATE))
+    return np.clip(audio * 32767, -32768, 32767).astype(np.int16)
+
+@pytest.fixture
+def fake_models(monkeypatch):
+    windows = []
+
+    def run_asr(audio, configs):
+        windows.append(audio.copy())
+        return {"segments": [{"start": 0.0, "end": len(audio) / TARGET, "text": f"window {len(windows)}"}], "language": "en"}
+
+    def run_alignment(segments, language, audio, configs):
+        return {"segments": [dict(segment, words=[{"word": segment["text"], "start": 0.5, "end": 1.0}]) for segment in segments]}
+
+    monkeypatch.setattr(diarization, "run_asr", run_asr)
+    monkeypatch.setattr(diarization, "run_alignment", run_alignment)
+    return windows
+
+def test_windows_are_cut_in_pauses_and_continuous(fake_models, tmp_path):
+    rng = np.random.default_rng(0)
+    # A 3 s pause inside the search span of the first window, and one before it
+    audio = speech_with_pauses(70, [(10.0, 13.0), (25.5, 28.5), (54.5, 57.5)], rng)
+    transcript = tmp_path / "live.txt"
+    streamer = StreamingTranscriber(dict(DEFAULT_CONFIGS), str(transcript), sources=("mic",), window_seconds=30, search_seconds=5).start()
+    for start in range(0, len(audio), 4800):
+        streamer.feed("mic", audio[start:start + 4800], RATE)
+    words = streamer.finish()
+
+    lengths = [len(window) / TARGET for window in fake_models]
+    # Cut in the middle of the pause at 25.5-28.5 s (not at the 30 s window size), then near 57 s
+    assert lengths[0] == pytest.approx(27.0, abs=0.1)
+    assert 55.0 < lengths[0] + lengths[1] < 57.0
+    # Nothing is lost or repeated between windows
+    expected = resample_poly(audio.astype(np.float32) / 32768.0, 1, 3)
+    assert sum(len(window) for window in fake_models) == len(expected)
+    np.testing.assert_allclose(np.concatenate(fake_models), expected, atol=1e-4)
+    # Timestamps are moved onto the recording timeline
+    offsets = np.concatenate(([0.0], np.cumsum(lengths)[:-1]))
+    assert [word["start"] for word in words] == pytest.approx((offsets + 0.5).tolist())
+    assert transcript.read_text().splitlines()[1].startswith(f"[{offsets[1]:.2f}-")
+
+def test_no_pause_falls_back_to_the_quietest_point(fake_models):
+    rng = np.random.default_rng(1)
+    audio = rng.normal(0, 0.2, 40 * RATE)
+    audio[int(27.5 * RATE):int(27.6 * RATE)] *= 0.01  # A 0.1 s dip, too short for VAD
+    audio = np.clip(audio * 32767, -32768, 32767).astype(np.int16)
+    streamer = StreamingTranscriber(dict(DEFAULT_CONFIGS), sources=("mic",), window_seconds=30, search_seconds=5).start()
+    streamer.feed("mic", audio, RATE)
+    streamer.finish()
+    assert len(fake_models[0]) / TARGET == pytest.approx(27.55, abs=0.05)
@@ -0,0 +1,161 @@
+import asyncio
+
+import pytest
+from langchain_core.language_models.fake import FakeListLLM, FakeStreamingListLLM
+
+import summarizer
+from summarizer import (
+    estimate_tokens, split_transcript, split_long_turn, prompt_budget, generate_summary,
+    agenerate_summary, stream_summary, map_template, template, reduce_template,
+)
+
+FIELDS = ("Main Subject:", "My Activities:", "Goals:", "The Most Important of the Meeting:", "Deadlines / Deliverables:")
+SUMMARY = (
+    "Main Subject:\nQ3 roadmap\n\nMy Activities:\n- Write the migration plan\n\nGoals:\n- Ship in September\n\n"
+    "The Most Important of the Meeting:\nThe database migration goes first.\n\nDeadlines / Deliverables:\n- Plan by Friday"
+)
+
+class RecordingLLM(FakeListLLM):
+    """
+    FakeListLLM that keeps every prompt it was called with.
+    """
+    prompts: list = []
+
+    def _call(self, prompt, *args, **kwargs):
+        self.prompts.append(prompt)
+        return super()._call(prompt, *args, **kwargs)
+
+    async def _acall(self, prompt, *args, **kwargs):
+        self.prompts.append(prompt)
+        return await super()._acall(prompt, *args, **kwargs)
+
+def long_transcript(turns=400):
+    speakers = ("Alice", "Bob", "Me")
+    return "\n".join(
+        f"Speaker {speakers[i % 3]}: turn {i} about the roadmap, the migration and the release plan for the quarter"
+        for i in range(turns)
+    )
+
+def map_responses(count):
+    return [f"<think>reasoning {i}</think>Main Subject:\nnote {i}" for i in range(count)]
+
+def test_split_transcript_keeps_turns_whole_and_in_order():
+    transcricao = long_transcript(60)
+    budget = 200
+    chunks = split_transcript(transcricao, budget)
+
+    assert len(chunks) > 1
+    assert "\n".join(chunks).splitlines() == transcricao.splitlines()
+    for chunk in chunks:
+        assert sum(estimate_tokens(line) + 1 for line in chunk.splitlines()) <= budget
+
+def test_split_transcript_starts_a_new_chunk_at_the_boundary():
+    line = "Speaker A: " + "word " * 20
+    line_tokens = estimate_tokens(line.strip()) + 1
+    transcricao = "\n".join([line.strip()] * 3)
+
+    assert split_transcript(transcricao, 2 * line_tokens) == ["\n".join([line.strip()] * 2), line.strip()]
+    assert split_transcript(transcricao, 3 * line_tokens) == [transcricao]
+
+def test_split_long_turn_on_words_with_speaker_prefix():
+    turn = "Speaker Alice: " + " ".join(f"w{i}" for i in range(200))
+    pieces = split_long_turn(turn, 30)
+
+    assert len(pieces) > 1
+    assert all(piece.startswith("Speaker Alice: ") for piece in pieces)
+    assert all(estimate_tokens(piece) <= 30 for piece in pieces)
+    assert " ".join(piece[len("Speaker Alice: "):] for piece in pieces) == turn[len("Speaker Alice: "):]
+
+@pytest.mark.parametrize("prompt", [template, map_template, reduce_template])
+def test_prompts_ask_for_the_five_mandatory_fields_in_order(prompt):
+    text = prompt.format(transcricao="")
+    positions = [text.index(field) for field in FIELDS]
+    assert positions == sorted(positions)
+
+def test_short_transcript_is_summarized_in_one_prompt():
+    model = RecordingLLM(responses=[SUMMARY], prompts=[])
+    summary = generate_summary("Speaker Alice: the plan is due Friday", model=model)
+
+    assert summary == SUMMARY
+    assert len(model.prompts) == 1
+    assert "Speaker Alice: the plan is due Friday" in model.prompts[0]
+    assert all(field in summary for field in FIELDS)
+
+def test_long_transcript_is_mapped_and_reduced_with_batch():
+    transcricao = long_transcript()
+    chunks = split_transcript(transcricao, prompt_budget(map_template))
+    assert len(chunks) > 1
+
+    model = RecordingLLM(responses=map_responses(len(chunks)) + [SUMMARY], prompts=[])
+    summary = generate_summary(transcricao, model=model, max_in_flight=1)
+
+    assert summary == SUMMARY
+    assert len(model.prompts) == len(chunks) + 1
+    for prompt, chunk in zip(model.prompts, chunks):
+        assert chunk in prompt
+    final_prompt = model.prompts[-1]
+    assert "<think>" not in final_prompt
+    expected = "\n\n".join(f"PART {i + 1}:\nMain Subject:\nnote {i}" for i in range(len(chunks)))
+    assert expected in final_prompt
+
+def test_notes_too_long_for_one_reduce_are_merged_in_rounds():
+    transcricao = long_transcript(1200)
+    chunks = split_transcript(transcricao, prompt_budget(map_template))
+    big_note = "Main Subject:\n" + "detail " * 1100
+    groups = summarizer.next_reduce_round([big_note] * len(chunks))
+    assert groups is not None and 1 < len(groups) < len(chunks)
+
+    merged = "Main Subject:\nmerged"
+    model = RecordingLLM(responses=[big_note] * len(chunks) + [merged] * len(groups) + [SUMMARY], prompts=[])
+
+    assert generate_summary(transcricao, model=model, max_in_flight=1) == SUMMARY
+    assert len(model.prompts) == len(chunks) + len(groups) + 1
+    assert model.prompts[-1].count("Main Subject:\nmerged") == len(groups)
+
+def test_abatch_path_matches_batch_path():
+    transcricao = long_transcript()
+    chunks = split_transcript(transcricao, prompt_budget(map_template))
+    responses = map_responses(len(chunks)) + [SUMMARY]
+
+    sync_model = RecordingLLM(responses=responses, prompts=[])
+    async_model = RecordingLLM(responses=responses, prompts=[])
+    assert generate_summary(transcricao, model=sync_model, max_in_flight=1) == SUMMARY
+    assert asyncio.run(agenerate_summary(transcricao, model=async_model, max_in_flight=1)) == SUMMARY
+    assert async_model.prompts == sync_model.prompts
+
+def test_astream_writes_the_summary_as_it_arrives(tmp_path):
+    transcricao = long_transcript()
+    chunks = split_transcript(transcricao, prompt_budget(map_template))
+    model = FakeStreamingListLLM(responses=map_responses(len(chunks)) + [SUMMARY])
+    summary_file = tmp_path / "summary.txt"
+
+    summary, metrics = asyncio.run(stream_summary(transcricao, str(summary_file), model=model, max_in_flight=1))
+
+    assert summary == SUMMARY
+    assert summary_file.read_text(encoding="utf-8") == SUMMARY
+    assert all(field in summary for field in FIELDS)
+    # FakeStreamingListLLM yields one character per chunk
+    assert metrics["tokens"] == len(SUMMARY)
+    assert metrics["time_to_first_token"] is not None
+
+def test_default_model_is_the_ollama_chain():
+    summary_chain, _, _ = summarizer.build_chains()
+    assert summary_chain is summarizer.chain
+
+def test_notes_too_long_to_pair_are_truncated_so_rounds_converge():
+    reduce_budget = prompt_budget(reduce_template)
+    huge_note = "Main Subject:\n" + "detail " * (reduce_budget * 2)
+    notes = [huge_note] * 5
+    rounds = 0
+    while (groups := summarizer.next_reduce_round(notes)) is not None:
+        rounds += 1
+        assert len(groups) < len(notes)
+        for group in groups:
+            assert estimate_tokens(reduce_template.format(transcricao=summarizer.join_notes(group))) <= summarizer.CONTEXT_TOKENS - summarizer.OUTPUT_TOKENS
+        # A model that echoes its input keeps the notes oversized
+        notes = [huge_note] * len(groups)
+    assert rounds == 3 and len(notes) == 1
+
+    final_input = summarizer.final_notes(notes)
+    assert estimate_tokens(final_input) <= reduce_budget
+    assert final_input.startswith("PART 1:\nMain Subject:\ndetail")
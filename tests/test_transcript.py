@@ -0,0 +1,61 @@
+import numpy as np
+
+import benchmark
+from transcript import WordTable, format_transcription
+
+WORDS = [
+    {"word": "Hello", "start": 0.0, "end": 0.4, "speaker": "SPEAKER_00"},
+    {"word": "team.", "start": 0.5, "end": 0.9, "speaker": "SPEAKER_00"},
+    {"word": "Hi!", "start": 1.2, "end": 1.5, "speaker": "SPEAKER_01"},
+    {"word": "2024"},
+    {"word": "Bye.", "start": 2.0, "end": 2.3, "speaker": "SPEAKER_00"},
+]
+
+def test_turns_match_the_legacy_dict_walk():
+    word_segments = benchmark.synthetic_word_segments(0.2)
+    assert format_transcription(word_segments) == benchmark.legacy_format_transcription(word_segments)
+
+def test_text_formats():
+    table = WordTable.from_word_segments(WORDS)
+    assert table.to_text() == (
+        "Speaker SPEAKER_00: Hello team.\nSpeaker SPEAKER_01: Hi!\nSpeaker Unknown: 2024\nSpeaker SPEAKER_00: Bye."
+    )
+    assert table.to_timestamped_text().splitlines() == [
+        "[0.00-0.90] Speaker SPEAKER_00: Hello team.",
+        "[1.20-1.50] Speaker SPEAKER_01: Hi!",
+        "[1.50-2.00] Speaker Unknown: 2024",
+        "[2.00-2.30] Speaker SPEAKER_00: Bye.",
+    ]
+
+def test_missing_timestamps_fall_back_within_the_turn():
+    turns = format_transcription([
+        {"word": "uh", "speaker": "A"},
+        {"word": "so", "start": 1.0, "end": 1.2, "speaker": "A"},
+        {"word": "yes", "start": 1.5, "speaker": "A"},
+    ])
+    assert turns == [{"start": 1.0, "end": 1.2, "text": "uh so yes", "speaker": "A"}]
+
+def test_turn_without_any_timestamp_gets_a_placeholder():
+    table = WordTable.from_word_segments([{"word": "uh", "speaker": "SPEAKER_00"}])
+    assert table.to_turns() == [{"start": None, "end": None, "text": "uh", "speaker": "SPEAKER_00"}]
+    assert table.to_timestamped_text() == "[?-?] Speaker SPEAKER_00: uh\n"
+
+def test_empty_transcript():
+    table = WordTable.from_word_segments([])
+    assert table.to_turns() == [] and table.to_text() == "" and table.to_timestamped_text() == ""
+
+def test_columns_are_compact_arrays():
+    table = WordTable.from_word_segments(WORDS)
+    assert table.starts.dtype == np.float64 and np.isnan(table.starts[3])
+    assert table.speaker_codes.tolist() == [0, 0, 1, 2, 0]
+    assert table.speakers == ["SPEAKER_00", "SPEAKER_01", "Unknown"]
+    assert [table.text[o:o + n] for o, n in zip(table.offsets, table.lengths)] == [w["word"] for w in WORDS]
+    assert not hasattr(table, "word_segments")
+
+def test_turns_split_at_speaker_change_points():
+    first, last = WordTable.from_word_segments(WORDS).turn_bounds()
+    assert first.tolist() == [0, 2, 3, 4] and last.tolist() == [1, 2, 3, 4]
+
+def test_explicit_none_timestamps_are_nan():
+    table = WordTable.from_word_segments([{"word": "a", "start": None, "end": 1.0, "speaker": "A"}])
+    assert np.isnan(table.starts[0]) and table.to_turns()[0]["start"] is None
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from vad import SAMPLE_RATE, PADDING_SECONDS, FRAME_SECONDS, SpeechMap, detect_speech
+
+# (start, end) seconds of loud noise standing in for speech; the rest is near silence
+SPEECH = [(5.0, 8.0), (8.5, 10.0), (20.0, 23.0)]
+DURATION = 30.0
+TOLERANCE = 2 * FRAME_SECONDS
+
+def meeting_audio():
+    rng = np.random.default_rng(0)
+    audio = rng.normal(0, 1e-4, int(DURATION * SAMPLE_RATE)).astype(np.float32)
+    for start, end in SPEECH:
+        first, last = int(start * SAMPLE_RATE), int(end * SAMPLE_RATE)
+        audio[first:last] = rng.normal(0, 0.3, last - first)
+    return audio
+
+@pytest.fixture(scope="module")
+def speech_map():
+    return detect_speech(meeting_audio())
+
+def test_regions_are_padded_and_short_pauses_kept(speech_map):
+    # The 0.5 s pause at 8 s is too short to cut, the 10 s gap and the silent edges are cut
+    seconds = speech_map.regions / SAMPLE_RATE
+    expected = [(5.0 - PADDING_SECONDS, 10.0 + PADDING_SECONDS), (20.0 - PADDING_SECONDS, 23.0 + PADDING_SECONDS)]
+    assert seconds.shape == (2, 2)
+    np.testing.assert_allclose(seconds, expected, atol=TOLERANCE)
+    assert speech_map.skipped_seconds == pytest.approx(DURATION - seconds[:, 1].sum() + seconds[:, 0].sum())
+
+def test_compact_glues_the_regions(speech_map):
+    audio = meeting_audio()
+    compact = speech_map.compact(audio)
+    (a, b), (c, d) = speech_map.regions
+    assert len(compact) == speech_map.speech_samples
+    np.testing.assert_array_equal(compact, np.concatenate((audio[a:b], audio[c:d])))
+
+def test_word_times_map_back_to_the_original_timeline(speech_map):
+    (a, b), (c, d) = speech_map.regions / SAMPLE_RATE
+    joint = speech_map.compact_starts[1] / SAMPLE_RATE  # Where the second region starts in the compacted audio
+    words = [
+        {"word": "first", "start": 1.0, "end": 1.5},
+        {"word": "second", "start": joint + 0.5, "end": joint + 1.0},
+        {"word": "spanning", "start": joint - 0.2, "end": joint + 0.2},
+        {"word": "joint", "start": joint, "end": joint},
+        {"word": "untimed", "start": None},
+    ]
+    speech_map.remap_word_segments(words)
+    assert (words[0]["start"], words[0]["end"]) == pytest.approx((a + 1.0, a + 1.5), abs=1e-3)
+    assert (words[1]["start"], words[1]["end"]) == pytest.approx((c + 0.5, c + 1.0), abs=1e-3)
+    # A word across the removed gap starts before it and ends after it
+    assert (words[2]["start"], words[2]["end"]) == pytest.approx((b - 0.2, c + 0.2), abs=1e-3)
+    # Exactly on the joint, a start belongs to the later region and an end to the earlier one
+    assert (words[3]["start"], words[3]["end"]) == pytest.approx((c, b), abs=1e-3)
+    assert words[4]["start"] is None
+
+def test_remap_aligned_moves_segments_and_words():
+    speech_map = SpeechMap([(0, SAMPLE_RATE), (5 * SAMPLE_RATE, 6 * SAMPLE_RATE)], 6 * SAMPLE_RATE)
+    aligned = {"segments": [{"start": 1.5, "end": 1.9}], "word_segments": [{"word": "x", "start": 1.5, "end": 1.9}]}
+    speech_map.remap_aligned(aligned)
+    assert aligned["segments"][0] == {"start": 5.5, "end": 5.9}
+    assert (aligned["word_segments"][0]["start"], aligned["word_segments"][0]["end"]) == (5.5, 5.9)
+
+def test_silence_keeps_the_whole_recording():
+    audio = np.zeros(3 * SAMPLE_RATE, dtype=np.float32)
+    speech_map = detect_speech(audio)
+    assert speech_map.regions.tolist() == [[0, len(audio)]]
+    assert speech_map.report()["skipped_seconds"] == 0
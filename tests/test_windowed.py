@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+import soundfile as sf
+
+import windowed
+from config import DEFAULT_CONFIGS
+from mixer import TARGET_SAMPLE_RATE
+from windowed import SpeakerReconciler, iter_windows, owned_speech, transcribe_windowed
+
+def test_windows_overlap_and_cover_the_file(tmp_path):
+    path = str(tmp_path / "long.wav")
+    audio = np.linspace(-0.5, 0.5, 25 * TARGET_SAMPLE_RATE, dtype=np.float32)
+    sf.write(path, audio, TARGET_SAMPLE_RATE, subtype="FLOAT")
+    windows = list(iter_windows(path, 10, overlap_seconds=3))
+    # The last full window ends at 24 s, so the tail from 21 s is a short fourth window
+    assert [start for start, _ in windows] == [0, 7, 14, 21]
+    assert [len(window) / TARGET_SAMPLE_RATE for _, window in windows] == [10, 10, 10, 4]
+    for start, window in windows:
+        first = int(start * TARGET_SAMPLE_RATE)
+        np.testing.assert_allclose(window, audio[first:first + len(window)], atol=1e-6)
+
+def test_overlap_must_be_shorter_than_the_window(tmp_path):
+    with pytest.raises(ValueError):
+        next(iter_windows(str(tmp_path / "missing.wav"), 10, overlap_seconds=10))
+
+def test_embeddings_keep_labels_across_windows():
+    rng = np.random.default_rng(0)
+    alice, bob = rng.normal(size=64), rng.normal(size=64)
+    reconciler = SpeakerReconciler()
+    first = reconciler.match_embeddings({"SPEAKER_00": alice, "SPEAKER_01": bob})
+    # The next window's pyannote labels are swapped, and a third person joins
+    second = reconciler.match_embeddings({
+        "SPEAKER_00": bob + rng.normal(scale=0.1, size=64),
+        "SPEAKER_01": alice + rng.normal(scale=0.1, size=64),
+        "SPEAKER_02": rng.normal(size=64),
+    })
+    assert second["SPEAKER_00"] == first["SPEAKER_01"] and second["SPEAKER_01"] == first["SPEAKER_00"]
+    assert second["SPEAKER_02"] not in first.values()
+    assert len(reconciler.embeddings()) == 3
+
+def test_overlap_words_link_labels_without_embeddings():
+    reconciler = SpeakerReconciler(min_votes=2)
+    reconciler.centroids = [None, None]  # Speakers 0 and 1 of the previous window
+    previous = [{"speaker": "SPEAKER_00", "global": 0}] * 3 + [{"speaker": "SPEAKER_01", "global": 1}] * 3
+    previous_midpoints = np.array([70.0, 71.0, 72.0, 80.0, 81.0, 82.0])
+    words = [{"speaker": "SPEAKER_01"}] * 3 + [{"speaker": "SPEAKER_00"}] * 3 + [{"speaker": "SPEAKER_02"}]
+    midpoints = np.array([70.1, 71.1, 72.1, 80.1, 81.1, 82.1, 120.0])
+    mapping = reconciler.match_overlap(words, midpoints, previous, previous_midpoints)
+    assert mapping["SPEAKER_01"] == 0 and mapping["SPEAKER_00"] == 1
+    assert mapping["SPEAKER_02"] == 2
+
+def fake_windows(windows):
+    # Each window transcribes one word per second, each spoken by "SPEAKER_00" of that window
+    results = {}
+    for start, seconds, embedding in windows:
+        words = [{"word": f"w{int(start) + t}", "start": t + 0.1, "end": t + 0.5, "speaker": "SPEAKER_00"} for t in range(seconds)]
+        results[start] = {
+            "word_segments": words, "embeddings": {"SPEAKER_00": embedding}, "vad": {},
+            "speech_regions": np.array([[0.0, float(seconds)]]),
+        }
+    return results
+
+def test_overlap_words_are_kept_once_with_one_speaker(monkeypatch):
+    embedding = np.ones(8, dtype=np.float32)
+    results = fake_windows([(0, 10, embedding), (7, 10, embedding), (14, 6, embedding)])
+    monkeypatch.setattr(windowed, "iter_windows", lambda path, seconds: ((start, np.zeros(int(len(results[start]["word_segments"]) * TARGET_SAMPLE_RATE), dtype=np.float32)) for start in sorted(results)))
+    calls = iter(sorted(results))
+    monkeypatch.setattr(windowed, "transcribe_window", lambda audio, configs: results[next(calls)])
+    configs = dict(DEFAULT_CONFIGS, RESULT_CACHE=False, SPEAKER_INDEX=None, WINDOW_SECONDS=10)
+    report = {}
+
+    words = transcribe_windowed("meeting.wav", configs, vad_report=report)
+    assert [word["word"] for word in words] == [f"w{t}" for t in range(20)]
+    assert [word["start"] for word in words] == [t + 0.1 for t in range(20)]
+    assert {word["speaker"] for word in words} == {"SPEAKER_00"}
+    # 20 s of audio, not the 26 s the three windows add up to
+    assert report["audio_seconds"] == 20 and report["speech_seconds"] == 20 and report["skipped_seconds"] == 0
+
+def test_owned_speech_counts_the_overlap_once():
+    # Speech 5-15 s, seen by both windows of a 0-10 / 7-17 split
+    windows = [(0.0, 10.0, [[5.0, 10.0]]), (7.0, 17.0, [[0.0, 8.0]])]
+    assert owned_speech(windows) == (10.0, 2)
@@ -0,0 +1,163 @@
+from itertools import repeat
+from operator import itemgetter
+import numpy as np
+
+#----
+# Columnar word segments
+#----
+# Hours of audio produce hundreds of thousands of word dicts. WordTable keeps
+# them as flat arrays (start/end times, speaker codes and offsets into a single
+# text buffer) so speaker turns are found with one vectorized run-length pass
+# over the speaker codes. The columns are pulled out of the dicts with map()
+# over C-level accessors, so no Python code runs per word, and the table keeps
+# no reference to the dicts. Only per-turn work (slicing the text) is Python.
+
+UNKNOWN_SPEAKER = "Unknown"
+
+class WordTable:
+    """
+    Column-oriented view of WhisperX `word_segments`.
+    """
+
+    def __init__(self, starts, ends, speaker_codes, speakers, text, offsets, lengths):
+        self.starts = starts                # float64, NaN when a word has no timestamp
+        self.ends = ends                    # float64, NaN when a word has no timestamp
+        self.speaker_codes = speaker_codes  # int32 index into `speakers`
+        self.speakers = speakers            # speaker labels in order of appearance
+        self.text = text                    # every word joined by single spaces
+        self.offsets = offsets              # int64 start of each word in `text`
+        self.lengths = lengths              # int64 length of each word
+        self._bounds = None
+
+    def __len__(self):
+        return len(self.starts)
+
+    @classmethod
+    def from_word_segments(cls, word_segments):
+        count = len(word_segments)
+        starts = _time_column(word_segments, "start", count)
+        ends = _time_column(word_segments, "end", count)
+
+        labels = list(map(dict.get, word_segments, repeat("speaker"), repeat(UNKNOWN_SPEAKER)))
+        speakers = list(dict.fromkeys(labels))
+        codes = {speaker: code for code, speaker in enumerate(speakers)}
+        speaker_codes = np.fromiter(map(codes.__getitem__, labels), dtype=np.int32, count=count)
+
+        words = list(map(itemgetter("word"), word_segments))
+        lengths = np.fromiter(map(len, words), dtype=np.int64, count=count)
+        offsets = np.zeros(count, dtype=np.int64)
+        if count:
+            np.cumsum(lengths[:-1] + 1, out=offsets[1:])
+        return cls(starts, ends, speaker_codes, speakers, " ".join(words), offsets, lengths)
+
+    def turn_bounds(self):
+        """
+        (first, last) word indices of each speaker turn, found from the change
+        points of the speaker codes.
+        """
+        if self._bounds is None:
+            if len(self) == 0:
+                empty = np.zeros(0, dtype=np.int64)
+                self._bounds = empty, empty
+            else:
+                codes = self.speaker_codes
+                changes = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+                first = np.concatenate(([0], changes))
+                last = np.concatenate((changes - 1, [len(self) - 1]))
+                self._bounds = first, last
+        return self._bounds
+
+    def turn_times(self, first, last):
+        """
+        Start of the first word and end of the last word of each turn, falling
+        back to the earliest/latest timestamp in the turn when those are missing.
+        """
+        starts = self.starts[first]
+        ends = self.ends[last]
+        missing = np.isnan(starts)
+        if missing.any():
+            starts[missing] = np.fmin.reduceat(self.starts, first)[missing]
+        missing = np.isnan(ends)
+        if missing.any():
+            ends[missing] = np.fmax.reduceat(self.ends, first)[missing]
+        return starts, ends
+
+    def turn_texts(self, first, last):
+        text = self.text
+        text_starts = self.offsets[first].tolist()
+        text_ends = (self.offsets[last] + self.lengths[last]).tolist()
+        return [text[start:end].strip() for start, end in zip(text_starts, text_ends)]
+
+    def turn_speakers(self, first):
+        return list(map(self.speakers.__getitem__, self.speaker_codes[first].tolist()))
+
+    def to_turns(self):
+        """
+        Speaker turns as dicts, the format returned by `format_transcription`.
+        """
+        first, last = self.turn_bounds()
+        starts, ends = self.turn_times(first, last)
+        return [
+            {"start": _time(start), "end": _time(end), "text": text, "speaker": speaker}
+            for start, end, text, speaker in zip(starts.tolist(), ends.tolist(), self.turn_texts(first, last), self.turn_speakers(first))
+        ]
+
+    def to_text(self):
+        """
+        One "Speaker X: text" line per turn, as saved next to the audio file.
+        """
+        first, last = self.turn_bounds()
+        return "\n".join(
+            f"Speaker {speaker}: {text}" for speaker, text in zip(self.turn_speakers(first), self.turn_texts(first, last))
+        )
+
+    def to_timestamped_text(self):
+        """
+        One "[start-end] Speaker X: text" line per turn. A turn without any
+        timestamp borrows the neighbouring turns' end/start, and shows "?"
+        when there is none.
+        """
+        first, last = self.turn_bounds()
+        starts, ends = self.turn_times(first, last)
+        # Latest end before each turn, and earliest start after it
+        previous_ends = _fill_forward(np.concatenate(([np.nan], ends[:-1])))
+        next_starts = _fill_forward(np.concatenate((starts[1:], [np.nan]))[::-1])[::-1]
+        starts = np.where(np.isnan(starts), previous_ends, starts)
+        ends = np.where(np.isnan(ends), next_starts, ends)
+        return "".join(
+            f"[{_format_time(start)}-{_format_time(end)}] Speaker {speaker}: {text}\n"
+            for start, end, speaker, text in zip(starts.tolist(), ends.tolist(), self.turn_speakers(first), self.turn_texts(first, last))
+        )
+
+def _time_column(word_segments, key, count):
+    """
+    float64 column of `key`, NaN where a word has no timestamp.
+    """
+    try:
+        return np.fromiter(map(dict.get, word_segments, repeat(key), repeat(np.nan)), dtype=np.float64, count=count)
+    except TypeError:
+        # An explicit None; the slower list conversion turns it into NaN
+        return np.array(list(map(dict.get, word_segments, repeat(key))), dtype=np.float64)
+
+def _fill_forward(values):
+    """
+    Replace each NaN with the last non-NaN value before it (NaN if none).
+    """
+    index = np.where(np.isnan(values), 0, np.arange(len(values)))
+    np.maximum.accumulate(index, out=index)
+    return values[index]
+
+def _time(value):
+    return None if value != value else value
+
+def _format_time(value):
+    return "?" if value != value else f"{value:.2f}"
+
+def format_transcription(final_result):
+    """
+    Merge consecutive words of the same speaker into turns.
+    """
+    return WordTable.from_word_segments(final_result).to_turns()
+
+def transcript_to_text(formatted_output):
+    return "\n".join(f"Speaker {seg['speaker']}: {seg['text']}" for seg in formatted_output)
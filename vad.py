@@ -0,0 +1,156 @@
+import numpy as np
+
+#----
+# Voice-activity pre-pass
+#----
+# Recordings often contain long silences (waiting for people to join, breaks,
+# muted stretches). detect_speech() finds the speech regions from frame energy,
+# the pipeline runs on the regions glued together, and SpeechMap maps the
+# timestamps of the compacted audio back to the original recording.
+
+SAMPLE_RATE = 16000
+FRAME_SECONDS = 0.03          # Energy is measured on 30 ms frames
+NOISE_PERCENTILE = 10         # Quietest frames estimate the noise floor...
+SPEECH_PERCENTILE = 95        # ...and the loudest ones the speech level
+NOISE_MARGIN_DB = 12          # Speech must be this far above the noise floor
+SPEECH_MARGIN_DB = 30         # ...but never needs to be closer than this to the speech level
+SILENCE_FLOOR_DB = -60        # Frames below this are silence whatever the statistics say
+MIN_SPEECH_SECONDS = 0.1      # Shorter bursts (clicks, keyboard) are dropped
+PADDING_SECONDS = 0.3         # Kept around every region so word edges are not cut
+MIN_SILENCE_SECONDS = 1.5     # Shorter pauses are kept; they are not worth a cut
+
+class SpeechMap:
+    """
+    Speech regions of a recording, as [start, end) sample ranges, and the
+    mapping between the original and the compacted (speech only) timeline.
+    """
+
+    def __init__(self, regions, total_samples, sample_rate=SAMPLE_RATE):
+        self.regions = np.asarray(regions, dtype=np.int64).reshape(-1, 2)
+        self.total_samples = int(total_samples)
+        self.sample_rate = sample_rate
+        lengths = self.regions[:, 1] - self.regions[:, 0]
+        # Start of each region in the compacted audio
+        self.compact_starts = np.concatenate(([0], np.cumsum(lengths)[:-1])) if len(lengths) else np.zeros(0, dtype=np.int64)
+        self.speech_samples = int(lengths.sum())
+
+    @property
+    def total_seconds(self):
+        return self.total_samples / self.sample_rate
+
+    @property
+    def speech_seconds(self):
+        return self.speech_samples / self.sample_rate
+
+    @property
+    def skipped_seconds(self):
+        return self.total_seconds - self.speech_seconds
+
+    def compact(self, audio):
+        """
+        Concatenate the speech regions of `audio`.
+        """
+        return np.concatenate([audio[start:end] for start, end in self.regions])
+
+    def to_original(self, times, side="right"):
+        """
+        Map compacted-timeline seconds to original-timeline seconds. A time
+        exactly on the joint of two regions maps to the start of the later one
+        with side="right" (use for start times) and to the end of the earlier
+        one with side="left" (use for end times).
+        """
+        times = np.asarray(times, dtype=np.float64)
+        compact_starts = self.compact_starts / self.sample_rate
+        index = np.clip(np.searchsorted(compact_starts, times, side=side) - 1, 0, len(compact_starts) - 1)
+        return self.regions[index, 0] / self.sample_rate + (times - compact_starts[index])
+
+    def remap_word_segments(self, word_segments):
+        """
+        Move the start/end times of WhisperX word segments (in place) from the
+        compacted timeline back to the original recording.
+        """
+        for key, side in (("start", "right"), ("end", "left")):
+            timed = [segment for segment in word_segments if segment.get(key) is not None]
+            if timed:
+                remapped = self.to_original([segment[key] for segment in timed], side).tolist()
+                for segment, value in zip(timed, remapped):
+                    segment[key] = round(value, 3)
+        return word_segments
+
+    def remap_aligned(self, result_aligned):
+        """
+        Move a whisperx.align result (segments and words, in place) back to
+        the original recording.
+        """
+        self.remap_word_segments(result_aligned["segments"])
+        self.remap_word_segments(result_aligned["word_segments"])
+        return result_aligned
+
+    def report(self):
+        total = self.total_seconds
+        return {
+            "audio_seconds": round(total, 2),
+            "speech_seconds": round(self.speech_seconds, 2),
+            "skipped_seconds": round(self.skipped_seconds, 2),
+            "skipped_fraction": round(self.skipped_seconds / total, 4) if total else 0.0,
+            "regions": len(self.regions),
+        }
+
+def frame_energy_db(audio, frame_samples):
+    """
+    Mean power of each full frame in dBFS.
+    """
+    frames = len(audio) // frame_samples
+    power = np.square(audio[:frames * frame_samples].reshape(frames, frame_samples), dtype=np.float64).mean(axis=1)
+    return 10 * np.log10(power + 1e-12)
+
+def mask_runs(mask):
+    """
+    (start, end) frame indices of the runs of True in a boolean array.
+    """
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.view(np.int8), [0]))))
+    return edges.reshape(-1, 2)
+
+def speech_threshold(energy):
+    """
+    Frame energy (dBFS) above which a frame counts as speech.
+    """
+    noise_floor = np.percentile(energy, NOISE_PERCENTILE)
+    speech_level = np.percentile(energy, SPEECH_PERCENTILE)
+    return max(SILENCE_FLOOR_DB, min(noise_floor + NOISE_MARGIN_DB, speech_level - SPEECH_MARGIN_DB))
+
+def detect_speech(audio, sample_rate=SAMPLE_RATE):
+    """
+    Build a SpeechMap for a mono waveform. When nothing sounds like speech the
+    whole recording is kept, so the pre-pass never makes a transcription empty.
+    """
+    audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+    total = len(audio)
+    frame_samples = max(1, int(FRAME_SECONDS * sample_rate))
+    energy = frame_energy_db(audio, frame_samples)
+    if len(energy) == 0:
+        return SpeechMap([(0, total)], total, sample_rate)
+
+    runs = mask_runs(energy > speech_threshold(energy)) * frame_samples
+
+    runs = runs[(runs[:, 1] - runs[:, 0]) >= MIN_SPEECH_SECONDS * sample_rate]
+    if len(runs) == 0:
+        return SpeechMap([(0, total)], total, sample_rate)
+
+    padding = int(PADDING_SECONDS * sample_rate)
+    starts = np.maximum(runs[:, 0] - padding, 0)
+    ends = np.minimum(runs[:, 1] + padding, total)
+    ends[-1] = total if total - ends[-1] < MIN_SILENCE_SECONDS * sample_rate else ends[-1]
+    starts[0] = 0 if starts[0] < MIN_SILENCE_SECONDS * sample_rate else starts[0]
+
+    # Merge regions separated by pauses too short to be worth cutting
+    keep_gap = (starts[1:] - ends[:-1]) >= MIN_SILENCE_SECONDS * sample_rate
+    region_starts = np.concatenate(([starts[0]], starts[1:][keep_gap]))
+    region_ends = np.concatenate((ends[:-1][keep_gap], [ends[-1]]))
+    return SpeechMap(np.stack([region_starts, region_ends], axis=1), total, sample_rate)
+
+def format_report(report):
+    return (
+        f"Voice activity: {report['speech_seconds'] / 60:.1f} of {report['audio_seconds'] / 60:.1f} min is speech, "
+        f"skipped {report['skipped_seconds']:.0f}s ({report['skipped_fraction']:.0%}) in {report['regions']} regions."
+    )
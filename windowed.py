@@ -0,0 +1,339 @@
+import subprocess
+import numpy as np
+import soundfile as sf
+from scipy.optimize import linear_sum_assignment
+from mixer import TARGET_SAMPLE_RATE, StreamResampler
+from profiling import stage
+
+#----
+# Windowed processing of long recordings
+#----
+# whisperx.load_audio decodes the whole file and pyannote clusters the whole
+# recording at once, so memory and clustering cost grow with the meeting.
+# Recordings longer than WINDOWED_MINUTES are instead read from disk in
+# overlapping windows of WINDOW_SECONDS, and each window is transcribed,
+# aligned and diarized on its own. Each window's speakers are then matched to
+# the recording-wide speakers found so far by their embeddings, and words in
+# an overlap are kept from the window whose side of the overlap midpoint they
+# fall on. Only one window of audio is in memory at any time.
+
+WINDOW_OVERLAP_SECONDS = 30   # Audio shared by consecutive windows
+MATCH_THRESHOLD = 0.5         # Cosine similarity above which window speakers are the same person
+MIN_OVERLAP_VOTES = 3         # Without embeddings: shared overlap words needed to link two labels
+READ_BLOCK_SECONDS = 30       # Decoded per read, so memory stays close to one window
+
+def recording_seconds(path):
+    """
+    Duration of an audio file without decoding it, or None when unknown.
+    """
+    try:
+        return sf.info(path).duration
+    except RuntimeError:
+        pass
+    try:
+        output = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "default=noprint_wrappers=1:nokey=1", path],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        return float(output.strip())
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return None
+
+def use_windowed(audio, configs):
+    """
+    Whether `audio` (only file paths qualify) is long enough for windowed mode.
+    """
+    minutes = configs.get("WINDOWED_MINUTES", 0)
+    if not minutes or not isinstance(audio, str):
+        return False
+    seconds = recording_seconds(audio)
+    return seconds is not None and seconds > minutes * 60
+
+def _soundfile_blocks(path, seconds):
+    """
+    16 kHz mono float32 blocks of about `seconds` from a file soundfile reads.
+    Channels are averaged, like FFmpeg's downmix in whisperx.load_audio.
+    """
+    with sf.SoundFile(path) as f:
+        resampler = StreamResampler(f.samplerate)
+        frames = max(1, int(seconds * f.samplerate))
+        while True:
+            block = f.read(frames, dtype="float32", always_2d=True)
+            if not len(block):
+                break
+            yield resampler.process(block.mean(axis=1))
+        yield resampler.flush()
+
+def _ffmpeg_blocks(path, seconds):
+    """
+    16 kHz mono float32 blocks of `seconds` piped from FFmpeg, for formats
+    soundfile cannot read.
+    """
+    command = [
+        "ffmpeg", "-nostdin", "-threads", "0", "-i", path,
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(TARGET_SAMPLE_RATE), "-",
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    size = max(1, int(seconds * TARGET_SAMPLE_RATE)) * 2
+    try:
+        while True:
+            data = process.stdout.read(size)
+            if not data:
+                break
+            yield np.frombuffer(data[:len(data) // 2 * 2], dtype=np.int16).astype(np.float32) / 32768.0
+    finally:
+        process.stdout.close()
+        process.kill()
+        process.wait()
+
+def iter_windows(path, window_seconds, overlap_seconds=WINDOW_OVERLAP_SECONDS):
+    """
+    Yield (start seconds, 16 kHz waveform) windows of `window_seconds` that
+    overlap by `overlap_seconds`. The last window holds whatever is left.
+    """
+    window = int(window_seconds * TARGET_SAMPLE_RATE)
+    hop = window - int(overlap_seconds * TARGET_SAMPLE_RATE)
+    if hop <= 0:
+        raise ValueError(f"WINDOW_SECONDS ({window_seconds}) must be longer than the {overlap_seconds}s overlap")
+    try:
+        sf.info(path)
+        blocks = _soundfile_blocks(path, READ_BLOCK_SECONDS)
+    except RuntimeError:
+        blocks = _ffmpeg_blocks(path, READ_BLOCK_SECONDS)
+
+    buffer = np.zeros(0, dtype=np.float32)
+    start = 0
+    for block in blocks:
+        buffer = np.concatenate([buffer, block])
+        while len(buffer) >= window:
+            yield start / TARGET_SAMPLE_RATE, buffer[:window]
+            buffer = buffer[hop:]
+            start += hop
+    # The tail is already inside the previous window unless it extends past it
+    if start == 0 or len(buffer) > window - hop:
+        yield start / TARGET_SAMPLE_RATE, buffer
+
+def transcribe_window(audio, configs):
+    """
+    VAD, ASR, alignment and diarization of one window. Returns its word
+    segments (window timeline, window-local SPEAKER_xx labels), the speaker
+    embeddings (or None), the voice-activity report and the speech regions
+    in window seconds.
+    """
+    from diarization import run_asr, run_diarization, assign_speakers, run_stage_graph
+    from alignment import align_segments
+    from vad import detect_speech
+
+    speech_map = detect_speech(audio) if configs.get("VAD_PREPASS") else None
+    speech = speech_map.compact(audio) if speech_map is not None else audio
+    stages = {
+        "asr": (lambda: run_asr(speech, configs), []),
+        "align": (lambda asr: align_segments(asr["segments"], asr["language"], speech, configs), ["asr"]),
+        "diarize": (lambda: run_diarization(speech, configs, return_embeddings=True), []),
+    }
+    max_workers = 2 if configs.get("PARALLEL_STAGES", True) else 1
+    results = run_stage_graph(stages, max_workers=max_workers, audio_seconds=lambda: len(audio) / TARGET_SAMPLE_RATE)
+
+    diarize_segments, embeddings = results["diarize"]
+    word_segments = assign_speakers(diarize_segments, results["align"])
+    if speech_map is not None:
+        speech_map.remap_word_segments(word_segments)
+    return {
+        "word_segments": word_segments,
+        "embeddings": {label: np.asarray(embedding, dtype=np.float32) for label, embedding in embeddings.items()} if embeddings else None,
+        "vad": speech_map.report() if speech_map is not None else None,
+        "speech_regions": speech_map.regions / TARGET_SAMPLE_RATE if speech_map is not None else None,
+    }
+
+def owned_speech(windows):
+    """
+    (speech seconds, regions) of the recording from per-window
+    (start, end, speech regions) in recording seconds. Consecutive windows
+    overlap, so each one only counts the speech up to the midpoints of its
+    overlaps, and the shared audio is counted once.
+    """
+    speech = 0.0
+    regions = 0
+    for index, (start, end, window_regions) in enumerate(windows):
+        own_start = (start + windows[index - 1][1]) / 2 if index else start
+        own_end = (windows[index + 1][0] + end) / 2 if index + 1 < len(windows) else end
+        clipped = np.clip(np.asarray(window_regions, dtype=np.float64).reshape(-1, 2) + start, own_start, own_end)
+        lengths = clipped[:, 1] - clipped[:, 0]
+        speech += float(lengths.sum())
+        regions += int(np.count_nonzero(lengths > 0))
+    return speech, regions
+
+def _midpoints(word_segments, default):
+    """
+    Midpoint of every word. Words WhisperX could not align take the midpoint
+    of the previous aligned word.
+    """
+    midpoints = []
+    current = default
+    for word in word_segments:
+        if word.get("start") is not None and word.get("end") is not None:
+            current = (word["start"] + word["end"]) / 2
+        midpoints.append(current)
+    return np.array(midpoints, dtype=np.float64)
+
+class SpeakerReconciler:
+    """
+    Online clustering of window-local speaker labels into recording-wide
+    speakers. Each window's labels are matched one-to-one (pyannote already
+    told them apart) to the running mean embeddings of the speakers so far.
+    Without embeddings, labels are linked by the words both windows
+    transcribed in their overlap.
+    """
+
+    def __init__(self, threshold=MATCH_THRESHOLD, min_votes=MIN_OVERLAP_VOTES):
+        self.threshold = threshold
+        self.min_votes = min_votes
+        self.centroids = []  # Sum of the unit embeddings matched to each speaker
+
+    def label(self, index):
+        return f"SPEAKER_{index:02d}"
+
+    def new_speaker(self, embedding=None):
+        self.centroids.append(embedding)
+        return len(self.centroids) - 1
+
+    def match_embeddings(self, embeddings):
+        from speaker_index import normalize
+
+        labels = list(embeddings)
+        vectors = normalize(np.stack([embeddings[label] for label in labels]))
+        mapping = {}
+        known = [i for i, centroid in enumerate(self.centroids) if centroid is not None]
+        if known:
+            similarities = vectors @ normalize(np.stack([self.centroids[i] for i in known])).T
+            rows, cols = linear_sum_assignment(-similarities)
+            for row, col in zip(rows.tolist(), cols.tolist()):
+                if similarities[row, col] >= self.threshold:
+                    mapping[labels[row]] = known[col]
+                    self.centroids[known[col]] = self.centroids[known[col]] + vectors[row]
+        for row, label in enumerate(labels):
+            if label not in mapping:
+                mapping[label] = self.new_speaker(vectors[row])
+        return mapping
+
+    def match_overlap(self, words, midpoints, previous_words, previous_midpoints):
+        """
+        Link local labels to the speakers of the previous window's words at the
+        same times in the overlap.
+        """
+        labels = sorted({word.get("speaker") for word in words if word.get("speaker")})
+        mapping = {}
+        if labels and len(previous_words):
+            order = np.argsort(previous_midpoints)
+            votes = {}
+            for word, midpoint in zip(words, midpoints.tolist()):
+                if not word.get("speaker") or midpoint > previous_midpoints.max() or midpoint < previous_midpoints.min():
+                    continue
+                nearest = order[min(np.searchsorted(previous_midpoints[order], midpoint), len(order) - 1)]
+                speaker = previous_words[nearest].get("global")
+                if speaker is not None:
+                    votes[(word["speaker"], speaker)] = votes.get((word["speaker"], speaker), 0) + 1
+            speakers = sorted({speaker for _, speaker in votes})
+            if speakers:
+                matrix = np.array([[votes.get((label, speaker), 0) for speaker in speakers] for label in labels])
+                rows, cols = linear_sum_assignment(-matrix)
+                for row, col in zip(rows.tolist(), cols.tolist()):
+                    if matrix[row, col] >= self.min_votes:
+                        mapping[labels[row]] = speakers[col]
+        for label in labels:
+            if label not in mapping:
+                mapping[label] = self.new_speaker()
+        return mapping
+
+    def embeddings(self):
+        """
+        {SPEAKER_xx: mean embedding} of the speakers that have one.
+        """
+        from speaker_index import normalize
+        return {self.label(i): normalize(centroid) for i, centroid in enumerate(self.centroids) if centroid is not None}
+
+def transcribe_windowed(audio_file, configs, timings=None, vad_report=None):
+    """
+    Transcribe and diarize a long recording window by window. Returns word
+    segments in the same format as `transcription_with_diarization`.
+    """
+    from diarization import print_registry_stats
+    from result_cache import audio_fingerprint, cached_stage
+    from speaker_index import name_speakers
+
+    timings = timings if timings is not None else {}
+    window_seconds = configs["WINDOW_SECONDS"]
+    fingerprint = audio_fingerprint(audio_file) if configs.get("RESULT_CACHE") else None
+    # A window may hold fewer people than the meeting, so only cap the count
+    window_configs = dict(configs, SPEAKER_COUNT=None, MAX_SPEAKERS=configs["SPEAKER_COUNT"] or configs["MAX_SPEAKERS"])
+
+    reconciler = SpeakerReconciler()
+    final_words = []
+    previous = None  # (words, midpoints, end seconds) of the window before
+    speech_windows = []  # (start, end, speech regions) of each window, for the VAD report
+
+    with stage("windowed", timings) as record:
+        for index, (start, audio) in enumerate(iter_windows(audio_file, window_seconds)):
+            seconds = len(audio) / TARGET_SAMPLE_RATE
+            print(f"Window {index + 1}: {start / 60:.1f}-{(start + seconds) / 60:.1f} min")
+            with stage("window", index=index, audio_seconds=seconds):
+                result = cached_stage(
+                    configs, "window", fingerprint,
+                    lambda: transcribe_window(audio, window_configs),
+                    extra={"start": start, "samples": len(audio)},
+                )
+            del audio
+            if result.get("speech_regions") is not None:
+                speech_windows.append((start, start + seconds, result["speech_regions"]))
+
+            words = [dict(word) for word in result["word_segments"]]
+            for word in words:
+                for key in ("start", "end"):
+                    if word.get(key) is not None:
+                        word[key] = round(word[key] + start, 3)
+            midpoints = _midpoints(words, start)
+
+            if result["embeddings"]:
+                mapping = reconciler.match_embeddings(result["embeddings"])
+            else:
+                previous_words, previous_midpoints = (previous[0], previous[1]) if previous else ([], np.zeros(0))
+                mapping = reconciler.match_overlap(words, midpoints, previous_words, previous_midpoints)
+            for word in words:
+                if word.get("speaker") in mapping:
+                    word["global"] = mapping[word["speaker"]]
+
+            # Words of the overlap belong to the window on their side of its midpoint
+            if previous is not None:
+                boundary = (start + previous[2]) / 2
+                final_words.extend(word for word, midpoint in zip(previous[0], previous[1].tolist()) if midpoint < boundary)
+                keep = midpoints >= boundary
+                words = [word for word, kept in zip(words, keep.tolist()) if kept]
+                midpoints = midpoints[keep]
+            previous = (words, midpoints, start + seconds)
+        if previous is not None:
+            final_words.extend(previous[0])
+        record["audio_seconds"] = previous[2] if previous is not None else 0.0
+
+    for word in final_words:
+        speaker = word.pop("global", None)
+        if speaker is not None:
+            word["speaker"] = reconciler.label(speaker)
+        else:
+            word.pop("speaker", None)
+    name_speakers(final_words, reconciler.embeddings(), configs)
+
+    print_registry_stats()
+    print(f"Windowed transcription: {len(final_words)} words, {len(reconciler.centroids)} speakers.")
+    audio_seconds = record["audio_seconds"]
+    if vad_report is not None and speech_windows and audio_seconds:
+        # Windows overlap, so the recording's length and speech are not the sums of the windows'
+        speech_seconds, regions = owned_speech(speech_windows)
+        skipped_seconds = max(0.0, audio_seconds - speech_seconds)
+        vad_report.update({
+            "audio_seconds": round(audio_seconds, 2),
+            "speech_seconds": round(speech_seconds, 2),
+            "skipped_seconds": round(skipped_seconds, 2),
+            "skipped_fraction": round(skipped_seconds / audio_seconds, 4),
+            "regions": regions,
+        })
+    return final_words